@@ -0,0 +1,102 @@
+import argparse
+import gzip
+import time
+from datetime import date
+
+import numpy as np
+
+from query_functions.graph_builder import SCHEMA_TRIPLES, TURTLE_PREFIXES, _term_triples, rows_to_triples
+from query_functions.mesh_terms import convert_to_uri
+
+# Reference date for the synthetic publication dates, fixed so corpora are reproducible
+CORPUS_DATE = date(2024, 1, 1)
+
+
+def term_vocabulary(term_count):
+    return [f"Synthetic Term {i}" for i in range(term_count)]
+
+
+def zipf_weights(term_count, exponent=1.1):
+    weights = 1.0 / np.arange(1, term_count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_corpus(output_path, article_count, term_count=25000, mean_terms=8, exponent=1.1, seed=0,
+                    chunk_size=10000):
+    """
+    Writes a PubMedGraph-shaped Turtle file with synthetic articles.
+
+    Articles carry the same properties as the real graph. Their MeSH terms are drawn from a
+    Zipf distribution over the vocabulary, so a few terms (like "Humans") appear in most
+    articles and the long tail in very few. Each article gets 1 + Poisson(mean_terms - 1) terms.
+
+    Args:
+        output_path (str): Destination .ttl file, gzip-compressed if it ends in .gz.
+        article_count (int): Number of articles.
+        term_count (int): Size of the MeSH vocabulary.
+        mean_terms (float): Average number of terms per article.
+        exponent (float): Zipf exponent of the term distribution.
+        seed (int): Random seed; the same arguments always produce the same file.
+        chunk_size (int): Articles generated and written at a time.
+
+    Returns:
+        dict: Articles and distinct terms written.
+    """
+    rng = np.random.default_rng(seed)
+    vocabulary = term_vocabulary(term_count)
+    weights = zipf_weights(term_count, exponent)
+    used_terms = set()
+
+    opener = gzip.open if output_path.endswith(".gz") else open
+    with opener(output_path, "wt", encoding="utf-8") as out:
+        out.write(TURTLE_PREFIXES)
+        out.writelines(f"<{s}> <{p}> <{o}> .\n" for s, p, o in SCHEMA_TRIPLES)
+
+        for start in range(0, article_count, chunk_size):
+            size = min(chunk_size, article_count - start)
+            counts = 1 + rng.poisson(max(mean_terms - 1, 0), size=size)
+            drawn = rng.choice(term_count, size=int(counts.sum()), p=weights)
+
+            rows = []
+            offset = 0
+            for i, count in enumerate(counts):
+                term_ids = sorted(set(drawn[offset:offset + count].tolist()))
+                offset += count
+                used_terms.update(term_ids)
+                number = start + i
+                rows.append((
+                    f"Synthetic article {number}",
+                    f"Synthetic abstract for article {number} about {vocabulary[term_ids[0]]}.",
+                    [vocabulary[t] for t in term_ids],
+                ))
+
+            articles, terms = rows_to_triples(rows, today=CORPUS_DATE)
+            out.writelines(statements for _, statements in articles)
+
+        for term_id in sorted(used_terms):
+            out.write(_term_triples(str(convert_to_uri(vocabulary[term_id])), vocabulary[term_id]))
+
+    return {"articles": article_count, "terms": len(used_terms)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic PubMedGraph corpus.")
+    parser.add_argument("output_path")
+    parser.add_argument("--articles", type=int, default=10000)
+    parser.add_argument("--terms", type=int, default=25000)
+    parser.add_argument("--mean-terms", type=float, default=8)
+    parser.add_argument("--exponent", type=float, default=1.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    stats = generate_corpus(
+        args.output_path, args.articles, term_count=args.terms, mean_terms=args.mean_terms,
+        exponent=args.exponent, seed=args.seed,
+    )
+    print(f"Wrote {stats['articles']} articles using {stats['terms']} terms to {args.output_path} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
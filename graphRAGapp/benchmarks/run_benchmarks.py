@@ -0,0 +1,190 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from benchmarks.generate_corpus import generate_corpus, term_vocabulary, zipf_weights
+from query_functions.mesh_terms import convert_to_uri, sanitize_term
+from query_functions.pubmed_graph import PubMedGraph
+
+DEFAULT_SIZES = [10000]
+TERM_COUNTS = [1, 5, 10, 50, 100]
+CANDIDATE_POOL = 1000
+TERM_COUNT = 25000
+
+# Metrics where a larger value is a regression; everything else compared is "higher is better"
+LOWER_IS_BETTER = ("load_seconds", "peak_rss_mb", "p50_ms", "p95_ms")
+
+
+def _peak_rss_mb():
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _timed(fn, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+    }
+
+
+def benchmark_size(corpus_path, article_count, repeats=20, seed=0):
+    """
+    Runs every measurement against one corpus. Meant to run in a fresh process so peak RSS
+    reflects this corpus only.
+    """
+    rng = np.random.default_rng(seed)
+    result = {"articles": article_count}
+
+    start = time.perf_counter()
+    graph = PubMedGraph(corpus_path)
+    snapshot = graph.snapshot()
+    result["load_seconds"] = time.perf_counter() - start
+    result["triples"] = snapshot.triple_count
+    index = snapshot.article_index
+
+    article_uris = index.articles.uris
+    candidates = [str(uri) for uri in rng.choice(article_uris, size=min(CANDIDATE_POOL, len(article_uris)), replace=False)]
+    distances = {uri: float(d) for uri, d in zip(candidates, rng.random(len(candidates)))}
+
+    vocabulary = term_vocabulary(TERM_COUNT)
+    weights = zipf_weights(TERM_COUNT)
+
+    def filter_query(selected):
+        term_uris = {convert_to_uri(term) for term in selected}
+        return index.top_articles(candidates, term_uris, distances)
+
+    result["filter_latency"] = {}
+    for term_count in TERM_COUNTS:
+        selected = [vocabulary[i] for i in rng.choice(TERM_COUNT, size=term_count, replace=False, p=weights)]
+        result["filter_latency"][str(term_count)] = _timed(lambda: filter_query(selected), repeats)
+
+    selected = [vocabulary[i] for i in rng.choice(TERM_COUNT, size=10, replace=False, p=weights)]
+    start = time.perf_counter()
+    queries = 0
+    while time.perf_counter() - start < 1.0:
+        filter_query(selected)
+        queries += 1
+    result["filter_queries_per_second"] = queries / (time.perf_counter() - start)
+
+    raw_terms = [f"'{term.replace(' ', '_')}'" for term in vocabulary[:10000]]
+    start = time.perf_counter()
+    for term in raw_terms:
+        convert_to_uri(sanitize_term(term))
+    result["term_conversions_per_second"] = len(raw_terms) / (time.perf_counter() - start)
+
+    result["peak_rss_mb"] = _peak_rss_mb()
+    return result
+
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _flatten(result, prefix=""):
+    flat = {}
+    for key, value in result.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = value
+    return flat
+
+
+def compare(current, baseline, threshold):
+    """
+    Lists metrics that got worse than the baseline by more than threshold (a fraction).
+    """
+    regressions = []
+    baseline_sizes = {str(run["articles"]): run for run in baseline["runs"]}
+    for run in current["runs"]:
+        previous = baseline_sizes.get(str(run["articles"]))
+        if previous is None:
+            continue
+        now, before = _flatten(run), _flatten(previous)
+        for metric, value in now.items():
+            if metric in ("articles", "triples") or not before.get(metric):
+                continue
+            change = (value - before[metric]) / before[metric]
+            worse = change if metric.endswith(LOWER_IS_BETTER) else -change
+            if worse > threshold:
+                regressions.append(f"{run['articles']} articles: {metric} {before[metric]:.3f} -> {value:.3f} ({change:+.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark graph loading and article filtering on synthetic corpora.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="e.g. 10000 100000 1000000")
+    parser.add_argument("--corpus-dir", default=os.path.join("benchmarks", "corpora"))
+    parser.add_argument("--output", default=None, help="Defaults to benchmarks/results/<timestamp>.json")
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--compare", default=None, help="A previous results file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed slowdown before a regression is reported")
+    args = parser.parse_args()
+
+    os.makedirs(args.corpus_dir, exist_ok=True)
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [],
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        corpus_path = os.path.join(args.corpus_dir, f"corpus-{size}.ttl")
+        if not os.path.exists(corpus_path):
+            print(f"Generating {corpus_path}...")
+            generate_corpus(corpus_path, size, term_count=TERM_COUNT)
+        print(f"Benchmarking {size} articles...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            run = executor.submit(benchmark_size, corpus_path, size, args.repeats).result()
+        report["runs"].append(run)
+        latency = run["filter_latency"]
+        print(
+            f"  load {run['load_seconds']:.2f}s, {run['triples']:,} triples, peak RSS {run['peak_rss_mb']:.0f} MB, "
+            f"filter p50 {latency['1']['p50_ms']:.2f} ms (1 term) / {latency['100']['p50_ms']:.2f} ms (100 terms), "
+            f"{run['filter_queries_per_second']:.0f} queries/s"
+        )
+
+    output = args.output or os.path.join("benchmarks", "results", f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
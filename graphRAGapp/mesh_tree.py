@@ -0,0 +1,165 @@
+import hashlib
+from collections import OrderedDict
+
+import streamlit as st
+
+MAX_CACHED_DESCRIPTORS = 300
+MAX_EXPANDED_NODES = 100
+CHILDREN_PAGE_SIZE = 20
+
+
+class MeshTreeState:
+    """
+    Per-session state of the MeSH refinement tree in Tab 2.
+
+    Node payloads (alternative names and narrower concepts) are stored once per descriptor, so a
+    subtree that appears under several parents is fetched and kept only once, in an LRU bounded
+    by max_descriptors. What is shown is tracked by path: the set of expanded nodes and how many
+    children of each are listed. Only expanded nodes are rendered, and collapsing a node forgets
+    everything below it.
+    """
+
+    def __init__(self, max_descriptors=MAX_CACHED_DESCRIPTORS, max_expanded=MAX_EXPANDED_NODES,
+                 page_size=CHILDREN_PAGE_SIZE):
+        self.max_descriptors = max_descriptors
+        self.max_expanded = max_expanded
+        self.page_size = page_size
+        self.roots = []
+        self.payloads = OrderedDict()
+        self.expanded = OrderedDict()  # path -> None, oldest expansion first
+        self.shown = {}  # path -> number of children listed
+
+    def reset(self, roots):
+        """
+        Starts a new tree for a new search. Cached payloads are kept, since they are per descriptor.
+        """
+        self.roots = list(dict.fromkeys(roots))
+        self.expanded.clear()
+        self.shown.clear()
+
+    def payload(self, term, fetch):
+        """
+        Returns the term's payload, calling fetch(term) if it is not cached.
+        """
+        payload = self.payloads.get(term)
+        if payload is None:
+            payload = self.payloads[term] = fetch(term)
+            while len(self.payloads) > self.max_descriptors:
+                self.payloads.popitem(last=False)
+        else:
+            self.payloads.move_to_end(term)
+        return payload
+
+    def is_expanded(self, path):
+        return path in self.expanded
+
+    def expand(self, path):
+        self.expanded[path] = None
+        self.expanded.move_to_end(path)
+        # Collapse the nodes expanded longest ago once too many are open, but not this node's ancestors
+        while len(self.expanded) > self.max_expanded:
+            oldest = next((p for p in self.expanded if p != path[:len(p)]), None)
+            if oldest is None:
+                break
+            self.collapse(oldest)
+
+    def collapse(self, path):
+        for other in [p for p in self.expanded if p[:len(path)] == path]:
+            del self.expanded[other]
+        for other in [p for p in self.shown if p[:len(path)] == path]:
+            del self.shown[other]
+
+    def visible_count(self, path, total):
+        return min(total, self.shown.get(path, self.page_size))
+
+    def show_more(self, path):
+        self.shown[path] = self.shown.get(path, self.page_size) + self.page_size
+
+
+def _widget_key(kind, path):
+    # Stable widget key for a tree position, independent of how many nodes exist
+    digest = hashlib.sha1("\x1f".join(path).encode("utf-8")).hexdigest()[:16]
+    return f"{kind}_{digest}"
+
+
+def _term_checkbox(label, term, key):
+    if term not in st.session_state.selected_terms:
+        st.session_state.selected_terms[term] = False
+    st.session_state.selected_terms[term] = st.checkbox(
+        label, value=st.session_state.selected_terms[term], key=key
+    )
+
+
+def include_terms(terms):
+    """
+    Selects the terms for filtering, e.g. a descriptor and all of its descendants.
+    """
+    for term in terms:
+        st.session_state.selected_terms[term] = True
+    # Checkboxes already on screen keep their own state; drop it so they show the new selection
+    for key in [key for key in st.session_state if str(key).startswith(("cb_", "alt_"))]:
+        del st.session_state[key]
+
+
+def render_mesh_tree(state, fetch, descendants):
+    """
+    Renders the visible part of the MeSH tree: every root, and below it only expanded nodes,
+    with long lists of narrower concepts shown a page at a time. Expanded nodes with narrower
+    concepts offer to select the node and everything below it in one click.
+
+    fetch and descendants are the backend's term_payload and descendant_terms, so the tree
+    works the same in process and against the HTTP service.
+    """
+    for root in state.roots:
+        _render_node(state, root, (root,), 0, fetch, descendants)
+
+
+def _render_node(state, term, path, level, fetch, descendants):
+    indent = "&emsp;" * (level * 4)
+    prefix = "" if level == 0 else "└─ "
+
+    _term_checkbox(f"{indent}{prefix}{term}", term, _widget_key("cb", path))
+
+    expanded = state.is_expanded(path)
+    expand_label = "Collapse" if expanded else "Expand"
+    if st.button(f"{indent}{prefix}{expand_label} {term}", key=_widget_key("expand", path)):
+        if expanded:
+            state.collapse(path)
+        else:
+            state.expand(path)
+        expanded = not expanded
+
+    if not expanded:
+        return
+
+    payload = state.payload(term, fetch)
+
+    if payload["alt_names"]:
+        st.markdown(f"{indent}**Alternative Names:**", unsafe_allow_html=True)
+        for alt_name in payload["alt_names"]:
+            _term_checkbox(f"{indent}&emsp;&emsp;• {alt_name}", alt_name, _widget_key("alt", path + ("alt", alt_name)))
+
+    if any(payload["narrower_concepts"].values()):
+        if st.button(f"{indent}Include all narrower terms of {term}", key=_widget_key("subtree", path)):
+            include_terms([term] + descendants(term))
+            st.rerun()
+
+    if payload["narrower_concepts"]:
+        st.markdown(f"{indent}**Narrower Concepts:**", unsafe_allow_html=True)
+        for narrower, children in payload["narrower_concepts"].items():
+            st.markdown(f"{indent}&emsp;• **{narrower}**", unsafe_allow_html=True)
+            list_path = path + (narrower,)
+            visible = state.visible_count(list_path, len(children))
+            for child in children[:visible]:
+                if child in path:
+                    # The hierarchy loops back to an ancestor; don't descend again
+                    st.markdown(f"{indent}&emsp;&emsp;_Already displayed {child}, skipping._", unsafe_allow_html=True)
+                    continue
+                _render_node(state, child, list_path + (child,), level + 1, fetch, descendants)
+            if visible < len(children):
+                if st.button(
+                    f"{indent}&emsp;Show more ({len(children) - visible} remaining)",
+                    key=_widget_key("more", list_path),
+                ):
+                    state.show_more(list_path)
+                    st.rerun()
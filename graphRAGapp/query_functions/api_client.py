@@ -0,0 +1,101 @@
+import os
+import threading
+
+import requests
+
+# Base URL of a running service.py; when set, the Streamlit app calls it instead of running the
+# pipeline in its own process
+GRAPHRAG_API_URL = os.environ.get("GRAPHRAG_API_URL")
+
+DEFAULT_TIMEOUT = 120
+
+
+class GraphRAGClient:
+    """
+    HTTP client for service.py with the same functions as query_functions.pipeline.
+
+    The app can use either one as its backend: the pipeline runs every stage in the Streamlit
+    process, while the client sends each stage to the shared service. One requests.Session
+    is kept per thread, so connections to the service are reused.
+    """
+
+    def __init__(self, base_url, timeout=DEFAULT_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def _post(self, path, payload, stream=False):
+        response = self._session().post(f"{self.base_url}{path}", json=payload, timeout=self.timeout, stream=stream)
+        if response.status_code >= 400:
+            raise Exception(f"Graph RAG service error {response.status_code} on {path}: {response.text[:500]}")
+        return response if stream else response.json()
+
+    def prepare_graph(self):
+        self._post("/graph/prepare", {})
+
+    def graph_stats(self):
+        response = self._session().get(f"{self.base_url}/graph/stats", timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def search_articles(self, query_text, max_results=100, max_distance=None):
+        return self._post("/search/articles", {
+            "query_text": query_text, "max_results": max_results, "max_distance": max_distance,
+        })
+
+    def search_terms(self, query_text, limit=10):
+        return self._post("/search/terms", {"query_text": query_text, "limit": limit})
+
+    def term_payload(self, term):
+        return self._post("/terms/payload", {"term": term})
+
+    def descendant_terms(self, term):
+        return self._post("/terms/descendants", {"term": term})
+
+    def filter_articles(self, terms, article_uris, distances=None, ranking_method="linear", vector_weight=0.5,
+                        limit=10):
+        return self._post("/filter", {
+            "terms": list(terms), "article_uris": list(article_uris), "distances": distances,
+            "ranking_method": ranking_method, "vector_weight": vector_weight, "limit": limit,
+        })
+
+    def similar_articles(self, article_uri, k=5):
+        return self._post("/similar", {"article_uri": str(article_uri), "k": k})
+
+    @staticmethod
+    def article_texts(articles):
+        return [f"Title: {article['title']} Abstract: {article['abstract']}" for article in articles]
+
+    def stream_summary(self, texts, user_query):
+        """
+        Yields the summary as the service streams it.
+        """
+        with self._post("/summarize", {"article_texts": list(texts), "user_query": user_query}, stream=True) as response:
+            for text in response.iter_content(chunk_size=None, decode_unicode=True):
+                if text:
+                    yield text
+
+    def run_pipeline(self, query_text, terms, user_query=None, max_results=100, max_distance=None,
+                     ranking_method="linear", vector_weight=0.5, limit=10):
+        return self._post("/pipeline", {
+            "query_text": query_text, "terms": list(terms), "user_query": user_query,
+            "max_results": max_results, "max_distance": max_distance,
+            "ranking_method": ranking_method, "vector_weight": vector_weight, "limit": limit,
+        })
+
+
+def get_backend():
+    """
+    Returns the GraphRAGClient for GRAPHRAG_API_URL if it is set, otherwise the in-process pipeline.
+    """
+    if GRAPHRAG_API_URL:
+        return GraphRAGClient(GRAPHRAG_API_URL)
+    from query_functions import pipeline
+
+    return pipeline
@@ -0,0 +1,321 @@
+import threading
+from array import array
+
+import numpy as np
+from rdflib import RDF, Namespace, URIRef
+
+from query_functions.minhash import MinHashLSH
+from query_functions.ranking import rank_articles
+from query_functions.term_dictionary import TermDictionary
+from query_functions.tracing import span
+
+SCHEMA = Namespace("http://schema.org/")
+EX = Namespace("http://example.org/")
+
+# The articles and links the constructor indexes, as one query
+ARTICLE_TERMS_QUERY = """
+PREFIX schema: <http://schema.org/>
+PREFIX ex: <http://example.org/>
+SELECT DISTINCT ?article ?meshTerm WHERE {
+  ?article a ex:Article ;
+           schema:name ?title ;
+           schema:description ?abstract ;
+           schema:datePublished ?datePublished ;
+           ex:access ?access ;
+           schema:about ?meshTerm .
+  ?meshTerm a ex:MeSHTerm .
+}
+"""
+
+
+class ArticleIndex:
+    """
+    A sparse article x MeSH term matrix, built once per loaded graph.
+
+    Article and term URIs are interned into TermDictionary IDs, and each article's terms are
+    stored as a row of a CSR matrix (indptr/indices NumPy arrays), so the index holds a few
+    integers per article instead of Python sets of URIs. Overlap counts for a set of selected
+    terms are computed for a whole candidate set with vectorized NumPy operations.
+
+    Only articles that the article SPARQL query could return are indexed: typed ex:Article,
+    with a title, abstract, publication date and access level, and linked through
+    schema:about to nodes typed ex:MeSHTerm. An index can also be built without a graph from
+    rows streamed out of a table (from_rows), in which case it keeps the display fields itself,
+    or from one SPARQL query against an on-disk store (from_store).
+    """
+
+    # Display fields returned by fetch(), in the order from_rows stores them
+    FIELDS = ('title', 'abstract', 'datePublished', 'access')
+
+    def __init__(self, graph=None):
+        self.graph = graph
+        self.articles = TermDictionary()
+        self.terms = TermDictionary()
+        self.fields = None  # Per-row display fields when there is no graph
+
+        indptr = array("q", [0])
+        indices = array("i")
+        if graph is not None:
+            mesh_terms = set(graph.subjects(RDF.type, EX.MeSHTerm))
+            self._index_graph_articles(graph.subjects(RDF.type, EX.Article), mesh_terms.__contains__, indptr, indices)
+
+        self.indptr = np.frombuffer(indptr, dtype=np.int64)
+        self.indices = np.frombuffer(indices, dtype=np.int32)
+
+        self._lsh = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, rows, graph=None):
+        """
+        Builds an index from article rows instead of a graph, consuming them as they arrive.
+
+        Args:
+            rows (iterable): (article_uri, fields, term_uris) tuples, where fields is a dict
+                with the FIELDS keys. Repeated articles and articles without terms are skipped.
+            graph: When given, fetch() reads the display fields from it and fields may be None.
+
+        Returns:
+            ArticleIndex: An index whose fetch() reads the stored fields or the graph.
+        """
+        index = cls()
+        index.graph = graph
+        index.fields = [] if graph is None else None
+        indptr = array("q", [0])
+        indices = array("i")
+        for article_uri, fields, term_uris in rows:
+            article_uri = URIRef(str(article_uri))
+            if article_uri in index.articles.ids:
+                continue
+            term_ids = sorted({index.terms.intern(URIRef(str(uri))) for uri in term_uris})
+            if not term_ids:
+                continue
+            index.articles.intern(article_uri)
+            indices.extend(term_ids)
+            indptr.append(len(indices))
+            if index.fields is not None:
+                index.fields.append(tuple(fields[name] for name in cls.FIELDS))
+
+        index.indptr = np.frombuffer(indptr, dtype=np.int64)
+        index.indices = np.frombuffer(indices, dtype=np.int32)
+        return index
+
+    @classmethod
+    def from_store(cls, graph):
+        """
+        Builds an index from a graph that answers SPARQL quickly, such as an on-disk store.
+
+        The article/term links are read with a single query instead of walking the graph
+        article by article; titles and abstracts stay in the store and are fetched on demand.
+        """
+        terms_by_article = {}
+        for row in graph.query(ARTICLE_TERMS_QUERY):
+            terms_by_article.setdefault(row['article'], []).append(row['meshTerm'])
+        return cls.from_rows(
+            ((article, None, term_uris) for article, term_uris in terms_by_article.items()), graph=graph
+        )
+
+    def appended(self, graph, article_uris):
+        """
+        Returns a new index with articles added to a graph-backed index, without a rebuild.
+
+        Used when articles are appended to the graph file (graph_builder --append). This index
+        is left unchanged, so queries still holding it are unaffected: the dictionaries are
+        copied, the CSR arrays extended, and a similarity index that was already built gets
+        the new articles' signatures instead of being rebuilt.
+
+        Args:
+            graph: The graph with both the indexed and the new articles.
+            article_uris (iterable): The new articles; ones already indexed are skipped, like
+                articles the article query could not return.
+
+        Returns:
+            ArticleIndex: The extended index.
+        """
+        if self.fields is not None:
+            raise ValueError("Only an index built from a graph can be extended with appended articles.")
+        index = ArticleIndex()
+        index.graph = graph
+        index.articles = self.articles.copy()
+        index.terms = self.terms.copy()
+
+        indptr = array("q", [0])
+        indices = array("i")
+        new_articles = (article for article in article_uris if article not in index.articles.ids)
+        index._index_graph_articles(
+            new_articles, lambda term: (term, RDF.type, EX.MeSHTerm) in graph, indptr, indices
+        )
+        added_indptr = np.frombuffer(indptr, dtype=np.int64)
+        added_indices = np.frombuffer(indices, dtype=np.int32)
+        index.indptr = np.concatenate([self.indptr, self.indptr[-1] + added_indptr[1:]])
+        index.indices = np.concatenate([self.indices, added_indices])
+
+        lsh = self._lsh
+        if lsh is not None and len(added_indptr) > 1:
+            lsh = lsh.copy()
+            lsh.add_many(np.arange(len(self), len(index)), lsh.signatures(added_indptr, added_indices))
+        index._lsh = lsh
+        return index
+
+    def _index_graph_articles(self, articles, is_mesh_term, indptr, indices):
+        # Appends a CSR row for every article with all its fields and at least one MeSH term
+        graph = self.graph
+        for article in articles:
+            if not self._has_article_fields(article):
+                continue
+            term_ids = sorted({self.terms.intern(t) for t in graph.objects(article, SCHEMA.about) if is_mesh_term(t)})
+            if not term_ids:
+                continue
+            self.articles.intern(article)
+            indices.extend(term_ids)
+            indptr.append(len(indices))
+
+    def __len__(self):
+        return len(self.articles)
+
+    def _has_article_fields(self, article):
+        return all(
+            self.graph.value(article, predicate) is not None
+            for predicate in (SCHEMA.name, SCHEMA.description, SCHEMA.datePublished, EX.access)
+        )
+
+    def row_terms(self, row):
+        """
+        Returns the term IDs of the article in the given row.
+        """
+        return self.indices[self.indptr[row]:self.indptr[row + 1]]
+
+    def overlap(self, article_uris, term_uris):
+        """
+        Counts how many of the selected MeSH terms each candidate article has.
+
+        This is the product of the candidates' rows of the matrix with the 0/1 vector of
+        selected terms, done as one gather over the rows' term IDs.
+
+        Args:
+            article_uris (iterable): Candidate article URIs (e.g. the Tab 1 results).
+            term_uris (iterable): URIs of the selected MeSH terms.
+
+        Returns:
+            tuple: (rows, counts) arrays for the candidates with at least one selected term,
+                in the order the candidates were given.
+        """
+        rows = self.articles.ids_of(article_uris)
+        selected = np.zeros(len(self.terms), dtype=bool)
+        selected[self.terms.ids_of(term_uris)] = True
+        if len(rows) == 0 or not selected.any():
+            return rows[:0], np.zeros(0, dtype=np.int64)
+
+        counts = self._row_overlap(rows, selected)
+        matched = counts > 0
+        return rows[matched], counts[matched]
+
+    def _row_overlap(self, rows, selected):
+        # Number of entries of each row that are set in the boolean term mask
+        indptr, indices = self.indptr, self.indices
+        starts = indptr[rows]
+        lengths = indptr[rows + 1] - starts
+        # Positions of every row's entries in indices, concatenated row by row
+        row_offsets = np.cumsum(lengths) - lengths
+        positions = np.repeat(starts - row_offsets, lengths) + np.arange(lengths.sum())
+        hits = selected[indices[positions]]
+        return np.bincount(np.repeat(np.arange(len(rows)), lengths)[hits], minlength=len(rows))
+
+    def similarity_index(self):
+        """
+        Returns the MinHash-LSH index over every article's MeSH terms, building it on first use.
+        """
+        if self._lsh is None:
+            with self._lock:
+                if self._lsh is None:
+                    lsh = MinHashLSH()
+                    lsh.add_many(np.arange(len(self)), lsh.signatures(self.indptr, self.indices))
+                    self._lsh = lsh
+        return self._lsh
+
+    def similar(self, article_uri, k=5, max_candidates=2000):
+        """
+        Finds the articles whose MeSH terms are most similar to those of the given article.
+
+        Candidates come from the MinHash-LSH index; the max_candidates that collide in the most
+        bands are then scored by their exact Jaccard similarity.
+
+        Args:
+            article_uri (str): URI of an indexed article.
+            k (int): Number of similar articles to return.
+            max_candidates (int): Most candidates verified per query.
+
+        Returns:
+            list: (article_uri, jaccard) tuples, most similar first.
+        """
+        row = self.articles.id_of(article_uri)
+        if row is None:
+            return []
+        members = self.row_terms(row)
+        lsh = self.similarity_index()
+        candidates, _ = lsh.candidates(lsh.signature(members))
+        candidates = candidates[candidates != row][:max_candidates]
+        if len(candidates) == 0:
+            return []
+
+        selected = np.zeros(len(self.terms), dtype=bool)
+        selected[members] = True
+        intersection = self._row_overlap(candidates, selected)
+        union = len(members) + (self.indptr[candidates + 1] - self.indptr[candidates]) - intersection
+        jaccard = intersection / union
+
+        best = np.argsort(-jaccard, kind="stable")[:k]
+        return [(self.articles[candidates[i]], float(jaccard[i])) for i in best if jaccard[i] > 0]
+
+    def fetch(self, article_uri):
+        """
+        Returns the display fields of a single article.
+        """
+        if self.fields is not None:
+            row = self.articles.id_of(article_uri)
+            return dict(zip(self.FIELDS, self.fields[row] if row is not None else (None,) * len(self.FIELDS)))
+        g = self.graph
+        return {
+            'title': g.value(article_uri, SCHEMA.name),
+            'abstract': g.value(article_uri, SCHEMA.description),
+            'datePublished': g.value(article_uri, SCHEMA.datePublished),
+            'access': g.value(article_uri, EX.access),
+        }
+
+    def top_articles(self, article_uris, term_uris, vector_distances=None, ranking_method="linear",
+                     vector_weight=0.5, k=10):
+        """
+        Matches the candidates against the selected terms, ranks them and fetches the best k.
+
+        Titles and abstracts are read only for the k articles that are returned.
+
+        Returns:
+            list: (article_uri, data) tuples, best first, in the shape query_rdf returns.
+        """
+        term_uris = {str(uri) for uri in term_uris}
+        term_ids = self.terms.ids_of(term_uris)
+        selected_count = len(term_uris)
+        with span("rdf.match", terms=selected_count) as s:
+            rows, counts = self.overlap(article_uris, term_uris)
+            s.set(matches=len(rows))
+
+        distances = None
+        if vector_distances:
+            by_uri = {str(uri): distance for uri, distance in vector_distances.items()}
+            distances = np.array([by_uri.get(str(self.articles[row]), np.nan) for row in rows], dtype=np.float64)
+
+        ranked = rank_articles(
+            counts, selected_count, distances,
+            method=ranking_method, vector_weight=vector_weight, k=k,
+        )
+
+        ranked_articles = []
+        for position, score in ranked:
+            row = rows[position]
+            article_uri = self.articles[row]
+            data = self.fetch(article_uri)
+            row_terms = self.row_terms(row)
+            data['meshTerms'] = {str(self.terms[t]) for t in row_terms[np.isin(row_terms, term_ids)]}
+            data['score'] = score
+            ranked_articles.append((article_uri, data))
+        return ranked_articles
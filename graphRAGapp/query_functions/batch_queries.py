@@ -0,0 +1,211 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from weaviate.classes.query import MetadataQuery
+
+from query_functions.tracing import span
+from query_functions.vector_index import get_local_index, use_local_backend
+from query_functions.weaviate_queries import (
+    ARTICLE_SEARCH_PROPERTIES,
+    article_result,
+    initialize_async_weaviate_client,
+)
+
+DEFAULT_CONCURRENCY = 8
+DEFAULT_MAX_RETRIES = 3
+LOCAL_BATCH_SIZE = 256
+
+
+class AsyncRateLimiter:
+    """
+    Spaces calls at least 1 / rate seconds apart across all tasks sharing the limiter.
+    """
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def _search_many(search, query_texts, concurrency, max_retries, rate_limit, return_exceptions):
+    # Runs search(query) for every query with bounded concurrency and retries, results in input order
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = AsyncRateLimiter(rate_limit) if rate_limit else None
+
+    async def run(query_text):
+        async with semaphore:
+            for attempt in range(max_retries + 1):
+                if limiter is not None:
+                    await limiter.acquire()
+                try:
+                    return await search(query_text)
+                except Exception as e:
+                    if attempt == max_retries:
+                        raise
+                    delay = 0.5 * 2 ** attempt * (1 + random.random())
+                    print(f"Search for '{query_text}' failed ({e}); retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+
+    return await asyncio.gather(*(run(query_text) for query_text in query_texts), return_exceptions=return_exceptions)
+
+
+async def search_collection_async(collection, query_texts, limit=10, client=None, concurrency=DEFAULT_CONCURRENCY,
+                                  max_retries=DEFAULT_MAX_RETRIES, rate_limit=None, return_properties=None,
+                                  return_exceptions=False):
+    """
+    Runs many vector searches against one collection concurrently.
+
+    With the Weaviate backend every query is a near_text request on one async client, with at
+    most concurrency requests in flight, up to max_retries retries with exponential backoff per
+    query, and at most rate_limit requests started per second. With the local backend the
+    queries are embedded and searched in batches instead.
+
+    Args:
+        collection (str): "Article" or "term".
+        query_texts (list): The query strings.
+        limit (int): Results per query.
+        client: A connected WeaviateAsyncClient; one is opened and closed if omitted.
+        concurrency (int): Most requests in flight at once.
+        max_retries (int): Retries per query after the first attempt.
+        rate_limit (float): Most requests started per second, if given.
+        return_properties (list): Properties to return; Article searches default to
+            ARTICLE_SEARCH_PROPERTIES, term searches to all properties.
+        return_exceptions (bool): Put a query's final exception in its place in the results
+            instead of raising it.
+
+    Returns:
+        list: One result list per query, in input order, each in the {"uuid", "properties", "distance"} shape.
+    """
+    query_texts = list(query_texts)
+    if collection == "Article" and return_properties is None:
+        return_properties = ARTICLE_SEARCH_PROPERTIES
+
+    def to_result(uuid, properties, distance):
+        if collection == "Article":
+            return article_result(uuid, properties, distance, return_properties)
+        if return_properties:
+            properties = {name: properties.get(name) for name in return_properties}
+        return {"uuid": uuid, "properties": properties, "distance": distance}
+
+    with span("vector.batch", collection=collection, queries=len(query_texts), concurrency=concurrency):
+        if use_local_backend():
+            index = get_local_index(collection)
+            results = []
+            for start in range(0, len(query_texts), LOCAL_BATCH_SIZE):
+                batch = await asyncio.to_thread(index.search, query_texts[start:start + LOCAL_BATCH_SIZE], limit)
+                results.extend(
+                    [to_result(hit["uuid"], hit["properties"], hit["distance"]) for hit in hits] for hits in batch
+                )
+            return results
+
+        owns_client = client is None
+        if owns_client:
+            client = initialize_async_weaviate_client()
+            await client.connect()
+        try:
+            target = client.collections.get(collection)
+
+            async def search(query_text):
+                response = await target.query.near_text(
+                    query=query_text,
+                    limit=limit,
+                    return_properties=return_properties,
+                    return_metadata=MetadataQuery(distance=True),
+                )
+                return [to_result(obj.uuid, obj.properties, obj.metadata.distance) for obj in response.objects]
+
+            return await _search_many(search, query_texts, concurrency, max_retries, rate_limit, return_exceptions)
+        finally:
+            if owns_client:
+                await client.close()
+
+
+async def query_weaviate_articles_async(query_texts, limit=10, **kwargs):
+    """
+    Article searches for many queries at once; see search_collection_async for the options.
+    """
+    return await search_collection_async("Article", query_texts, limit, **kwargs)
+
+
+async def query_weaviate_terms_async(query_texts, limit=10, **kwargs):
+    """
+    MeSH term searches for many queries at once; see search_collection_async for the options.
+    """
+    return await search_collection_async("term", query_texts, limit, **kwargs)
+
+
+def read_queries(path):
+    """
+    Reads one query per line, either plain text or a JSON object with a "query" field.
+    """
+    queries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                line = json.loads(line)["query"]
+            queries.append(line)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many vector searches concurrently and write JSON-lines results.")
+    parser.add_argument("queries_path", help="One query per line (plain text or {\"query\": ...})")
+    parser.add_argument("--output", default="-", help="Output JSONL file (default: stdout)")
+    parser.add_argument("--collection", choices=["Article", "term"], default="Article")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--retries", type=int, default=DEFAULT_MAX_RETRIES)
+    parser.add_argument("--rate-limit", type=float, default=None, help="Most requests started per second")
+    args = parser.parse_args()
+
+    queries = read_queries(args.queries_path)
+    start = time.perf_counter()
+    results = asyncio.run(search_collection_async(
+        args.collection, queries, args.limit,
+        concurrency=args.concurrency, max_retries=args.retries, rate_limit=args.rate_limit,
+        return_exceptions=True,
+    ))
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    out = open(args.output, "w", encoding="utf-8") if args.output != "-" else None
+    try:
+        for query_text, result in zip(queries, results):
+            if isinstance(result, BaseException):
+                failed += 1
+                record = {"query": query_text, "error": f"{type(result).__name__}: {result}"}
+            else:
+                record = {"query": query_text, "results": result}
+            line = json.dumps(record, default=str)
+            if out is not None:
+                out.write(line + "\n")
+            else:
+                print(line)
+    finally:
+        if out is not None:
+            out.close()
+
+    print(
+        f"{len(queries)} queries in {elapsed:.1f}s ({len(queries) / elapsed if elapsed else 0:.1f} queries/s), "
+        f"{failed} failed",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
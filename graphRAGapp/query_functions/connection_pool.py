@@ -0,0 +1,139 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ConnectionPool:
+    """
+    Long-lived connections (Weaviate clients, Databricks SQL connections, ...) shared by every
+    session in the server process.
+
+    Clients are created lazily up to max_size and handed out one caller at a time. A client
+    that has been idle for longer than health_check_interval seconds is checked with
+    health_check(client) (client.is_ready() by default) before it is handed out, and a client
+    that fails the check, or whose caller raised, is closed and replaced with a fresh connection.
+    """
+
+    def __init__(self, factory, max_size=4, health_check_interval=30.0, acquire_timeout=30.0, health_check=None,
+                 name="connection"):
+        self.factory = factory
+        self.health_check = health_check or (lambda client: client.is_ready())
+        self.name = name
+        self.max_size = max_size
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = []  # (client, last_verified) pairs, most recently used last
+        self._size = 0
+        self._closed = False
+        self._condition = threading.Condition()
+        self.stats = {
+            "created": 0,
+            "reused": 0,
+            "reconnects": 0,
+            "health_check_failures": 0,
+            "closed": 0,
+        }
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager yielding a healthy client that is returned to the pool afterwards.
+        """
+        client = self._acquire()
+        failed = False
+        try:
+            yield client
+        except BaseException:
+            # Includes GeneratorExit and interrupts, so an abandoned checkout still frees its slot
+            failed = True
+            raise
+        finally:
+            self._release(client, verify=failed)
+
+    def close(self):
+        """
+        Closes every idle client and refuses new checkouts. Clients in use are closed on return.
+        """
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for client, _ in idle:
+            self._close_client(client)
+
+    def metrics(self):
+        with self._condition:
+            in_use = self._size - len(self._idle)
+            return dict(self.stats, size=self._size, idle=len(self._idle), in_use=in_use)
+
+    def _acquire(self):
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError(f"The {self.name} pool has been closed.")
+                if self._idle:
+                    client, last_verified = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    client, last_verified = None, None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"Timed out waiting for a {self.name} from the pool.")
+                self._condition.wait(remaining)
+
+        try:
+            if client is None:
+                client = self._connect()
+            elif time.monotonic() - last_verified > self.health_check_interval and not self._is_healthy(client):
+                with self._condition:
+                    self.stats["health_check_failures"] += 1
+                    self.stats["reconnects"] += 1
+                self._close_client(client)
+                client = self._connect()
+            else:
+                with self._condition:
+                    self.stats["reused"] += 1
+        except Exception:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        return client
+
+    def _release(self, client, verify=False):
+        healthy = not verify or self._is_healthy(client)
+        with self._condition:
+            if healthy and not self._closed:
+                self._idle.append((client, time.monotonic()))
+                self._condition.notify()
+                return
+            self._size -= 1
+            if not healthy:
+                self.stats["health_check_failures"] += 1
+            self._condition.notify()
+        self._close_client(client)
+
+    def _connect(self):
+        client = self.factory()
+        with self._condition:
+            self.stats["created"] += 1
+        return client
+
+    def _is_healthy(self, client):
+        try:
+            return self.health_check(client)
+        except Exception:
+            return False
+
+    def _close_client(self, client):
+        try:
+            client.close()
+        except Exception as e:
+            print(f"Error closing {self.name}: {e}")
+        with self._condition:
+            self.stats["closed"] += 1
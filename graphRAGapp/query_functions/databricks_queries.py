@@ -1,16 +1,165 @@
-from databricks import sql
+import atexit
+import os
+import threading
+from datetime import date
+
 from config import DATABRICKS_SERVER_HOSTNAME, DATABRICKS_ACCESS_TOKEN
+from rdflib import XSD, Literal
+
+from query_functions.article_index import ArticleIndex
+from query_functions.connection_pool import ConnectionPool
+from query_functions.graph_builder import random_article_metadata
+from query_functions.mesh_terms import convert_to_uri, create_article_uri, parse_mesh_terms
+from query_functions.tracing import count_of, span, traced
+
+DATABRICKS_HTTP_PATH = os.environ.get("DATABRICKS_HTTP_PATH", "/sql/1.0/warehouses/your-warehouse-id")
+
+# Table with the PubMed dataset's Title, abstractText and meshMajor columns; when set, the app
+# builds its article index from this table instead of parsing PubMedGraph.ttl
+DATABRICKS_ARTICLE_TABLE = os.environ.get("DATABRICKS_ARTICLE_TABLE")
 
-def query_databricks(query):
-    connection = sql.connect(
+ARROW_BATCH_ROWS = 10000
+
+
+def _connect():
+    from databricks import sql
+
+    return sql.connect(
         server_hostname=DATABRICKS_SERVER_HOSTNAME,
-        http_path="/sql/1.0/warehouses/your-warehouse-id",
+        http_path=DATABRICKS_HTTP_PATH,
         access_token=DATABRICKS_ACCESS_TOKEN,
     )
-    try:
+
+
+def _connection_is_healthy(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+        cursor.fetchall()
+    return True
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool():
+    """
+    Returns the process-wide pool of Databricks SQL connections, creating it on first use.
+    """
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                _connection_pool = ConnectionPool(
+                    _connect, max_size=4, health_check_interval=300.0,
+                    health_check=_connection_is_healthy, name="Databricks connection",
+                )
+                atexit.register(_connection_pool.close)
+    return _connection_pool
+
+
+@traced("databricks.query", result_attributes=count_of("rows"))
+def query_databricks(query, parameters=None):
+    with get_connection_pool().connection() as connection:
         with connection.cursor() as cursor:
-            cursor.execute(query)
+            cursor.execute(query, parameters)
             results = cursor.fetchall()
-        return results
-    finally:
-        connection.close()
+    return results
+
+
+def iter_arrow_batches(query, parameters=None, batch_rows=ARROW_BATCH_ROWS, pool=None):
+    """
+    Runs a query and yields its result as Arrow tables of at most batch_rows rows.
+
+    Only one batch is held at a time, so memory stays bounded however large the result is.
+    The pooled connection is held until the generator is exhausted, closed or garbage
+    collected; the cursor is then closed and the connection goes back to the pool, which
+    checks it first if the result was not read to the end.
+    """
+    pool = pool or get_connection_pool()
+    with pool.connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(query, parameters)
+            while True:
+                batch = cursor.fetchmany_arrow(batch_rows)
+                if batch is None or batch.num_rows == 0:
+                    return
+                yield batch
+        finally:
+            cursor.close()
+
+
+def article_rows(batches, today=None):
+    """
+    Turns Arrow batches of the PubMed dataset into ArticleIndex.from_rows rows.
+
+    Article and MeSH term URIs are made exactly as graph_builder makes them, so an index built
+    from the table matches one parsed from the graph file. datePublished and access columns are
+    used when the query returns them; otherwise they get the graph builder's seeded values.
+    """
+    today = today or date.today()
+    for batch in batches:
+        columns = batch.to_pydict()
+        for i in range(batch.num_rows):
+            title = columns["Title"][i]
+            if not isinstance(title, str) or not title.strip():
+                continue
+            article_uri = create_article_uri(title)
+            published, access = random_article_metadata(article_uri, today)
+            if "datePublished" in columns and columns["datePublished"][i] is not None:
+                published = str(columns["datePublished"][i])
+            if "access" in columns and columns["access"][i] is not None:
+                access = int(columns["access"][i])
+            fields = {
+                'title': Literal(title, datatype=XSD.string),
+                'abstract': Literal(columns["abstractText"][i] or '', datatype=XSD.string),
+                'datePublished': Literal(published, datatype=XSD.date),
+                'access': Literal(access, datatype=XSD.integer),
+            }
+            term_uris = [convert_to_uri(term) for term in parse_mesh_terms(columns["meshMajor"][i])]
+            yield article_uri, fields, [uri for uri in term_uris if uri is not None]
+
+
+def load_article_index(table=None, query=None, batch_rows=ARROW_BATCH_ROWS, pool=None):
+    """
+    Builds an ArticleIndex straight from a Databricks table, streaming Arrow batches into it.
+
+    Args:
+        table (str): Table with Title, abstractText and meshMajor columns (default
+            DATABRICKS_ARTICLE_TABLE).
+        query (str): A query returning those columns, instead of reading the whole table.
+        batch_rows (int): Rows fetched per Arrow batch.
+        pool (ConnectionPool): Defaults to the process-wide pool.
+
+    Returns:
+        ArticleIndex: The index, with the display fields held in memory.
+    """
+    query = query or f"SELECT Title, abstractText, meshMajor FROM {table or DATABRICKS_ARTICLE_TABLE}"
+    with span("databricks.load_index", batch_rows=batch_rows) as s:
+        index = ArticleIndex.from_rows(article_rows(iter_arrow_batches(query, batch_rows=batch_rows, pool=pool)))
+        s.set(articles=len(index))
+    return index
+
+
+_table_index = None
+_table_index_lock = threading.Lock()
+
+
+def use_table_articles():
+    return bool(DATABRICKS_ARTICLE_TABLE)
+
+
+def get_table_article_index(refresh=False):
+    """
+    Returns the process-wide ArticleIndex loaded from DATABRICKS_ARTICLE_TABLE.
+
+    The table is read on first use (or when refresh is True); a refresh builds the new index
+    off to the side and swaps it in, so running queries keep the previous one.
+    """
+    global _table_index
+    if _table_index is None or refresh:
+        with _table_index_lock:
+            if _table_index is None or refresh:
+                _table_index = load_article_index()
+    return _table_index
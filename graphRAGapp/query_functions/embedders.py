@@ -0,0 +1,90 @@
+import hashlib
+import os
+import re
+
+import numpy as np
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+class HashingEmbedder:
+    """
+    Deterministic, fully offline embedder based on signed feature hashing of word unigrams
+    and bigrams. Good enough for tests, benchmarks and offline development; use a learned
+    embedder for real relevance.
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim=384):
+        self.dim = dim
+
+    def config(self):
+        return {"dim": self.dim}
+
+    def _bucket(self, token):
+        digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        return value % self.dim, 1.0 if (value >> 63) & 1 else -1.0
+
+    def embed(self, texts):
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = TOKEN_PATTERN.findall((text or "").lower())
+            features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+            for feature in features:
+                bucket, sign = self._bucket(feature)
+                vectors[row, bucket] += sign
+        return normalize(vectors)
+
+
+class OpenAIEmbedder:
+    """
+    Embeds text with the OpenAI embeddings API, the same family of models text2vec-openai uses.
+    """
+
+    name = "openai"
+
+    def __init__(self, model="text-embedding-3-small", batch_size=512, client=None):
+        self.model = model
+        self.batch_size = batch_size
+        self._client = client
+
+    def config(self):
+        return {"model": self.model}
+
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import OpenAI
+            self._client = OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+        return self._client
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = [text or " " for text in texts[start:start + self.batch_size]]
+            response = self.client.embeddings.create(model=self.model, input=batch)
+            vectors.extend(item.embedding for item in response.data)
+        return normalize(np.asarray(vectors, dtype=np.float32))
+
+
+EMBEDDERS = {
+    HashingEmbedder.name: HashingEmbedder,
+    OpenAIEmbedder.name: OpenAIEmbedder,
+}
+
+
+def get_embedder(name, **kwargs):
+    """
+    Returns an embedder by name ("hashing" or "openai").
+    """
+    if name not in EMBEDDERS:
+        raise ValueError(f"Unknown embedder '{name}'. Choose one of: {', '.join(EMBEDDERS)}")
+    return EMBEDDERS[name](**kwargs)
+
+
+def normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
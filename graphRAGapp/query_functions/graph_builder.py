@@ -0,0 +1,240 @@
+import argparse
+import gzip
+import os
+import random
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+from query_functions.mesh_terms import convert_to_uri, create_article_uri, parse_mesh_terms
+
+RDF_TYPE = "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"
+RDF_PROPERTY = "http://www.w3.org/1999/02/22-rdf-syntax-ns#Property"
+RDFS_CLASS = "http://www.w3.org/2000/01/rdf-schema#Class"
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+XSD = "http://www.w3.org/2001/XMLSchema#"
+SCHEMA = "http://schema.org/"
+EX = "http://example.org/"
+
+TURTLE_PREFIXES = (
+    f"@prefix ex: <{EX}> .\n"
+    f"@prefix rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#> .\n"
+    f"@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .\n"
+    f"@prefix schema: <{SCHEMA}> .\n"
+    f"@prefix xsd: <{XSD}> .\n\n"
+)
+
+# The class and property declarations the notebook adds to every graph
+SCHEMA_TRIPLES = [
+    (f"{EX}Article", RDF_TYPE, RDFS_CLASS),
+    (f"{EX}MeSHTerm", RDF_TYPE, RDFS_CLASS),
+    (f"{SCHEMA}name", RDF_TYPE, RDF_PROPERTY),
+    (f"{SCHEMA}description", RDF_TYPE, RDF_PROPERTY),
+    (f"{SCHEMA}datePublished", RDF_TYPE, RDF_PROPERTY),
+    (f"{EX}access", RDF_TYPE, RDF_PROPERTY),
+]
+
+CSV_COLUMNS = ["Title", "abstractText", "meshMajor"]
+
+
+def _literal(value, datatype):
+    escaped = (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+    return f'"{escaped}"^^<{XSD}{datatype}>'
+
+
+def random_article_metadata(article_uri, today):
+    # Seeded by the article URI so rebuilding or appending gives every article the same values
+    rng = random.Random(zlib.crc32(article_uri.encode("utf-8")))
+    published = today - timedelta(days=5 * 365) + timedelta(days=rng.randint(0, 5 * 365))
+    return published.isoformat(), rng.randint(1, 10)
+
+
+def rows_to_triples(rows, today=None):
+    """
+    Converts PubMed dataset rows into N-Triples statements.
+
+    Mirrors the notebook's graph: each article gets a type, title, abstract, a random
+    publication date in the last five years, a random access level from 1 to 10, and a
+    schema:about link to every MeSH term in its meshMajor list.
+
+    Args:
+        rows (list): (title, abstract, meshMajor) tuples.
+        today (date): Reference date for the random publication dates.
+
+    Returns:
+        tuple: (articles, terms) where articles is a list of (article_uri, statements) and
+        terms maps each MeSH term URI to its label.
+    """
+    today = today or date.today()
+    articles = []
+    terms = {}
+    for title, abstract, mesh_major in rows:
+        if not isinstance(title, str) or not title.strip():
+            continue
+        article_uri = create_article_uri(title)
+        published, access = random_article_metadata(article_uri, today)
+        lines = [
+            f"<{article_uri}> <{RDF_TYPE}> <{EX}Article> .",
+            f"<{article_uri}> <{SCHEMA}name> {_literal(title, 'string')} .",
+            f"<{article_uri}> <{SCHEMA}description> {_literal(abstract if isinstance(abstract, str) else '', 'string')} .",
+            f"<{article_uri}> <{SCHEMA}datePublished> {_literal(published, 'date')} .",
+            f"<{article_uri}> <{EX}access> {_literal(access, 'integer')} .",
+        ]
+        for term in parse_mesh_terms(mesh_major):
+            term_uri = convert_to_uri(term)
+            if term_uri is None:
+                continue
+            term_uri = str(term_uri)
+            terms.setdefault(term_uri, term.replace('_', ' '))
+            lines.append(f"<{article_uri}> <{SCHEMA}about> <{term_uri}> .")
+        articles.append((article_uri, "\n".join(lines) + "\n"))
+    return articles, terms
+
+
+def _term_triples(term_uri, label):
+    return (
+        f"<{term_uri}> <{RDF_TYPE}> <{EX}MeSHTerm> .\n"
+        f"<{term_uri}> <{RDFS_LABEL}> {_literal(label, 'string')} .\n"
+    )
+
+
+def _open_output(path, mode):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _read_state(path):
+    if not os.path.exists(path):
+        return set()
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def _iter_row_chunks(csv_path, chunksize, limit=None):
+    import pandas as pd
+
+    remaining = limit
+    for chunk in pd.read_csv(csv_path, usecols=CSV_COLUMNS, chunksize=chunksize, dtype=str):
+        if remaining is not None:
+            chunk = chunk.head(remaining)
+            remaining -= len(chunk)
+        yield list(chunk[CSV_COLUMNS].itertuples(index=False, name=None))
+        if remaining is not None and remaining <= 0:
+            break
+
+
+def build_graph(csv_path, output_path, rdf_format="nt", chunksize=10000, workers=None, append=False, limit=None):
+    """
+    Streams the PubMed dataset CSV into an RDF file without holding the graph in memory.
+
+    The CSV is read in chunks and each chunk is turned into triples in a process pool. The
+    triples are written straight to disk in input order. At most two chunks per worker are in
+    flight at a time. Output ending in .gz is gzip-compressed.
+
+    N-Triples ("nt") output is also valid Turtle, so the result can be loaded with
+    get_shared_graph(output_path, rdf_format="nt") or as "ttl". With append=True, articles and
+    MeSH terms already in the file are skipped and only new ones are written. The URIs written
+    so far are kept in <output_path>.articles and <output_path>.terms for that purpose.
+
+    Args:
+        csv_path (str): PubMed MultiLabel Text Classification CSV (Title, abstractText, meshMajor).
+        output_path (str): Destination .nt/.ttl file, optionally ending in .gz.
+        rdf_format (str): "nt" or "ttl".
+        chunksize (int): CSV rows per chunk.
+        workers (int): Worker processes; defaults to the CPU count.
+        append (bool): Add new articles to an existing file instead of rebuilding it.
+        limit (int): Only read the first limit rows.
+
+    Returns:
+        dict: Counts of articles and terms written, skipped duplicates, and elapsed seconds.
+    """
+    if rdf_format not in ("nt", "ttl"):
+        raise ValueError("rdf_format must be 'nt' or 'ttl'.")
+
+    articles_state_path = f"{output_path}.articles"
+    terms_state_path = f"{output_path}.terms"
+    appending = append and os.path.exists(output_path)
+    seen_articles = _read_state(articles_state_path) if appending else set()
+    seen_terms = _read_state(terms_state_path) if appending else set()
+
+    start = time.perf_counter()
+    stats = {"articles": 0, "terms": 0, "duplicates": 0}
+    workers = workers or os.cpu_count() or 1
+    state_mode = "a" if appending else "w"
+
+    with _open_output(output_path, "a" if appending else "w") as out, \
+            open(articles_state_path, state_mode, encoding="utf-8") as articles_state, \
+            open(terms_state_path, state_mode, encoding="utf-8") as terms_state, \
+            ProcessPoolExecutor(max_workers=workers) as executor:
+
+        if not appending:
+            if rdf_format == "ttl":
+                out.write(TURTLE_PREFIXES)
+            out.writelines(f"<{s}> <{p}> <{o}> .\n" for s, p, o in SCHEMA_TRIPLES)
+
+        def write(result):
+            articles, terms = result
+            for term_uri, label in terms.items():
+                if term_uri not in seen_terms:
+                    seen_terms.add(term_uri)
+                    out.write(_term_triples(term_uri, label))
+                    terms_state.write(term_uri + "\n")
+                    stats["terms"] += 1
+            for article_uri, statements in articles:
+                if article_uri in seen_articles:
+                    stats["duplicates"] += 1
+                    continue
+                seen_articles.add(article_uri)
+                out.write(statements)
+                articles_state.write(article_uri + "\n")
+                stats["articles"] += 1
+
+        pending = deque()
+        for rows in _iter_row_chunks(csv_path, chunksize, limit):
+            pending.append(executor.submit(rows_to_triples, rows))
+            if len(pending) >= workers * 2:
+                write(pending.popleft().result())
+        while pending:
+            write(pending.popleft().result())
+
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build PubMedGraph from the PubMed MultiLabel dataset CSV.")
+    parser.add_argument("csv_path")
+    parser.add_argument("output_path", help="e.g. PubMedGraph.ttl, PubMedGraph.nt or PubMedGraph.nt.gz")
+    parser.add_argument("--format", dest="rdf_format", choices=["nt", "ttl"], default=None,
+                        help="Defaults to the output file extension")
+    parser.add_argument("--chunksize", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--append", action="store_true", help="Only add articles not already in the output")
+    parser.add_argument("--limit", type=int, default=None, help="Only read the first N rows")
+    args = parser.parse_args()
+
+    rdf_format = args.rdf_format
+    if rdf_format is None:
+        rdf_format = "ttl" if args.output_path.removesuffix(".gz").endswith(".ttl") else "nt"
+
+    stats = build_graph(
+        args.csv_path, args.output_path, rdf_format=rdf_format, chunksize=args.chunksize,
+        workers=args.workers, append=args.append, limit=args.limit,
+    )
+    print(
+        f"Wrote {stats['articles']} articles and {stats['terms']} MeSH terms to {args.output_path} "
+        f"in {stats['seconds']:.1f}s ({stats['duplicates']} duplicate articles skipped)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,316 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 7 * 24 * 3600  # MeSH is released yearly, a week-old answer is still good
+
+
+class _InFlight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class TermCache:
+    """
+    Two-tier memoization cache for MeSH lookups keyed by sanitized term.
+
+    The first tier is an in-process LRU of at most max_entries values. The second tier is a
+    SQLite table shared by every process using the same file, so answers survive restarts; the
+    file is opened on first use. Entries expire ttl seconds after they were fetched, in both
+    tiers. Concurrent misses for the same key are
+    collapsed into a single call to compute; the other callers wait for its result.
+    Values must be JSON-serializable.
+    """
+
+    def __init__(self, namespace, max_entries=2048, ttl=DEFAULT_TTL, disk_path=None, max_disk_entries=100000):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.stats = {
+            "hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "disk_evictions": 0,
+        }
+
+        self.disk_path = disk_path
+        self._db = None
+        self._db_opened = False
+        self._db_lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Returns the cached value for key, calling compute() at most once per key on a miss.
+
+        Exceptions raised by compute are passed to every waiting caller and nothing is cached.
+        """
+        now = time.time()
+        with self._lock:
+            value, found = self._memory_get(key, now)
+            if found:
+                self.stats["hits"] += 1
+                return value
+            inflight = self._inflight.get(key)
+            leader = inflight is None
+            if leader:
+                inflight = self._inflight[key] = _InFlight()
+            else:
+                self.stats["coalesced"] += 1
+
+        if not leader:
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            return inflight.value
+
+        try:
+            value, expires, found = self._disk_get(key, now)
+            if found:
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+            else:
+                with self._lock:
+                    self.stats["misses"] += 1
+                value = compute()
+                expires = self._disk_put(key, value, now)
+            with self._lock:
+                self._memory_put(key, value, expires)
+            inflight.value = value
+            return value
+        except Exception as e:
+            inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            inflight.done.set()
+
+    def get_or_compute_many(self, keys, compute):
+        """
+        Like get_or_compute for several keys, with one call to compute for all of their misses.
+
+        compute(missing) receives the keys that are neither cached nor being computed by another
+        caller and returns {key: value} for every one of them. Keys another caller is already
+        computing, alone or in a batch, are waited for instead, and a single-key lookup arriving
+        while a batch is running waits for the batch. Exceptions are handled as in
+        get_or_compute.
+
+        Returns:
+            dict: {key: value} for every key.
+        """
+        now = time.time()
+        values = {}
+        expiries = {}
+        leading = {}
+        waiting = {}
+        with self._lock:
+            for key in dict.fromkeys(keys):
+                value, found = self._memory_get(key, now)
+                if found:
+                    self.stats["hits"] += 1
+                    values[key] = value
+                elif key in self._inflight:
+                    self.stats["coalesced"] += 1
+                    waiting[key] = self._inflight[key]
+                else:
+                    leading[key] = self._inflight[key] = _InFlight()
+
+        try:
+            missing = []
+            for key in leading:
+                value, expires, found = self._disk_get(key, now)
+                if found:
+                    with self._lock:
+                        self.stats["disk_hits"] += 1
+                    values[key] = leading[key].value = value
+                    expiries[key] = expires
+                else:
+                    missing.append(key)
+            if missing:
+                with self._lock:
+                    self.stats["misses"] += len(missing)
+                computed = compute(missing)
+                for key in missing:
+                    value = computed[key]
+                    expiries[key] = self._disk_put(key, value, now)
+                    values[key] = leading[key].value = value
+            with self._lock:
+                for key in leading:
+                    self._memory_put(key, values[key], expiries[key])
+        except Exception as e:
+            for inflight in leading.values():
+                inflight.error = e
+            raise
+        finally:
+            with self._lock:
+                for key in leading:
+                    del self._inflight[key]
+            for inflight in leading.values():
+                inflight.done.set()
+
+        for key, inflight in waiting.items():
+            inflight.done.wait()
+            if inflight.error is not None:
+                raise inflight.error
+            values[key] = inflight.value
+        return values
+
+    def get_many(self, keys):
+        """
+        Returns {key: value} for the keys already cached in either tier, without computing.
+        """
+        now = time.time()
+        cached = {}
+        for key in keys:
+            with self._lock:
+                value, found = self._memory_get(key, now)
+                if found:
+                    self.stats["hits"] += 1
+            if not found:
+                value, expires, found = self._disk_get(key, now)
+                if found:
+                    with self._lock:
+                        self.stats["disk_hits"] += 1
+                        self._memory_put(key, value, expires)
+            if found:
+                cached[key] = value
+        return cached
+
+    def put(self, key, value):
+        expires = self._disk_put(key, value, time.time())
+        with self._lock:
+            self._memory_put(key, value, expires)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        db = self._connection()
+        if db is not None:
+            with self._db_lock:
+                db.execute("DELETE FROM term_cache WHERE namespace = ?", (self.namespace,))
+                db.commit()
+
+    def _connection(self):
+        # Open (and if needed create) the SQLite file on first use rather than at import time
+        if not self._db_opened:
+            with self._db_lock:
+                if not self._db_opened:
+                    if self.disk_path:
+                        try:
+                            db = sqlite3.connect(self.disk_path, check_same_thread=False)
+                            db.execute(
+                                "CREATE TABLE IF NOT EXISTS term_cache ("
+                                " namespace TEXT, key TEXT, value TEXT, expires REAL, accessed REAL,"
+                                " PRIMARY KEY (namespace, key))"
+                            )
+                            db.commit()
+                            self._db = db
+                        except sqlite3.Error as e:
+                            print(f"Error opening MeSH cache at '{self.disk_path}', using memory only: {e}")
+                    self._db_opened = True
+        return self._db
+
+    def _memory_get(self, key, now):
+        entry = self._memory.get(key)
+        if entry is None:
+            return None, False
+        expires, value = entry
+        if expires <= now:
+            del self._memory[key]
+            self.stats["expirations"] += 1
+            return None, False
+        self._memory.move_to_end(key)
+        return value, True
+
+    def _memory_put(self, key, value, expires):
+        self._memory[key] = (expires, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _disk_get(self, key, now):
+        # Returns (value, expires, found); expires is when the row was written plus the ttl
+        db = self._connection()
+        if db is None:
+            return None, None, False
+        with self._db_lock:
+            row = db.execute(
+                "SELECT value, expires FROM term_cache WHERE namespace = ? AND key = ?",
+                (self.namespace, key),
+            ).fetchone()
+            if row is None:
+                return None, None, False
+            if row[1] <= now:
+                db.execute(
+                    "DELETE FROM term_cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+                )
+                db.commit()
+                return None, None, False
+            db.execute(
+                "UPDATE term_cache SET accessed = ? WHERE namespace = ? AND key = ?",
+                (now, self.namespace, key),
+            )
+            db.commit()
+        return json.loads(row[0]), row[1], True
+
+    def _disk_put(self, key, value, now):
+        # Returns the expiry time of the new entry
+        expires = now + self.ttl
+        db = self._connection()
+        if db is None:
+            return expires
+        with self._db_lock:
+            db.execute(
+                "INSERT OR REPLACE INTO term_cache (namespace, key, value, expires, accessed) VALUES (?, ?, ?, ?, ?)",
+                (self.namespace, key, json.dumps(value), expires, now),
+            )
+            # Keep the table bounded by dropping the least recently used rows of this namespace
+            count = db.execute(
+                "SELECT COUNT(*) FROM term_cache WHERE namespace = ?", (self.namespace,)
+            ).fetchone()[0]
+            if count > self.max_disk_entries:
+                excess = count - self.max_disk_entries
+                db.execute(
+                    "DELETE FROM term_cache WHERE rowid IN ("
+                    " SELECT rowid FROM term_cache WHERE namespace = ? ORDER BY accessed LIMIT ?)",
+                    (self.namespace, excess),
+                )
+                with self._lock:
+                    self.stats["disk_evictions"] += excess
+            db.commit()
+        return expires
+
+
+# Shared by every session in the process. The file lives in the app directory unless
+# MESH_CACHE_PATH moves it; MESH_CACHE_PATH="" keeps the cache in memory only.
+DEFAULT_MESH_CACHE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mesh_cache.sqlite")
+MESH_CACHE_PATH = os.environ.get("MESH_CACHE_PATH", DEFAULT_MESH_CACHE_PATH)
+
+concept_cache = TermCache("concept_triples", disk_path=MESH_CACHE_PATH)
+narrower_cache = TermCache("narrower_concepts", disk_path=MESH_CACHE_PATH)
+descendant_cache = TermCache("descendant_concepts", disk_path=MESH_CACHE_PATH)
+
+
+def get_cache_stats():
+    """
+    Returns the hit/miss/eviction counters of the MeSH lookup caches.
+    """
+    return {
+        "concept_triples": dict(concept_cache.stats),
+        "narrower_concepts": dict(narrower_cache.stats),
+        "descendant_concepts": dict(descendant_cache.stats),
+    }
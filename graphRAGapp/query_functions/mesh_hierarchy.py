@@ -0,0 +1,111 @@
+from array import array
+
+import numpy as np
+
+# MeSH has about 30,000 descriptors in about 64,000 tree positions; far more means the
+# broader links do not form a tree-like hierarchy and the labeling would not pay off
+MAX_POSITIONS = 2_000_000
+
+
+class MeshHierarchy:
+    """
+    Interval labels for the MeSH descriptor hierarchy, built once from broaderDescriptor edges.
+
+    The hierarchy is walked depth first from its top descriptors, and each time a node is
+    reached it is given a pre-order position and the end of its subtree's range. A descriptor
+    under several parents is reached once per parent, like its several MeSH tree numbers, so
+    it has one such interval per place in the tree. With that labeling:
+
+    - the descendants of X are the positions inside X's intervals, a slice of one array
+      (O(result));
+    - Y is under X when one of Y's positions falls inside one of X's intervals, a binary
+      search over Y's few positions (O(1) in practice).
+
+    Edges that would close a cycle are ignored.
+    """
+
+    def __init__(self, narrower, max_positions=MAX_POSITIONS):
+        """
+        Args:
+            narrower (dict): Node id -> ids of its narrower descriptors (MeshVocabulary.narrower).
+            max_positions (int): Most tree positions to label; ValueError is raised beyond it.
+        """
+        self.max_positions = max_positions
+        children = {node: tuple(dict.fromkeys(kids)) for node, kids in narrower.items()}
+        has_parent = {kid for kids in children.values() for kid in kids}
+        roots = sorted(node for node in children if node not in has_parent)
+
+        order = array("i")  # Node id at each pre-order position
+        ends = array("i")  # End of the subtree range started at each position
+        for root in roots:
+            self._label(root, children, order, ends)
+        # Nodes only reachable through a cycle start trees of their own
+        labeled = set(order)
+        for node in sorted(children):
+            if node not in labeled:
+                start = len(order)
+                self._label(node, children, order, ends)
+                labeled.update(order[start:])
+
+        self.order = np.frombuffer(order, dtype=np.int32)
+        self.ends = np.frombuffer(ends, dtype=np.int32)
+
+        # Positions of every node, sorted, as a CSR matrix keyed by node id
+        by_node = np.argsort(self.order, kind="stable").astype(np.int32)
+        size = int(self.order.max()) + 1 if len(self.order) else 0
+        self.position_indptr = np.concatenate(([0], np.cumsum(np.bincount(self.order, minlength=size))))
+        self.positions = by_node
+
+    def _label(self, root, children, order, ends):
+        # Iterative depth-first walk; on_path guards against cycles in the broader links
+        order.append(root)
+        ends.append(0)
+        stack = [(root, len(order) - 1, iter(children.get(root, ())))]
+        on_path = {root}
+        while stack:
+            node, position, kids = stack[-1]
+            kid = next(kids, None)
+            if kid is None:
+                ends[position] = len(order)
+                on_path.discard(node)
+                stack.pop()
+            elif kid not in on_path:
+                if len(order) >= self.max_positions:
+                    raise ValueError(f"MeSH hierarchy has more than {self.max_positions} tree positions")
+                order.append(kid)
+                ends.append(0)
+                on_path.add(kid)
+                stack.append((kid, len(order) - 1, iter(children.get(kid, ()))))
+
+    def __len__(self):
+        return len(self.order)
+
+    def node_positions(self, node):
+        """
+        Returns the sorted pre-order positions of a node (empty if it is not in the hierarchy).
+        """
+        if node < 0 or node + 1 >= len(self.position_indptr):
+            return self.positions[:0]
+        return self.positions[self.position_indptr[node]:self.position_indptr[node + 1]]
+
+    def descendants(self, node):
+        """
+        Returns the ids of every descriptor below the node, at any depth, without duplicates.
+        """
+        slices = [self.order[position + 1:self.ends[position]] for position in self.node_positions(node)]
+        if not slices:
+            return self.order[:0]
+        return np.unique(np.concatenate(slices))
+
+    def is_descendant(self, node, ancestor):
+        """
+        Returns True if node is below ancestor in the hierarchy.
+        """
+        node_positions = self.node_positions(node)
+        if len(node_positions) == 0:
+            return False
+        for position in self.node_positions(ancestor):
+            first_after = np.searchsorted(node_positions, position, side="right")
+            if first_after < len(node_positions) and node_positions[first_after] < self.ends[position]:
+                return True
+        return False
@@ -0,0 +1,97 @@
+import functools
+import re
+from urllib.parse import quote
+
+from rdflib import URIRef
+
+
+def sanitize_term(term):
+    """
+    Clean and format the term:
+    - Remove leading/trailing quotes (single or double)
+    - Replace underscores with spaces
+    - Ensure no unwanted characters remain
+    """
+    if not term:
+        return term
+    term = term.strip("'\"")  # Remove single or double quotes
+    term = term.replace("_", " ")  # Replace underscores with spaces
+    return term.strip()
+
+
+def parse_mesh_terms(mesh_list):
+    """
+    Parses a meshMajor value from the PubMed dataset into a list of terms.
+
+    The column holds a Python list literal such as "['Humans', 'Carcinoma, Squamous Cell']".
+    It is split on every comma, exactly as the notebook that built PubMedGraph.ttl and the
+    Weaviate collections did, so a term containing a comma becomes two terms ("Carcinoma",
+    "Squamous Cell"). Parsing the literal properly would give term URIs that the published
+    graph does not have. Values that are already lists are returned as-is.
+    """
+    if isinstance(mesh_list, (list, tuple)):
+        return [str(term).strip() for term in mesh_list if str(term).strip()]
+    if not mesh_list or not isinstance(mesh_list, str):
+        return []
+    terms = (term.strip().strip("'\"").strip() for term in mesh_list.strip("[]'").split(','))
+    return [term for term in terms if term]
+
+
+def create_valid_uri(base_uri, text):
+    """
+    Creates the URI used for articles and MeSH terms in the Weaviate collections and the graph.
+    """
+    if not text:
+        return None
+    sanitized_text = quote(
+        text.strip()
+        .replace(' ', '_')
+        .replace('"', '')
+        .replace('<', '')
+        .replace('>', '')
+        .replace("'", "_")
+    )
+    return f"{base_uri}/{sanitized_text}"
+
+
+def create_article_uri(title, base_namespace="http://example.org/article"):
+    return create_valid_uri(base_namespace, title)
+
+
+@functools.lru_cache(maxsize=65536)
+def convert_to_uri(term, base_namespace="http://example.org/mesh/"):
+    """
+    Converts a MeSH term into a standardized URI by replacing spaces and special characters with underscores,
+    ensuring it starts and ends with a single underscore, and URL-encoding the term.
+
+    Results are memoized, since the same terms are converted on every filter and graph build.
+
+    Args:
+        term (str): The MeSH term to convert.
+        base_namespace (str): The base namespace for the URI.
+
+    Returns:
+        URIRef: The formatted URI.
+    """
+    if term is None or term != term:
+        return None  # Handle NaN or None terms gracefully
+
+    # Step 1: Strip existing leading and trailing non-word characters (including underscores)
+    stripped_term = re.sub(r'^\W+|\W+$', '', term)
+
+    # Step 2: Replace non-word characters with underscores (one or more)
+    formatted_term = re.sub(r'\W+', '_', stripped_term)
+
+    # Step 3: Replace multiple consecutive underscores with a single underscore
+    formatted_term = re.sub(r'_+', '_', formatted_term)
+
+    # Step 4: URL-encode the term to handle any remaining special characters
+    encoded_term = quote(formatted_term)
+
+    # Step 5: Add single leading and trailing underscores
+    term_with_underscores = f"_{encoded_term}_"
+
+    # Step 6: Concatenate with base_namespace without adding an extra underscore
+    uri = f"{base_namespace}{term_with_underscores}"
+
+    return URIRef(uri)
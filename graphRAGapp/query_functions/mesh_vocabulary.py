@@ -0,0 +1,256 @@
+import gzip
+import os
+import pickle
+import re
+import threading
+
+from query_functions.mesh_hierarchy import MeshHierarchy
+from query_functions.mesh_terms import sanitize_term
+from query_functions.tracing import traced
+
+RDFS_LABEL = "http://www.w3.org/2000/01/rdf-schema#label"
+BROADER_DESCRIPTOR = "http://id.nlm.nih.gov/mesh/vocab#broaderDescriptor"
+
+# One N-Triples statement: <subject> <predicate> object .
+NTRIPLE_PATTERN = re.compile(r'^(<[^>]*>|_:\S+)\s+<([^>]*)>\s+(.+?)\s*\.\s*$')
+LITERAL_PATTERN = re.compile(r'^"((?:[^"\\]|\\.)*)"(?:@([A-Za-z0-9-]+)|\^\^<[^>]*>)?$')
+ESCAPE_PATTERN = re.compile(r'\\(u[0-9A-Fa-f]{4}|U[0-9A-Fa-f]{8}|.)')
+ESCAPES = {'t': '\t', 'b': '\b', 'n': '\n', 'r': '\r', 'f': '\f', '"': '"', "'": "'", '\\': '\\'}
+
+
+def _unescape(match):
+    code = match.group(1)
+    if code[0] in "uU" and len(code) > 1:
+        return chr(int(code[1:], 16))
+    return ESCAPES.get(code, code)
+
+
+def _parse_literal(token):
+    match = LITERAL_PATTERN.match(token)
+    if not match:
+        return None, None
+    return ESCAPE_PATTERN.sub(_unescape, match.group(1)), match.group(2)
+
+
+class MeshVocabulary:
+    """
+    A compact, read-only copy of the parts of MeSH the refine tab needs.
+
+    Every IRI (or literal object of a concept predicate) is interned to an integer id. The
+    store keeps an English label -> subject index, all labels per node, the objects of every
+    predicate whose IRI contains "concept", and the reverse of meshv:broaderDescriptor. It
+    answers the same questions as the SPARQL queries sent to id.nlm.nih.gov, without a network.
+    The descriptor hierarchy is also labeled with intervals (MeshHierarchy) when the store is
+    compacted, so all descendants of a term are found without walking it level by level.
+    """
+
+    def __init__(self):
+        self.nodes = []
+        self.node_ids = {}
+        self.labels = {}
+        self.label_index = {}
+        self.concepts = {}
+        self.narrower = {}
+        self.hierarchy = None
+
+    def _intern(self, token):
+        node_id = self.node_ids.get(token)
+        if node_id is None:
+            node_id = len(self.nodes)
+            self.nodes.append(token)
+            self.node_ids[token] = node_id
+        return node_id
+
+    def add_triple(self, subject, predicate, obj):
+        """
+        Adds one statement in N-Triples term syntax (<iri>, _:bnode or a quoted literal).
+        """
+        if predicate == RDFS_LABEL:
+            label, lang = _parse_literal(obj)
+            if label is None:
+                return
+            subject_id = self._intern(subject)
+            self.labels.setdefault(subject_id, []).append(label)
+            if lang == "en":
+                self.label_index.setdefault(label, []).append(subject_id)
+        elif predicate == BROADER_DESCRIPTOR:
+            self.narrower.setdefault(self._intern(obj), []).append(self._intern(subject))
+        elif "concept" in predicate:
+            self.concepts.setdefault(self._intern(subject), []).append(self._intern(obj))
+
+    def compact(self):
+        """
+        Freezes the adjacency lists into tuples and drops the build-time IRI lookup.
+        """
+        for table in (self.labels, self.label_index, self.concepts, self.narrower):
+            for key, values in table.items():
+                table[key] = tuple(values)
+        self.node_ids = {}
+        self.hierarchy = self._build_hierarchy()
+        return self
+
+    def _build_hierarchy(self):
+        try:
+            return MeshHierarchy(self.narrower)
+        except ValueError as e:
+            print(f"Not indexing the MeSH hierarchy, descendants will be found level by level: {e}")
+            return False
+
+    def _hierarchy(self):
+        # Stores saved before the hierarchy existed build it on first use
+        if getattr(self, "hierarchy", None) is None:
+            self.hierarchy = self._build_hierarchy()
+        return self.hierarchy
+
+    def _descendant_ids(self, node_id):
+        hierarchy = self._hierarchy()
+        if hierarchy:
+            return hierarchy.descendants(node_id).tolist()
+        seen = set()
+        frontier = [node_id]
+        while frontier:
+            frontier = [kid for parent in frontier for kid in self.narrower.get(parent, ()) if kid not in seen]
+            seen.update(frontier)
+        return seen
+
+    def concept_labels(self, term):
+        """
+        Local equivalent of rdf_queries.get_concept_triples_for_term.
+        """
+        term = sanitize_term(term)
+        triples = set()
+        for subject_id in self.label_index.get(term, ()):
+            for object_id in self.concepts.get(subject_id, ()):
+                for label in self.labels.get(object_id, ("No label",)):
+                    triples.add(sanitize_term(label))
+        triples.add(sanitize_term(term))
+        return list(triples)
+
+    def narrower_labels(self, term):
+        """
+        Local equivalent of rdf_queries.get_narrower_concepts_for_term.
+        """
+        term = sanitize_term(term)
+        concepts = set()
+        for broader_id in self.label_index.get(term, ()):
+            for narrower_id in self.narrower.get(broader_id, ()):
+                for label in self.labels.get(narrower_id, ()):
+                    concepts.add(sanitize_term(label))
+        return list(concepts)
+
+    def descendant_labels(self, term):
+        """
+        Returns the labels of every descriptor below the term, at any depth.
+        """
+        term = sanitize_term(term)
+        concepts = set()
+        for node_id in self.label_index.get(term, ()):
+            for descendant_id in self._descendant_ids(node_id):
+                for label in self.labels.get(descendant_id, ()):
+                    concepts.add(sanitize_term(label))
+        concepts.discard(term)
+        return sorted(concepts)
+
+    def is_narrower(self, term, ancestor):
+        """
+        Returns True if the term is below the ancestor term in the MeSH hierarchy.
+        """
+        hierarchy = self._hierarchy()
+        return any(
+            hierarchy.is_descendant(node_id, ancestor_id) if hierarchy else node_id in self._descendant_ids(ancestor_id)
+            for node_id in self.label_index.get(sanitize_term(term), ())
+            for ancestor_id in self.label_index.get(sanitize_term(ancestor), ())
+        )
+
+
+def _open_dump(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+
+@traced("mesh.vocabulary_build")
+def build_mesh_vocabulary(dump_path):
+    """
+    Streams a MeSH N-Triples dump (optionally gzipped) into a MeshVocabulary.
+
+    Args:
+        dump_path (str): Path to e.g. mesh.nt or mesh.nt.gz from the NLM download site.
+
+    Returns:
+        MeshVocabulary: The compacted store.
+    """
+    vocabulary = MeshVocabulary()
+    with _open_dump(dump_path) as f:
+        for line in f:
+            if not line.strip() or line.startswith("#"):
+                continue
+            match = NTRIPLE_PATTERN.match(line)
+            if not match:
+                continue
+            subject, predicate, obj = match.groups()
+            vocabulary.add_triple(subject, predicate, obj)
+    return vocabulary.compact()
+
+
+def load_mesh_vocabulary(dump_path, store_path=None):
+    """
+    Loads the local store, ingesting the dump first if no up-to-date store exists.
+
+    Args:
+        dump_path (str): Path to the MeSH N-Triples dump.
+        store_path (str): Where the compact store is kept. Defaults to dump_path + ".pkl".
+
+    Returns:
+        MeshVocabulary: The loaded store.
+    """
+    store_path = store_path or f"{dump_path}.pkl"
+    if os.path.exists(store_path) and (
+        not os.path.exists(dump_path) or os.path.getmtime(store_path) >= os.path.getmtime(dump_path)
+    ):
+        with open(store_path, "rb") as f:
+            return pickle.load(f)
+
+    vocabulary = build_mesh_vocabulary(dump_path)
+    tmp_path = f"{store_path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(vocabulary, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, store_path)
+    return vocabulary
+
+
+_mesh_vocabulary = None
+_mesh_vocabulary_checked = False
+_mesh_vocabulary_lock = threading.Lock()
+
+
+def configure_mesh_vocabulary(dump_path, store_path=None):
+    """
+    Loads a MeSH dump and makes it the vocabulary used by the refine-tab lookups.
+    """
+    global _mesh_vocabulary, _mesh_vocabulary_checked
+    vocabulary = load_mesh_vocabulary(dump_path, store_path)
+    _mesh_vocabulary = vocabulary
+    _mesh_vocabulary_checked = True
+    return vocabulary
+
+
+def get_mesh_vocabulary():
+    """
+    Returns the configured local vocabulary, or None to use the remote MeSH endpoint.
+
+    If nothing was configured explicitly, the MESH_VOCABULARY_PATH environment variable is
+    checked once and, when set, the dump it points to is loaded.
+    """
+    global _mesh_vocabulary, _mesh_vocabulary_checked
+    if not _mesh_vocabulary_checked:
+        with _mesh_vocabulary_lock:
+            if not _mesh_vocabulary_checked:
+                dump_path = os.environ.get("MESH_VOCABULARY_PATH")
+                if dump_path:
+                    try:
+                        _mesh_vocabulary = load_mesh_vocabulary(dump_path)
+                    except Exception as e:
+                        print(f"Error loading local MeSH vocabulary from '{dump_path}': {e}")
+                _mesh_vocabulary_checked = True
+    return _mesh_vocabulary
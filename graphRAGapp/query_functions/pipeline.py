@@ -0,0 +1,192 @@
+import datetime
+import threading
+
+from rdflib import Literal
+
+from query_functions.databricks_queries import use_table_articles
+from query_functions.mesh_terms import sanitize_term
+from query_functions.pubmed_graph import get_shared_graph
+from query_functions.rdf_queries import (
+    download_rdf_file,
+    find_similar_articles,
+    get_all_descendant_concepts,
+    get_all_narrower_concepts,
+    get_concept_triples_for_term,
+    query_rdf,
+)
+from query_functions.summarizer import stream_map_reduce_summary
+from query_functions.weaviate_queries import iter_weaviate_articles, query_weaviate_terms
+
+LOCAL_FILE_PATH = "PubMedGraph.ttl"
+
+# Every stage takes and returns plain JSON values, so the Streamlit app can call these functions
+# in process or through the HTTP service (service.py, api_client.GraphRAGClient) the same way
+
+_prepare_lock = threading.Lock()
+_prepared = False
+
+
+def _json_value(value):
+    # rdflib terms and dates as the JSON values the API returns
+    if isinstance(value, Literal):
+        value = value.toPython()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def _article_json(article_uri, data):
+    article = {"article_uri": str(article_uri)}
+    for name, value in data.items():
+        if name == "meshTerms":
+            article[name] = sorted(str(term) for term in value)
+        else:
+            article[name] = _json_value(value)
+    return article
+
+
+def prepare_graph(local_file_path=LOCAL_FILE_PATH):
+    """
+    Makes sure the article graph is available, downloading it once per process if needed.
+
+    Nothing needs to be downloaded when articles are read from a Databricks table. If the
+    download fails, the local copy of the file is used.
+    """
+    global _prepared
+    if _prepared or use_table_articles():
+        return
+    with _prepare_lock:
+        if not _prepared:
+            try:
+                download_rdf_file(local_file_path, local_file_path)
+            except Exception as e:
+                print(f"Error downloading RDF file '{local_file_path}', using the local copy: {e}")
+            _prepared = True
+
+
+def graph_stats(local_file_path=LOCAL_FILE_PATH):
+    """
+    Returns the load statistics of the shared graph, or {"loaded": False} if it is not used.
+    """
+    if use_table_articles():
+        return {"loaded": False}
+    return get_shared_graph(local_file_path).stats()
+
+
+def search_articles(query_text, max_results=100, max_distance=None):
+    """
+    Stage 1: the articles nearest to the query text.
+
+    Returns:
+        list: {"uuid", "properties": {"article_URI", "title", "meshMajor"}, "distance"} dicts.
+    """
+    articles = []
+    for page in iter_weaviate_articles(None, query_text, max_results=max_results, max_distance=max_distance):
+        articles.extend(
+            {"uuid": str(result["uuid"]), "properties": result["properties"], "distance": result["distance"]}
+            for result in page
+        )
+    return articles
+
+
+def search_terms(query_text, limit=10):
+    """
+    Stage 2: the MeSH terms nearest to the query text, sanitized and de-duplicated.
+    """
+    results = query_weaviate_terms(None, query_text, limit)
+    return list(dict.fromkeys(sanitize_term(result["properties"].get("meshTerm", "N/A")) for result in results))
+
+
+def term_payload(term):
+    """
+    Stage 2: a term's alternative names and its narrower concepts, one level down.
+    """
+    alt_names = list(dict.fromkeys(get_concept_triples_for_term(term)))
+    narrower_concepts = {
+        narrower: list(dict.fromkeys(children))
+        for narrower, children in get_all_narrower_concepts(term, depth=1).items()
+    }
+    return {"alt_names": alt_names, "narrower_concepts": narrower_concepts}
+
+
+def descendant_terms(term):
+    """
+    Stage 2: every descriptor below the term, at any depth.
+    """
+    return get_all_descendant_concepts(term)
+
+
+def filter_articles(terms, article_uris, distances=None, ranking_method="linear", vector_weight=0.5, limit=10,
+                    local_file_path=LOCAL_FILE_PATH):
+    """
+    Stage 3: the candidate articles that have the selected terms, ranked.
+
+    Returns:
+        list: Article dicts with "article_uri", "title", "abstract", "datePublished", "access",
+            "meshTerms" (the matched terms) and "score".
+    """
+    prepare_graph(local_file_path)
+    ranked = query_rdf(
+        local_file_path, None, terms,
+        article_uris=article_uris,
+        vector_distances=distances,
+        ranking_method=ranking_method,
+        vector_weight=vector_weight,
+        limit=limit,
+    )
+    return [_article_json(article_uri, data) for article_uri, data in ranked]
+
+
+def similar_articles(article_uri, k=5, local_file_path=LOCAL_FILE_PATH):
+    """
+    Stage 3: the articles sharing the most MeSH terms with an article, with their "similarity".
+    """
+    prepare_graph(local_file_path)
+    return [_article_json(uri, data) for uri, data in find_similar_articles(local_file_path, article_uri, k)]
+
+
+def article_texts(articles):
+    return [f"Title: {article['title']} Abstract: {article['abstract']}" for article in articles]
+
+
+def stream_summary(texts, user_query):
+    """
+    Stage 4: yields the summary of the article texts as it is generated.
+    """
+    return stream_map_reduce_summary(texts, user_query)
+
+
+def run_pipeline(query_text, terms, user_query=None, max_results=100, max_distance=None, ranking_method="linear",
+                 vector_weight=0.5, limit=10, rdf_executor=None):
+    """
+    All stages at once: search, filter by the given MeSH terms and, if user_query is given,
+    summarize the articles that remain.
+
+    Args:
+        rdf_executor (Executor): Runs the filter stage when given, e.g. the service's pool
+            reserved for rdflib work; otherwise it runs in the calling thread.
+
+    Returns:
+        dict: {"candidates": number of search results, "articles": filtered articles,
+            "summary": the summary or None}.
+    """
+    candidates = search_articles(query_text, max_results, max_distance)
+    distances = {
+        result["properties"]["article_URI"]: result["distance"]
+        for result in candidates
+        if result["properties"].get("article_URI")
+    }
+    articles = []
+    if distances:
+        filter_args = (terms, list(distances), distances)
+        filter_kwargs = dict(ranking_method=ranking_method, vector_weight=vector_weight, limit=limit)
+        if rdf_executor is None:
+            articles = filter_articles(*filter_args, **filter_kwargs)
+        else:
+            articles = rdf_executor.submit(filter_articles, *filter_args, **filter_kwargs).result()
+    summary = None
+    if user_query and articles:
+        summary = "".join(stream_summary(article_texts(articles), user_query)).strip()
+    return {"candidates": len(candidates), "articles": articles, "summary": summary}
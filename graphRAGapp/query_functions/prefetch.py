@@ -0,0 +1,105 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from query_functions.mesh_terms import sanitize_term
+from query_functions.mesh_vocabulary import get_mesh_vocabulary
+from query_functions.rdf_queries import (
+    NARROWER_BATCH_SIZE,
+    get_concept_triples_for_term,
+    get_narrower_concepts_for_terms,
+)
+
+# Threads shared by every session's prefetcher, and the most terms warmed per search
+PREFETCH_MAX_WORKERS = 2
+PREFETCH_MAX_TERMS = 50
+
+_prefetch_executor = ThreadPoolExecutor(max_workers=PREFETCH_MAX_WORKERS, thread_name_prefix="mesh-prefetch")
+
+
+class MeshPrefetcher:
+    """
+    Warms the MeSH lookup caches for the terms of a search's results, in the background.
+
+    Each session has its own prefetcher; the work runs on a small pool shared by all sessions.
+    Results land in the shared concept/narrower caches (mesh_cache), which the Tab 2 expansion
+    reads, so a term that was prefetched expands without a remote query. Starting a new
+    prefetch cancels the previous one: queued lookups are dropped and running ones stop after
+    their current request.
+    """
+
+    def __init__(self, executor=None, max_terms=PREFETCH_MAX_TERMS):
+        self._executor = executor or _prefetch_executor
+        self.max_terms = max_terms
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._futures = []
+
+    def prefetch(self, terms):
+        """
+        Starts warming alternative names and one level of narrower concepts for the terms,
+        most frequent first. Does nothing when the local MeSH vocabulary is configured.
+
+        Args:
+            terms (iterable): MeSH terms, e.g. every meshMajor term of the Tab 1 results.
+        """
+        counts = {}
+        for term in terms:
+            term = sanitize_term(term)
+            if term:
+                counts[term] = counts.get(term, 0) + 1
+        ordered = sorted(counts, key=counts.get, reverse=True)[:self.max_terms]
+
+        with self._lock:
+            self._cancel()
+            self._generation += 1
+            generation = self._generation
+            if not ordered or get_mesh_vocabulary() is not None:
+                return
+            self._futures = [
+                self._executor.submit(self._warm_narrower, generation, ordered[i:i + NARROWER_BATCH_SIZE])
+                for i in range(0, len(ordered), NARROWER_BATCH_SIZE)
+            ] + [
+                self._executor.submit(self._warm_concepts, generation, term)
+                for term in ordered
+            ]
+
+    def cancel(self):
+        with self._lock:
+            self._cancel()
+            self._generation += 1
+
+    def _cancel(self):
+        for future in self._futures:
+            future.cancel()
+        self._futures = []
+
+    def pending(self):
+        """
+        Returns how many prefetch lookups of the current search have not finished.
+        """
+        with self._lock:
+            return sum(1 for future in self._futures if not future.done())
+
+    def _warm_concepts(self, generation, term):
+        if generation != self._generation:
+            return
+        get_concept_triples_for_term(term)
+
+    def _warm_narrower(self, generation, terms):
+        if generation != self._generation:
+            return
+        get_narrower_concepts_for_terms(terms)
+
+
+def get_session_prefetcher(session_state, key="mesh_prefetcher"):
+    """
+    Returns the session's prefetcher, creating it on the session's first run only.
+
+    Streamlit reruns the whole script on every interaction, so the prefetcher has to live in
+    session_state: a new search can only cancel the lookups of the previous one if both went
+    through the same prefetcher.
+    """
+    prefetcher = session_state.get(key)
+    if prefetcher is None:
+        prefetcher = session_state[key] = MeshPrefetcher()
+    return prefetcher
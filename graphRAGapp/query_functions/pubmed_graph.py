@@ -0,0 +1,241 @@
+import gzip
+import hashlib
+import os
+import threading
+import time
+
+from rdflib import RDF, Graph
+from rdflib.graph import ReadOnlyGraphAggregate
+
+from query_functions.article_index import EX, ArticleIndex
+from query_functions.tracing import span
+from query_functions.triple_store import open_triple_store, use_triple_store
+
+
+class GraphSnapshot:
+    """
+    An immutable, fully parsed view of the RDF file at one point in time.
+
+    Readers hold on to a snapshot for the duration of a query, so a reload that swaps in a
+    newer snapshot never changes the graph underneath a running query.
+    """
+
+    def __init__(self, graph, article_index, mtime, sha256, load_time, size=None):
+        self.graph = graph
+        self.article_index = article_index
+        self.mtime = mtime
+        self.sha256 = sha256
+        self.load_time = load_time
+        self.size = size  # Bytes of the file that were parsed, None for an on-disk store
+        self.triple_count = len(graph)
+        self.loaded_at = time.time()
+
+
+def _file_sha256(path, chunk_size=1024 * 1024):
+    return _file_digests(path, chunk_size=chunk_size)[0]
+
+
+def _file_digests(path, prefix_bytes=None, size=None, chunk_size=1024 * 1024):
+    # SHA-256 of the file's first size bytes (all of it by default) and of its first prefix_bytes
+    # bytes (None if it is shorter), in one read
+    digest = hashlib.sha256()
+    prefix_digest = None
+    read = 0
+    with open(path, "rb") as f:
+        while size is None or read < size:
+            chunk = f.read(chunk_size if size is None else min(chunk_size, size - read))
+            if not chunk:
+                break
+            if prefix_bytes is not None and prefix_digest is None and read + len(chunk) >= prefix_bytes:
+                head = prefix_bytes - read
+                digest.update(chunk[:head])
+                prefix_digest = digest.hexdigest()
+                digest.update(chunk[head:])
+            else:
+                digest.update(chunk)
+            read += len(chunk)
+    return digest.hexdigest(), prefix_digest
+
+
+class PubMedGraph:
+    """
+    A parsed PubMedGraph shared by every session in the server process.
+
+    The file is parsed once. On each access the file's mtime is compared with the loaded
+    snapshot; only when it differs is the content hash recomputed, and only when the hash
+    differs is the file parsed again. The new graph is parsed off to the side and swapped in
+    with a single assignment, so readers keep using the previous snapshot until it is ready.
+
+    When the file only grew, with the parsed bytes unchanged (graph_builder --append), just
+    the appended part is parsed. The new snapshot reads the previous graph and the appended
+    triples together, and its article index is the previous one extended with the new
+    articles (ArticleIndex.appended), so neither is rebuilt.
+
+    With RDF_BACKEND=oxigraph the file is imported once into an on-disk store (triple_store)
+    instead of being parsed, and later starts open the store without reading the file.
+    """
+
+    def __init__(self, local_file_path, rdf_format="ttl"):
+        self.local_file_path = os.path.abspath(local_file_path)
+        self.rdf_format = rdf_format
+        self._snapshot = None
+        self._reload_lock = threading.Lock()
+
+    def snapshot(self):
+        """
+        Returns the current snapshot, loading or reloading the file if it changed on disk.
+
+        Only the first load blocks callers. Later reloads run in the thread that noticed the
+        change while every other reader is served the previous snapshot.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            with self._reload_lock:
+                if self._snapshot is None:
+                    self._snapshot = self._load()
+                return self._snapshot
+
+        if self._is_stale(snapshot) and self._reload_lock.acquire(blocking=False):
+            try:
+                if self._snapshot is snapshot:
+                    self._reload(snapshot)
+            finally:
+                self._reload_lock.release()
+        return self._snapshot
+
+    @property
+    def graph(self):
+        return self.snapshot().graph
+
+    @property
+    def article_index(self):
+        return self.snapshot().article_index
+
+    def stats(self):
+        """
+        Returns load statistics for the current snapshot without triggering a reload.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"path": self.local_file_path, "loaded": False}
+        return {
+            "path": self.local_file_path,
+            "loaded": True,
+            "load_time": snapshot.load_time,
+            "triple_count": snapshot.triple_count,
+            "indexed_articles": len(snapshot.article_index),
+            "loaded_at": snapshot.loaded_at,
+            "mtime": snapshot.mtime,
+            "sha256": snapshot.sha256,
+        }
+
+    def _is_stale(self, snapshot):
+        try:
+            return os.stat(self.local_file_path).st_mtime != snapshot.mtime
+        except OSError:
+            # Keep serving the last good graph if the file is temporarily missing
+            return False
+
+    def _reload(self, snapshot):
+        try:
+            stat = os.stat(self.local_file_path)
+            sha256, prefix_sha256 = _file_digests(self.local_file_path, snapshot.size, stat.st_size)
+            if sha256 == snapshot.sha256:
+                # Touched but unchanged: remember the new mtime and keep the parsed graph
+                self._snapshot = GraphSnapshot(
+                    snapshot.graph, snapshot.article_index, stat.st_mtime, snapshot.sha256, snapshot.load_time,
+                    snapshot.size,
+                )
+                return
+            if prefix_sha256 == snapshot.sha256 and not use_triple_store():
+                try:
+                    self._snapshot = self._load_appended(snapshot, stat, sha256)
+                    return
+                except Exception as e:
+                    print(f"Error reading the triples appended to '{self.local_file_path}', parsing it again: {e}")
+            self._snapshot = self._load()
+        except Exception as e:
+            print(f"Error reloading RDF graph from '{self.local_file_path}': {e}")
+
+    def _load_appended(self, snapshot, stat, sha256):
+        start = time.perf_counter()
+        with open(self.local_file_path, "rb") as f:
+            f.seek(snapshot.size)
+            data = f.read(stat.st_size - snapshot.size)
+        if self.local_file_path.endswith(".gz"):
+            data = gzip.decompress(data)  # Appending to a gzip file adds a new member
+
+        added = Graph()
+        with span("rdf.parse_appended", bytes=len(data)) as s:
+            added.parse(data=data, format=self.rdf_format)
+            s.set(triples=len(added))
+        previous = snapshot.graph.graphs if isinstance(snapshot.graph, ReadOnlyGraphAggregate) else [snapshot.graph]
+        graph = ReadOnlyGraphAggregate(list(previous) + [added])
+        with span("rdf.index_appended") as s:
+            article_index = snapshot.article_index.appended(graph, added.subjects(RDF.type, EX.Article))
+            s.set(articles=len(article_index) - len(snapshot.article_index))
+        load_time = time.perf_counter() - start
+
+        return GraphSnapshot(graph, article_index, stat.st_mtime, sha256, load_time, stat.st_size)
+
+    def _load(self):
+        if use_triple_store():
+            return self._open_store()
+
+        stat = os.stat(self.local_file_path)
+        sha256 = _file_sha256(self.local_file_path)
+
+        start = time.perf_counter()
+        graph = Graph()
+        with span("rdf.parse", bytes=os.path.getsize(self.local_file_path)) as s:
+            if self.local_file_path.endswith(".gz"):
+                with gzip.open(self.local_file_path, "rb") as f:
+                    graph.parse(file=f, format=self.rdf_format)
+            else:
+                graph.parse(self.local_file_path, format=self.rdf_format)
+            s.set(triples=len(graph))
+        with span("rdf.index") as s:
+            article_index = ArticleIndex(graph)
+            s.set(articles=len(article_index))
+        load_time = time.perf_counter() - start
+
+        return GraphSnapshot(graph, article_index, stat.st_mtime, sha256, load_time, stat.st_size)
+
+    def _open_store(self):
+        start = time.perf_counter()
+        with span("rdf.open_store") as s:
+            graph = open_triple_store(self.local_file_path, self.rdf_format)
+            s.set(triples=len(graph))
+        with span("rdf.index") as s:
+            article_index = ArticleIndex.from_store(graph)
+            s.set(articles=len(article_index))
+        load_time = time.perf_counter() - start
+
+        # The store records the file it was imported from, which is what staleness is checked against
+        return GraphSnapshot(graph, article_index, graph.meta["source_mtime"], graph.meta["source_sha256"], load_time)
+
+
+_shared_graphs = {}
+_shared_graphs_lock = threading.Lock()
+
+
+def get_shared_graph(local_file_path, rdf_format="ttl"):
+    """
+    Returns the process-wide PubMedGraph for a file, creating it on first use.
+
+    Args:
+        local_file_path (str): Path to the RDF file, optionally gzipped (.gz).
+        rdf_format (str): The rdflib parser format of the file, e.g. "ttl" or "nt".
+
+    Returns:
+        PubMedGraph: The shared graph for that path.
+    """
+    key = os.path.abspath(local_file_path)
+    shared = _shared_graphs.get(key)
+    if shared is None:
+        with _shared_graphs_lock:
+            shared = _shared_graphs.get(key)
+            if shared is None:
+                shared = PubMedGraph(key, rdf_format)
+                _shared_graphs[key] = shared
+    return shared
@@ -0,0 +1,76 @@
+import numpy as np
+
+RANKING_METHODS = ("linear", "rrf")
+
+
+def _vector_similarity(distances):
+    # Weaviate cosine distances lie in [0, 2]; map them to a similarity in [0, 1]
+    return np.clip(1.0 - distances / 2.0, 0.0, 1.0)
+
+
+def _overlap_ranks(overlap_counts):
+    # Competition ranks (1, 1, 3, ...): one plus the number of candidates with more matches
+    ascending = np.sort(overlap_counts)
+    return 1 + len(ascending) - np.searchsorted(ascending, overlap_counts, side="right")
+
+
+def _vector_ranks(vector_distances):
+    # Ordinal ranks by distance, ties in input order; candidates without a distance get 0
+    ranks = np.zeros(len(vector_distances), dtype=np.int64)
+    known = np.flatnonzero(~np.isnan(vector_distances))
+    order = known[np.argsort(vector_distances[known], kind="stable")]
+    ranks[order] = np.arange(1, len(order) + 1)
+    return ranks
+
+
+def _top_k(scores, k):
+    # Best k scores, ties kept in input order, without sorting the whole candidate set
+    if len(scores) > k:
+        threshold = np.partition(scores, len(scores) - k)[len(scores) - k]
+        positions = np.flatnonzero(scores >= threshold)
+    else:
+        positions = np.arange(len(scores))
+    best = positions[np.lexsort((positions, -scores[positions]))]
+    return best[:k]
+
+
+def rank_articles(overlap_counts, selected_count, vector_distances=None, method="linear",
+                  vector_weight=0.5, k=10, rrf_k=60):
+    """
+    Fuses vector relevance with MeSH-term overlap and keeps the k best articles.
+
+    Scores are computed for all candidates at once as NumPy arrays, and only the k best are
+    sorted, so the candidate set can be large.
+
+    Args:
+        overlap_counts (numpy.ndarray): Number of selected MeSH terms each candidate matched.
+        selected_count (int): Number of selected MeSH terms, to normalize the overlap.
+        vector_distances (numpy.ndarray): Each candidate's distance from the Tab 1 vector
+            search, NaN where unknown.
+        method (str): "linear" for a weighted sum of normalized scores, or "rrf" for
+            reciprocal rank fusion of the two rankings.
+        vector_weight (float): Weight of the vector signal in [0, 1]; the overlap signal
+            gets 1 - vector_weight.
+        k (int): Number of articles to return.
+        rrf_k (int): The RRF damping constant.
+
+    Returns:
+        list: (position, score) tuples, best first, where position indexes the candidates.
+    """
+    if method not in RANKING_METHODS:
+        raise ValueError(f"Unknown ranking method '{method}'. Choose one of: {', '.join(RANKING_METHODS)}")
+
+    overlap_counts = np.asarray(overlap_counts, dtype=np.float64)
+    if vector_distances is None:
+        vector_distances = np.full(len(overlap_counts), np.nan)
+    overlap_weight = 1.0 - vector_weight
+
+    if method == "linear":
+        similarity = np.nan_to_num(_vector_similarity(vector_distances), nan=0.0)
+        scores = vector_weight * similarity + overlap_weight * overlap_counts / max(selected_count, 1)
+    else:
+        scores = overlap_weight / (rrf_k + _overlap_ranks(overlap_counts))
+        vector_ranks = _vector_ranks(vector_distances)
+        scores = scores + np.where(vector_ranks > 0, vector_weight / (rrf_k + vector_ranks), 0.0)
+
+    return [(int(position), float(scores[position])) for position in _top_k(scores, k)]
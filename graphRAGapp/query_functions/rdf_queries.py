@@ -1,141 +1,207 @@
 import requests
-import base64
+import gzip
+import hashlib
+import json
 from config import DATABRICKS_SERVER_HOSTNAME, DATABRICKS_ACCESS_TOKEN
-from rdflib import Graph, URIRef
-from urllib.parse import quote
 import os
-import urllib.parse
 from SPARQLWrapper import SPARQLWrapper, JSON
-import re
+from query_functions.pubmed_graph import get_shared_graph
+from query_functions.databricks_queries import get_table_article_index, use_table_articles
+from query_functions.tracing import count_of, traced
+from query_functions.mesh_terms import convert_to_uri, sanitize_term
+from query_functions.mesh_vocabulary import get_mesh_vocabulary
+from query_functions.mesh_cache import concept_cache, descendant_cache, narrower_cache
+from concurrent.futures import ThreadPoolExecutor, wait
+import time
+
+# Narrower-concept traversal: labels per VALUES query, concurrent queries, and seconds per expansion
+NARROWER_BATCH_SIZE = 40
+NARROWER_MAX_WORKERS = 4
+NARROWER_TIME_BUDGET = 20.0
+
+# Graph downloads: bytes read per chunk and seconds to wait for the workspace API
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+_narrower_executor = ThreadPoolExecutor(max_workers=NARROWER_MAX_WORKERS, thread_name_prefix="mesh-narrower")
 
 # Function to download RDF file from Databricks
-def download_rdf_file(workspace_file_path, local_file_path):
-    # Check if the file already exists locally
-    if os.path.exists(local_file_path):
-        print(f"File already exists locally at {local_file_path}. Skipping download.")
-        return
-
-    # Databricks workspace URL
-    DATABRICKS_WORKSPACE_URL = f"https://{DATABRICKS_SERVER_HOSTNAME}"
-
-    # API endpoint
-    url = f"{DATABRICKS_WORKSPACE_URL}/api/2.0/workspace/export"
-
-    # API parameters
-    params = {
-        "path": workspace_file_path,
-        "format": "SOURCE"
-    }
-
-    # API headers
-    headers = {
-        "Authorization": f"Bearer {DATABRICKS_ACCESS_TOKEN}"
-    }
-
-    # Download the file
-    response = requests.get(url, headers=headers, params=params)
-
-    if response.status_code == 200:
-        # Decode the base64 content
-        response_json = response.json()
-        encoded_content = response_json.get("content")
-        if not encoded_content:
-            raise Exception("Failed to fetch file content: 'content' field is missing in the response.")
-
-        decoded_content = base64.b64decode(encoded_content)
-
-        # Save the decoded content to a local file
-        with open(local_file_path, "wb") as f:
-            f.write(decoded_content)
-        print(f"File downloaded successfully to {local_file_path}")
-    else:
-        raise Exception(f"Failed to download file (HTTP {response.status_code}): {response.text}")
-
-
-def convert_to_uri(term, base_namespace="http://example.org/mesh/"):
+@traced("rdf.download")
+def download_rdf_file(workspace_file_path, local_file_path, force=False, expected_sha256=None,
+                      chunk_size=DOWNLOAD_CHUNK_SIZE, timeout=DOWNLOAD_TIMEOUT):
     """
-    Converts a MeSH term into a standardized URI by replacing spaces and special characters with underscores,
-    ensuring it starts and ends with an underscore, and URL-encoding the term.
+    Downloads the graph file from the Databricks workspace if the local copy is missing or stale.
+
+    The export is streamed to a temporary file in chunks and renamed over local_file_path only
+    once it is complete and verified, so readers never see a partial file and memory use does
+    not grow with the file size. A sidecar <local_file_path>.meta.json records the remote
+    modification time, size and SHA-256 of what was downloaded; the download is skipped when
+    the workspace reports the same modification time, or when expected_sha256 matches the
+    recorded hash (or, without a sidecar, the hash of the local copy). If the workspace cannot
+    be reached the local copy is kept, unless it fails the expected_sha256 check. A
+    local_file_path ending in .gz is written gzip-compressed.
 
     Args:
-        term (str): The MeSH term to convert.
-        base_namespace (str): The base namespace for the URI.
+        workspace_file_path (str): Path of the file in the Databricks workspace.
+        local_file_path (str): Where to store it.
+        force (bool): Download even if the local copy looks current.
+        expected_sha256 (str): Hex SHA-256 of the file's (uncompressed) content; the download
+            fails if it does not match.
+        chunk_size (int): Bytes read per chunk.
+        timeout (float): Seconds to wait for the server to connect or send data.
 
     Returns:
-        URIRef: The formatted URI.
+        bool: True if the file was downloaded, False if the local copy was kept.
     """
-    # Step 1: Strip existing leading and trailing underscores
-    stripped_term = term.strip("_")
-
-    # Step 2: Replace spaces, commas, dashes, and other non-alphanumeric characters with underscores
-    # Using regex to replace one or more non-word characters with a single underscore
-    formatted_term = re.sub(r'\W+', '_', stripped_term)
-
-    # Step 3: Replace multiple consecutive underscores with a single underscore
-    formatted_term = re.sub(r'_+', '_', formatted_term)
-
-    # Step 4: URL-encode the term to handle any remaining special characters
-    encoded_term = quote(formatted_term)
-
-    # Step 5: Ensure single leading and trailing underscores
-    uri = f"{base_namespace}_{encoded_term}_"
-
-    return URIRef(uri)
-
+    # Databricks workspace URL (a hostname, or a full URL such as a local stand-in) and API headers
+    if "://" in DATABRICKS_SERVER_HOSTNAME:
+        DATABRICKS_WORKSPACE_URL = DATABRICKS_SERVER_HOSTNAME.rstrip("/")
+    else:
+        DATABRICKS_WORKSPACE_URL = f"https://{DATABRICKS_SERVER_HOSTNAME}"
+    headers = {
+        "Authorization": f"Bearer {DATABRICKS_ACCESS_TOKEN}"
+    }
+    meta_path = f"{local_file_path}.meta.json"
 
-import re
-from rdflib import Graph, URIRef
-from urllib.parse import quote
-import pandas as pd
+    # Ask the workspace for the file's modification time and size
+    remote = {}
+    status_error = None
+    try:
+        response = requests.get(
+            f"{DATABRICKS_WORKSPACE_URL}/api/2.0/workspace/get-status",
+            headers=headers, params={"path": workspace_file_path}, timeout=timeout,
+        )
+        response.raise_for_status()
+        status = response.json()
+        remote = {"modified_at": status.get("modified_at"), "size": status.get("size")}
+    except Exception as e:
+        status_error = e
+
+    if os.path.exists(local_file_path) and not force:
+        local = _read_download_meta(meta_path)
+        if expected_sha256 is not None:
+            if _local_sha256(local_file_path, local) == expected_sha256:
+                print(f"File at {local_file_path} matches the expected checksum. Skipping download.")
+                return False
+        elif status_error is not None:
+            print(f"Could not check {workspace_file_path} for changes ({status_error}); using the local copy.")
+            return False
+        elif remote.get("modified_at") is None:
+            print(f"File already exists locally at {local_file_path}. Skipping download.")
+            return False
+        elif local.get("modified_at") == remote["modified_at"]:
+            print(f"File at {local_file_path} is up to date. Skipping download.")
+            return False
+    if status_error is not None:
+        print(f"Could not check {workspace_file_path} for changes ({status_error}); downloading it.")
+
+    # Stream the raw file content to a temporary file next to the destination
+    temp_path = f"{local_file_path}.{os.getpid()}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with requests.get(
+            f"{DATABRICKS_WORKSPACE_URL}/api/2.0/workspace/export",
+            headers=headers,
+            params={"path": workspace_file_path, "format": "SOURCE", "direct_download": "true"},
+            stream=True,
+            timeout=timeout,
+        ) as response:
+            if response.status_code != 200:
+                raise Exception(f"Failed to download file (HTTP {response.status_code}): {response.text}")
+            opener = gzip.open if local_file_path.endswith(".gz") else open
+            with opener(temp_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=chunk_size):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+
+        sha256 = digest.hexdigest()
+        if expected_sha256 is not None and sha256 != expected_sha256:
+            raise Exception(f"Checksum mismatch for {workspace_file_path}: expected {expected_sha256}, got {sha256}")
+        if remote.get("size") is not None and remote["size"] != size:
+            raise Exception(f"Incomplete download of {workspace_file_path}: expected {remote['size']} bytes, got {size}")
+
+        os.replace(temp_path, local_file_path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+    with open(meta_path, "w") as f:
+        json.dump({**remote, "sha256": sha256, "bytes": size, "downloaded_at": time.time()}, f)
+    print(f"File downloaded successfully to {local_file_path} ({size} bytes)")
+    return True
+
+
+def _read_download_meta(meta_path):
+    try:
+        with open(meta_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Function to get the SHA-256 of a downloaded file's content, from its sidecar or by hashing it
+def _local_sha256(local_file_path, meta, chunk_size=DOWNLOAD_CHUNK_SIZE):
+    if meta.get("sha256"):
+        return meta["sha256"]
+    digest = hashlib.sha256()
+    opener = gzip.open if local_file_path.endswith(".gz") else open
+    try:
+        with opener(local_file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
 
 
-# Updated convert_to_uri function assumed to be present
-def convert_to_uri(term, base_namespace="http://example.org/mesh/"):
+# Function to query RDF using SPARQL
+@traced(
+    "rdf.query",
+    attributes=lambda local_file_path, query, mesh_terms, *args, article_uris=None, **kwargs: {
+        "terms": len(mesh_terms or ()), "candidates": len(article_uris) if article_uris is not None else None,
+    },
+    result_attributes=count_of(),
+)
+def query_rdf(local_file_path, query, mesh_terms, base_namespace="http://example.org/mesh/", article_uris=None,
+              vector_distances=None, ranking_method="linear", vector_weight=0.5, limit=10):
     """
-    Converts a MeSH term into a standardized URI by replacing spaces and special characters with underscores,
-    ensuring it starts and ends with a single underscore, and URL-encoding the term.
+    Returns the top articles matching the selected MeSH terms.
+
+    When article_uris is given, the candidates are filtered in a single pass over the article/MeSH
+    indexes built when the graph was loaded, and the SPARQL query is not needed. Matches are then
+    ranked by fusing their MeSH-term overlap with their vector search distance (see
+    ranking.rank_articles). Otherwise the query is run once per term with ?meshTerm bound to the
+    term's URI and the top 10 are ranked by how many terms they match.
 
     Args:
-        term (str): The MeSH term to convert.
-        base_namespace (str): The base namespace for the URI.
+        local_file_path (str): Path to the PubMedGraph file.
+        query (str): SPARQL query selecting ?article ?title ?abstract ?datePublished ?access ?meshTerm.
+        mesh_terms (list): The selected MeSH terms.
+        base_namespace (str): The base namespace for MeSH term URIs.
+        article_uris (list): Candidate article URIs, e.g. from the Tab 1 vector search.
+        vector_distances (dict): Article URI -> vector search distance for the candidates.
+        ranking_method (str): "linear" or "rrf".
+        vector_weight (float): Weight of vector relevance versus term overlap, in [0, 1].
+        limit (int): Number of articles to return from the indexed path.
 
     Returns:
-        URIRef: The formatted URI.
+        list: (article_uri, data) tuples, best match first.
     """
-    if pd.isna(term):
-        return None  # Handle NaN or None terms gracefully
-
-    # Step 1: Strip existing leading and trailing non-word characters (including underscores)
-    stripped_term = re.sub(r'^\W+|\W+$', '', term)
-
-    # Step 2: Replace non-word characters with underscores (one or more)
-    formatted_term = re.sub(r'\W+', '_', stripped_term)
-
-    # Step 3: Replace multiple consecutive underscores with a single underscore
-    formatted_term = re.sub(r'_+', '_', formatted_term)
-
-    # Step 4: URL-encode the term to handle any remaining special characters
-    encoded_term = quote(formatted_term)
-
-    # Step 5: Add single leading and trailing underscores
-    term_with_underscores = f"_{encoded_term}_"
-
-    # Step 6: Concatenate with base_namespace without adding an extra underscore
-    uri = f"{base_namespace}{term_with_underscores}"
-
-    return URIRef(uri)
-
-
-# Function to query RDF using SPARQL
-def query_rdf(local_file_path, query, mesh_terms, base_namespace="http://example.org/mesh/"):
     if not mesh_terms:
         raise ValueError("The list of MeSH terms is empty or invalid.")
 
+    if article_uris is not None:
+        return _query_rdf_indexed(
+            local_file_path, mesh_terms, base_namespace, article_uris,
+            vector_distances, ranking_method, vector_weight, limit,
+        )
+
     #print("SPARQL Query:", query)
 
-    # Create and parse the RDF graph
-    g = Graph()
-    g.parse(local_file_path, format="ttl")
+    # Reuse the graph already parsed by this server process
+    g = get_shared_graph(local_file_path).graph
 
     article_data = {}
 
@@ -169,23 +235,71 @@ def query_rdf(local_file_path, query, mesh_terms, base_namespace="http://example
     return ranked_articles[:10]
 
 
-def sanitize_term(term):
+def _article_index(local_file_path):
+    # Articles are read from the Databricks table when one is configured, otherwise from the graph file
+    if use_table_articles():
+        return get_table_article_index()
+    return get_shared_graph(local_file_path).article_index
+
+
+def _query_rdf_indexed(local_file_path, mesh_terms, base_namespace, article_uris,
+                       vector_distances, ranking_method, vector_weight, limit):
+    index = _article_index(local_file_path)
+
+    mesh_term_uris = {convert_to_uri(term, base_namespace) for term in mesh_terms}
+    return index.top_articles(
+        article_uris, mesh_term_uris, vector_distances,
+        ranking_method=ranking_method, vector_weight=vector_weight, k=limit,
+    )
+
+
+# Function to find articles with similar MeSH terms ("More like this")
+@traced("rdf.similar", result_attributes=count_of())
+def find_similar_articles(local_file_path, article_uri, k=5):
     """
-    Clean and format the term:
-    - Remove leading/trailing quotes (single or double)
-    - Replace underscores with spaces
-    - Ensure no unwanted characters remain
+    Returns the articles whose MeSH terms overlap most with those of the given article.
+
+    Uses the MinHash-LSH index of the loaded graph, so only a handful of candidates are compared
+    instead of every article (see ArticleIndex.similar).
+
+    Args:
+        local_file_path (str): Path to the PubMedGraph file.
+        article_uri (str): URI of the article to find neighbors for.
+        k (int): Number of similar articles to return.
+
+    Returns:
+        list: (article_uri, data) tuples, most similar first, in the shape query_rdf returns
+            with the Jaccard similarity of the MeSH terms under 'similarity'.
     """
-    if not term:
-        return term
-    term = term.strip("'\"")  # Remove single or double quotes
-    term = term.replace("_", " ")  # Replace underscores with spaces
-    return term.strip()
+    index = _article_index(local_file_path)
 
+    similar_articles = []
+    for uri, similarity in index.similar(article_uri, k=k):
+        data = index.fetch(uri)
+        data['meshTerms'] = {str(index.terms[t]) for t in index.row_terms(index.articles.id_of(uri))}
+        data['similarity'] = similarity
+        similar_articles.append((uri, data))
+    return similar_articles
 
-# Fetch alternative names and triples for a MeSH term
+
+# Fetch alternative names and triples for a MeSH term, from the local vocabulary if one is configured
+@traced("mesh.concepts", result_attributes=count_of())
 def get_concept_triples_for_term(term):
     term = sanitize_term(term)  # Sanitize input term
+    vocabulary = get_mesh_vocabulary()
+    if vocabulary is not None:
+        return vocabulary.concept_labels(term)
+
+    try:
+        # Remote answers are shared across sessions and restarts; failures are not cached
+        return list(concept_cache.get_or_compute(term, lambda: _fetch_concept_triples(term)))
+    except Exception as e:
+        print(f"Error fetching concept triples for term '{term}': {e}")
+        return []
+
+
+@traced("mesh.sparql.concepts")
+def _fetch_concept_triples(term):
     sparql = SPARQLWrapper("https://id.nlm.nih.gov/mesh/sparql")
     query = f"""
     PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
@@ -203,27 +317,37 @@ def get_concept_triples_for_term(term):
         OPTIONAL {{ ?o rdfs:label ?oLabel . }}
     }}
     """
-    try:
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
+    sparql.setQuery(query)
+    sparql.setReturnFormat(JSON)
+    results = sparql.query().convert()
 
-        triples = set()
-        for result in results["results"]["bindings"]:
-            obj_label = result.get("oLabel", {}).get("value", "No label")
-            triples.add(sanitize_term(obj_label))  # Sanitize term before adding
+    triples = set()
+    for result in results["results"]["bindings"]:
+        obj_label = result.get("oLabel", {}).get("value", "No label")
+        triples.add(sanitize_term(obj_label))  # Sanitize term before adding
 
-        # Add the sanitized term itself to ensure it's included
-        triples.add(sanitize_term(term))
-        return list(triples)
+    # Add the sanitized term itself to ensure it's included
+    triples.add(sanitize_term(term))
+    return list(triples)
 
-    except Exception as e:
-        print(f"Error fetching concept triples for term '{term}': {e}")
-        return []
 
-# Fetch narrower concepts for a MeSH term
+# Fetch narrower concepts for a MeSH term, from the local vocabulary if one is configured
+@traced("mesh.narrower", result_attributes=count_of())
 def get_narrower_concepts_for_term(term):
     term = sanitize_term(term)  # Sanitize input term
+    vocabulary = get_mesh_vocabulary()
+    if vocabulary is not None:
+        return vocabulary.narrower_labels(term)
+
+    try:
+        return list(narrower_cache.get_or_compute(term, lambda: _fetch_narrower_concepts(term)))
+    except Exception as e:
+        print(f"Error fetching narrower concepts for term '{term}': {e}")
+        return []
+
+
+@traced("mesh.sparql.narrower")
+def _fetch_narrower_concepts(term):
     sparql = SPARQLWrapper("https://id.nlm.nih.gov/mesh/sparql")
     query = f"""
     PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
@@ -238,34 +362,100 @@ def get_narrower_concepts_for_term(term):
         ?narrowerConcept rdfs:label ?narrowerConceptLabel .
     }}
     """
-    try:
-        sparql.setQuery(query)
-        sparql.setReturnFormat(JSON)
-        results = sparql.query().convert()
+    sparql.setQuery(query)
+    sparql.setReturnFormat(JSON)
+    results = sparql.query().convert()
+
+    concepts = set()
+    for result in results["results"]["bindings"]:
+        subject_label = result.get("narrowerConceptLabel", {}).get("value", "No label")
+        concepts.add(sanitize_term(subject_label))  # Sanitize term before adding
 
-        concepts = set()
-        for result in results["results"]["bindings"]:
-            subject_label = result.get("narrowerConceptLabel", {}).get("value", "No label")
-            concepts.add(sanitize_term(subject_label))  # Sanitize term before adding
+    return list(concepts)
+
+
+# Fetch every descendant of a MeSH term at once, from the local hierarchy index if one is configured
+@traced("mesh.descendants", result_attributes=count_of())
+def get_all_descendant_concepts(term):
+    """
+    Returns the labels of all descriptors below the term, at any depth.
 
-        return list(concepts)
+    With the local vocabulary this is a slice of its interval-labeled hierarchy (see
+    MeshHierarchy). Otherwise a single SPARQL query follows meshv:broaderDescriptor
+    transitively, and the answer is cached like the other lookups.
+    """
+    term = sanitize_term(term)  # Sanitize input term
+    vocabulary = get_mesh_vocabulary()
+    if vocabulary is not None:
+        return vocabulary.descendant_labels(term)
 
+    try:
+        return list(descendant_cache.get_or_compute(term, lambda: _fetch_descendant_concepts(term)))
     except Exception as e:
-        print(f"Error fetching narrower concepts for term '{term}': {e}")
+        print(f"Error fetching descendant concepts for term '{term}': {e}")
         return []
 
-# Recursive function to fetch narrower concepts to a given depth
-def get_all_narrower_concepts(term, depth=2, current_depth=1):
+
+@traced("mesh.sparql.descendants")
+def _fetch_descendant_concepts(term):
+    sparql = SPARQLWrapper("https://id.nlm.nih.gov/mesh/sparql")
+    query = f"""
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    PREFIX meshv: <http://id.nlm.nih.gov/mesh/vocab#>
+
+    SELECT DISTINCT ?narrowerConceptLabel
+    WHERE {{
+        ?broaderConcept rdfs:label {_sparql_literal(term)} .
+        ?narrowerConcept meshv:broaderDescriptor+ ?broaderConcept .
+        ?narrowerConcept rdfs:label ?narrowerConceptLabel .
+    }}
+    """
+    sparql.setQuery(query)
+    sparql.setReturnFormat(JSON)
+    results = sparql.query().convert()
+
+    concepts = {sanitize_term(result["narrowerConceptLabel"]["value"]) for result in results["results"]["bindings"]}
+    concepts.discard(term)
+    return sorted(concepts)
+
+
+# Breadth-first traversal fetching narrower concepts to a given depth, one batch per level
+@traced("mesh.narrower_tree", result_attributes=count_of("nodes"))
+def get_all_narrower_concepts(term, depth=2, current_depth=1, time_budget=NARROWER_TIME_BUDGET):
+    """
+    Returns {term: [narrower concepts]} for the term and its descendants down to depth levels.
+
+    Each level's frontier is looked up together: cached terms are served from the cache and the
+    rest are fetched with batched VALUES queries run concurrently, so wall-clock time grows with
+    the number of levels rather than the number of nodes. Terms already visited are not fetched
+    again. Once time_budget seconds have passed no further levels are started and the mapping
+    collected so far is returned.
+    """
     term = sanitize_term(term)  # Sanitize input term
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
     all_concepts = {}
     try:
-        narrower_concepts = get_narrower_concepts_for_term(term)
-        all_concepts[sanitize_term(term)] = narrower_concepts
-
-        if current_depth < depth:
-            for concept in narrower_concepts:
-                child_concepts = get_all_narrower_concepts(concept, depth, current_depth + 1)
-                all_concepts.update(child_concepts)
+        frontier = [term]
+        visited = {term}
+        level = current_depth
+        while frontier:
+            level_concepts = _get_narrower_concepts_batch(frontier, deadline)
+            all_concepts.update(level_concepts)
+
+            if level >= depth:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"Time budget exhausted expanding narrower concepts for term '{term}' at depth {level}")
+                break
+
+            next_frontier = []
+            for parent in frontier:
+                for concept in level_concepts.get(parent, []):
+                    if concept not in visited:
+                        visited.add(concept)
+                        next_frontier.append(concept)
+            frontier = next_frontier
+            level += 1
 
     except Exception as e:
         print(f"Error fetching all narrower concepts for term '{term}': {e}")
@@ -273,45 +463,91 @@ def get_all_narrower_concepts(term, depth=2, current_depth=1):
     return all_concepts
 
 
-"""
-def query_rdf_single_query(local_file_path, query, mesh_terms):
-    if not mesh_terms:
-        raise ValueError("The list of MeSH terms is empty or invalid.")
+# Fetch narrower concepts for several MeSH terms at once, with batched queries for uncached terms
+@traced("mesh.narrower_many", attributes=lambda terms, **kwargs: {"terms": len(terms)}, result_attributes=count_of())
+def get_narrower_concepts_for_terms(terms, time_budget=NARROWER_TIME_BUDGET):
+    """
+    Returns {term: [narrower concepts]} for each of the terms, one level deep.
+    """
+    terms = list(dict.fromkeys(sanitize_term(term) for term in terms if term))
+    deadline = time.monotonic() + time_budget if time_budget is not None else None
+    try:
+        return _get_narrower_concepts_batch(terms, deadline)
+    except Exception as e:
+        print(f"Error fetching narrower concepts for terms {terms}: {e}")
+        return {}
+
+
+def _get_narrower_concepts_batch(terms, deadline=None):
+    vocabulary = get_mesh_vocabulary()
+    if vocabulary is not None:
+        return {term: vocabulary.narrower_labels(term) for term in terms}
+
+    concepts = narrower_cache.get_many(terms)
+    missing = [term for term in terms if term not in concepts]
+    chunks = [missing[i:i + NARROWER_BATCH_SIZE] for i in range(0, len(missing), NARROWER_BATCH_SIZE)]
+    futures = {_narrower_executor.submit(_fetch_and_cache_narrower_batch, chunk): chunk for chunk in chunks}
+
+    timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+    done, not_done = wait(futures, timeout=timeout)
+    for future in not_done:
+        future.cancel()
+        print(f"Time budget exhausted before narrower concepts were fetched for {futures[future]}")
+
+    for future in done:
+        chunk = futures[future]
+        try:
+            batch = future.result()
+        except Exception as e:
+            print(f"Error fetching narrower concepts for terms {chunk}: {e}")
+            for term in chunk:
+                concepts[term] = []
+            continue
+        for term in chunk:
+            concepts[term] = list(batch[term])
+
+    return {term: concepts[term] for term in terms if term in concepts}
+
+
+def _fetch_and_cache_narrower_batch(terms):
+    # Cache inside the worker so batches finishing after the time budget still warm the cache.
+    # The terms are claimed in the cache while the batch runs, so a Tab 2 expansion of one of
+    # them waits for this query instead of sending its own
+    return narrower_cache.get_or_compute_many(terms, _fetch_narrower_concepts_batch)
+
+
+@traced("mesh.sparql.narrower_batch", attributes=lambda terms: {"terms": len(terms)})
+def _fetch_narrower_concepts_batch(terms):
+    values = " ".join(_sparql_literal(term) for term in terms)
+    sparql = SPARQLWrapper("https://id.nlm.nih.gov/mesh/sparql")
+    query = f"""
+    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+    PREFIX meshv: <http://id.nlm.nih.gov/mesh/vocab#>
+    PREFIX mesh: <http://id.nlm.nih.gov/mesh/>
 
-    g = Graph()
-    g.parse(local_file_path, format="ttl")
+    SELECT ?broaderLabel ?narrowerConceptLabel
+    WHERE {{
+        VALUES ?broaderLabel {{ {values} }}
+        ?broaderConcept rdfs:label ?broaderLabel .
+        ?narrowerConcept meshv:broaderDescriptor ?broaderConcept .
+        ?narrowerConcept rdfs:label ?narrowerConceptLabel .
+    }}
+    """
+    sparql.setQuery(query)
+    sparql.setReturnFormat(JSON)
+    results = sparql.query().convert()
 
-    # Run one query to get all MeSH terms for the selected articles
-    results = g.query(query)
+    concepts = {term: set() for term in terms}
+    for result in results["results"]["bindings"]:
+        broader_label = result["broaderLabel"]["value"]
+        subject_label = result.get("narrowerConceptLabel", {}).get("value", "No label")
+        if broader_label in concepts:
+            concepts[broader_label].add(sanitize_term(subject_label))  # Sanitize term before adding
 
-    base_namespace = "http://example.org/mesh/"
-    # Convert all user-selected terms into URIs
-    mesh_terms_uris = [convert_to_uri(term, base_namespace) for term in mesh_terms]
+    return {term: list(labels) for term, labels in concepts.items()}
 
-    article_data = {}
-    # Store all mesh terms for each article as URIRefs
-    for row in results:
-        article_uri = row['article']
-        if article_uri not in article_data:
-            article_data[article_uri] = {
-                'title': row['title'],
-                'abstract': row['abstract'],
-                'datePublished': row['datePublished'],
-                'access': row['access'],
-                'meshTerms': set()
-            }
-
-        # row['meshTerm'] should already be a URIRef. Add it directly.
-        # Do not convert to string if you want to match URIs.
-        article_data[article_uri]['meshTerms'].add(row['meshTerm'])
-
-    # Now we have all MeSH terms for each article.
-    # Rank by how many selected mesh_terms URIs appear in each article’s meshTerms set.
-    mesh_terms_set = set(mesh_terms_uris)
-    ranked_articles = sorted(
-        article_data.items(),
-        key=lambda item: len(mesh_terms_set.intersection(item[1]['meshTerms'])),
-        reverse=True
-    )
-    return ranked_articles[:10]
-"""
\ No newline at end of file
+
+def _sparql_literal(term):
+    escaped = term.replace("\\", "\\\\").replace('"', '\\"')
+    return f'"{escaped}"@en'
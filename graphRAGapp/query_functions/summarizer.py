@@ -0,0 +1,343 @@
+import hashlib
+import json
+import math
+import os
+import random
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from query_functions.tracing import span, start_span
+
+GPT_MODELS = ["gpt-4o", "gpt-4o-mini"]
+DEFAULT_MODEL = GPT_MODELS[1]
+SYSTEM_PROMPT = 'You summarize medical texts.'
+
+# Map-reduce summarization: most article tokens per map call, concurrent map calls, and
+# retries per call when the API is rate limited or unavailable
+CHUNK_TOKENS = 6000
+MAP_WORKERS = 4
+MAX_RETRIES = 5
+MAP_INSTRUCTION = (
+    "The articles below are one part of a larger set. Extract the information from them that is "
+    "relevant to this request, as concise notes that will be merged with notes on the other parts:"
+)
+REDUCE_INSTRUCTION = "The text below consists of notes taken on different parts of a set of articles."
+MERGE_INSTRUCTION = "Merge them into concise notes relevant to this request, to be merged again with other notes:"
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and server errors
+RETRYABLE_ERRORS = ("RateLimitError", "APITimeoutError", "APIConnectionError", "InternalServerError")
+
+
+class SummaryCache:
+    """
+    Content-addressed store of finished summaries on disk.
+
+    Each summary is a file named by the SHA-256 of the model, prompts and article text that
+    produced it, so identical requests from any session are answered without calling the model.
+    When the directory grows past max_bytes the least recently read summaries are deleted.
+    """
+
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(model, messages):
+        payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.txt")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                summary = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)  # Mark as recently used for eviction
+        except OSError:
+            pass
+        return summary
+
+    def put(self, key, summary):
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(summary)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".txt"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+
+_summary_cache = None
+_summary_cache_lock = threading.Lock()
+
+
+def get_summary_cache():
+    """
+    Returns the process-wide summary cache (SUMMARY_CACHE_DIR, default "summary_cache").
+    """
+    global _summary_cache
+    if _summary_cache is None:
+        with _summary_cache_lock:
+            if _summary_cache is None:
+                _summary_cache = SummaryCache(os.environ.get("SUMMARY_CACHE_DIR", "summary_cache"))
+    return _summary_cache
+
+
+def _openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=os.environ["OPENAI_API_KEY"])
+
+
+def _messages(combined_text, user_query):
+    return [
+        {'role': 'system', 'content': SYSTEM_PROMPT},
+        {'role': 'user', 'content': f"{user_query}\n\n{combined_text}"},
+    ]
+
+
+def _retry_delay(error, attempt):
+    # Honor the API's Retry-After header when it sends one, otherwise back off exponentially
+    response = getattr(error, "response", None)
+    retry_after = getattr(response, "headers", {}).get("retry-after") if response is not None else None
+    try:
+        return float(retry_after)
+    except (TypeError, ValueError):
+        return min(30.0, 0.5 * 2 ** attempt * (1 + random.random()))
+
+
+def _with_retries(call, max_retries=MAX_RETRIES):
+    for attempt in range(max_retries + 1):
+        try:
+            return call()
+        except Exception as e:
+            if type(e).__name__ not in RETRYABLE_ERRORS or attempt == max_retries:
+                raise
+            delay = _retry_delay(e, attempt)
+            print(f"OpenAI request failed ({type(e).__name__}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+_encodings = {}
+
+
+def count_tokens(text, model=DEFAULT_MODEL):
+    """
+    Returns the number of tokens in text for the model.
+
+    Uses tiktoken when it is installed, otherwise estimates about four characters per token.
+    """
+    encoding = _encodings.get(model)
+    if encoding is None:
+        try:
+            import tiktoken
+            try:
+                encoding = tiktoken.encoding_for_model(model)
+            except KeyError:
+                encoding = tiktoken.get_encoding("o200k_base")
+        except ImportError:
+            encoding = False
+        _encodings[model] = encoding
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+
+def truncate_tokens(text, max_tokens, model=DEFAULT_MODEL):
+    """
+    Cuts text down to at most max_tokens tokens, keeping its beginning.
+    """
+    tokens = count_tokens(text, model)
+    while tokens > max_tokens:
+        text = text[:int(len(text) * max_tokens / tokens)]
+        tokens = count_tokens(text, model)
+    return text
+
+
+def pack_chunks(texts, max_tokens=CHUNK_TOKENS, model=DEFAULT_MODEL):
+    """
+    Packs texts, in order, into as few chunks as fit under a token budget.
+
+    A single text longer than the budget is cut down to fit in a chunk of its own.
+
+    Returns:
+        list: The chunks, each the chunk's texts joined with spaces.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for text in texts:
+        tokens = count_tokens(text, model)
+        if tokens > max_tokens:
+            text = truncate_tokens(text, max_tokens, model)
+            tokens = count_tokens(text, model)
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(current))
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def _summarize_chunk(chunk, instruction, model, client, cache):
+    # One map call, answered from the cache when the same chunk was summarized before. It runs
+    # in a pool thread, so the span names its parent instead of taking the thread's
+    messages = _messages(chunk, instruction)
+    key = SummaryCache.key(model, messages)
+    cached = cache.get(key)
+    s = start_span("llm.chunk", parent="llm.map", model=model, bytes=len(chunk), cached=cached is not None)
+    if cached is not None:
+        s.end()
+        return cached
+    try:
+        response = _with_retries(lambda: client.chat.completions.create(
+            messages=messages,
+            model=model,
+            temperature=0,
+        ))
+        summary = (response.choices[0].message.content or "").strip()
+    except BaseException as e:
+        s.end(e)
+        raise
+    s.end()
+    if summary:
+        cache.put(key, summary)
+    return summary
+
+
+def stream_summary(combined_text, user_query, model=DEFAULT_MODEL, client=None, cache=None):
+    """
+    Yields the summary as it is generated, for st.write_stream.
+
+    A cached summary is yielded in one piece. Otherwise the completion is streamed token by
+    token and cached once it has finished; an interrupted stream is not cached.
+
+    Args:
+        combined_text (str): Titles and abstracts of the filtered articles.
+        user_query (str): The instruction entered in Tab 3.
+        model (str): The OpenAI chat model.
+        client: An OpenAI client; one is created from OPENAI_API_KEY if omitted.
+        cache (SummaryCache): Defaults to the process-wide cache.
+    """
+    cache = cache or get_summary_cache()
+    messages = _messages(combined_text, user_query)
+    key = SummaryCache.key(model, messages)
+
+    cached = cache.get(key)
+    if cached is not None:
+        with span("llm.summary", model=model, bytes=len(combined_text), cached=True):
+            pass
+        yield cached
+        return
+
+    client = client or _openai_client()
+    parts = []
+    started = time.perf_counter()
+    # Timed outside the span stack, since the generator is suspended at every yield
+    s = start_span("llm.summary", model=model, bytes=len(combined_text), cached=False)
+    try:
+        stream = _with_retries(lambda: client.chat.completions.create(
+            messages=messages,
+            model=model,
+            temperature=0,
+            stream=True,
+        ))
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            content = chunk.choices[0].delta.content
+            if content:
+                if not parts:
+                    s.set(first_token_ms=(time.perf_counter() - started) * 1000)
+                parts.append(content)
+                yield content
+    except GeneratorExit:
+        s.set(interrupted=True)
+        raise
+    except BaseException as e:
+        s.end(e)
+        raise
+    finally:
+        s.end()
+
+    summary = "".join(parts).strip()
+    if summary:
+        cache.put(key, summary)
+
+
+def generate_summary(combined_text, user_query, model=DEFAULT_MODEL, client=None, cache=None):
+    """
+    Returns the whole summary as a string, using the cache like stream_summary.
+    """
+    return "".join(stream_summary(combined_text, user_query, model, client, cache)).strip()
+
+
+def stream_map_reduce_summary(article_texts, user_query, model=DEFAULT_MODEL, client=None, cache=None,
+                              chunk_tokens=CHUNK_TOKENS, max_workers=MAP_WORKERS):
+    """
+    Summarizes any number of articles, yielding the final summary as it is generated.
+
+    The articles are packed into chunks of at most chunk_tokens tokens. If they fit in one
+    chunk, this is the same single call as stream_summary. Otherwise each chunk is summarized
+    with at most max_workers calls in flight (map), and the notes are merged by one streamed
+    call (reduce), after being merged again in chunks if they are still too long. Notes that
+    do not get shorter are cut down to fit in one chunk. Every call is cached, so a rerun only
+    repeats the calls for chunks that changed.
+
+    Args:
+        article_texts (list): One "Title: ... Abstract: ..." text per article.
+        user_query (str): The instruction entered in Tab 3.
+        model (str): The OpenAI chat model.
+        client: An OpenAI client; one is created from OPENAI_API_KEY if omitted.
+        cache (SummaryCache): Defaults to the process-wide cache.
+        chunk_tokens (int): Token budget of the articles in one call.
+        max_workers (int): Most map calls in flight at once.
+    """
+    cache = cache or get_summary_cache()
+    chunks = pack_chunks(article_texts, chunk_tokens, model)
+    if len(chunks) > 1:
+        client = client or _openai_client()
+        instruction = f"{MAP_INSTRUCTION}\n{user_query}"
+        with span("llm.map", model=model, articles=len(article_texts), chunks=len(chunks)):
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                while len(chunks) > 1:
+                    notes = list(executor.map(
+                        lambda chunk: _summarize_chunk(chunk, instruction, model, client, cache), chunks
+                    ))
+                    reduced = pack_chunks(notes, chunk_tokens, model)
+                    if len(reduced) >= len(chunks):
+                        # The notes are no shorter than their chunks; give each an equal share
+                        # of one chunk so the reduce call stays within the budget
+                        share = max(1, chunk_tokens // len(notes))
+                        reduced = [" ".join(truncate_tokens(note, share, model) for note in notes)]
+                    chunks = reduced
+                    # Later rounds merge notes rather than extract from articles
+                    instruction = f"{REDUCE_INSTRUCTION}\n{MERGE_INSTRUCTION}\n{user_query}"
+        user_query = f"{REDUCE_INSTRUCTION}\n{user_query}"
+    if not chunks:
+        return
+    yield from stream_summary(chunks[0], user_query, model, client, cache)
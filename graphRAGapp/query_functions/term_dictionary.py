@@ -0,0 +1,62 @@
+import numpy as np
+from rdflib import URIRef
+
+
+class TermDictionary:
+    """
+    Assigns dense integer IDs to URIs, in the order they are first seen.
+
+    Each URI object is stored once and shared by the ID lookup and the reverse list, so
+    structures built on top of the dictionary (such as ArticleIndex's CSR matrix) hold small
+    integers instead of URI strings.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.uris = []
+
+    def __len__(self):
+        return len(self.uris)
+
+    def __getitem__(self, term_id):
+        return self.uris[term_id]
+
+    def __contains__(self, uri):
+        return URIRef(str(uri)) in self.ids
+
+    def copy(self):
+        """
+        Returns a dictionary with the same IDs that can be extended without changing this one.
+        """
+        copy = TermDictionary()
+        copy.ids = dict(self.ids)
+        copy.uris = list(self.uris)
+        return copy
+
+    def intern(self, uri):
+        """
+        Returns the ID of a URI, adding it to the dictionary if it is new.
+        """
+        term_id = self.ids.get(uri)
+        if term_id is None:
+            term_id = self.ids[uri] = len(self.uris)
+            self.uris.append(uri)
+        return term_id
+
+    def id_of(self, uri):
+        """
+        Returns the ID of a URI, or None if it is unknown.
+        """
+        return self.ids.get(URIRef(str(uri)))
+
+    def ids_of(self, uris):
+        """
+        Looks up many URIs at once, skipping unknown ones and duplicates.
+
+        Returns:
+            numpy.ndarray: int64 IDs, in the order the URIs were given.
+        """
+        ids = dict.fromkeys(
+            term_id for term_id in (self.ids.get(URIRef(str(uri))) for uri in uris) if term_id is not None
+        )
+        return np.fromiter(ids, dtype=np.int64, count=len(ids))
@@ -0,0 +1,267 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Tracing is off unless GRAPHRAG_TRACING=1 (or set_tracing(True)); when off, span() returns a
+# shared no-op object and traced functions are called directly.
+_enabled = os.environ.get("GRAPHRAG_TRACING") == "1"
+
+SAMPLES_PER_STAGE = 2048
+RECENT_SPANS = 200
+
+
+def set_tracing(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def tracing_enabled():
+    return _enabled
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **attributes):
+        pass
+
+    def end(self, exc=None):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_local = threading.local()
+
+
+class Span:
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.parent = None
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def begin(self, parent=None):
+        stack = getattr(_local, "stack", None)
+        self.parent = parent or (stack[-1].name if stack else None)
+        self.start = time.perf_counter()
+        return self
+
+    def end(self, exc=None):
+        """
+        Records the span, with exc as its error if given. Later calls do nothing.
+        """
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start
+        if exc is not None:
+            self.error = f"{type(exc).__name__}: {exc}"
+        recorder.record(self)
+
+    def __enter__(self):
+        self.begin()
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+        stack.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.stack.pop()
+        self.end(exc)
+        return False
+
+
+class Recorder:
+    """
+    Keeps the latest durations per stage for percentiles, plus the most recent spans.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples = {}
+        self._totals = {}
+        self.recent = deque(maxlen=RECENT_SPANS)
+        self._log_path = os.environ.get("GRAPHRAG_TRACE_LOG")
+
+    def record(self, span):
+        event = {
+            "stage": span.name,
+            "parent": span.parent,
+            "start": time.time() - span.duration,
+            "duration_ms": span.duration * 1000,
+            "attributes": span.attributes,
+        }
+        if span.error:
+            event["error"] = span.error
+        with self._lock:
+            samples = self._samples.get(span.name)
+            if samples is None:
+                samples = self._samples[span.name] = deque(maxlen=SAMPLES_PER_STAGE)
+                self._totals[span.name] = [0, 0.0, 0]
+            samples.append(span.duration)
+            totals = self._totals[span.name]
+            totals[0] += 1
+            totals[1] += span.duration
+            totals[2] += 1 if span.error else 0
+            self.recent.append(event)
+            if self._log_path:
+                with open(self._log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(event, default=str) + "\n")
+
+    def set_log_path(self, path):
+        with self._lock:
+            self._log_path = path
+
+    def summary(self):
+        """
+        Returns {stage: {count, errors, mean_ms, p50_ms, p95_ms, p99_ms}} over the retained samples.
+        """
+        with self._lock:
+            snapshot = {name: (sorted(samples), list(self._totals[name])) for name, samples in self._samples.items()}
+        summary = {}
+        for name, (samples, (count, total, errors)) in snapshot.items():
+            summary[name] = {
+                "count": count,
+                "errors": errors,
+                "mean_ms": total / count * 1000,
+                "p50_ms": _percentile(samples, 0.50) * 1000,
+                "p95_ms": _percentile(samples, 0.95) * 1000,
+                "p99_ms": _percentile(samples, 0.99) * 1000,
+            }
+        return summary
+
+    def prometheus_text(self):
+        """
+        Renders the per-stage latencies in the Prometheus text exposition format.
+        """
+        with self._lock:
+            snapshot = {name: (sorted(samples), list(self._totals[name])) for name, samples in self._samples.items()}
+        lines = [
+            "# HELP graphrag_stage_duration_seconds Latency of each pipeline stage.",
+            "# TYPE graphrag_stage_duration_seconds summary",
+        ]
+        for name, (samples, (count, total, errors)) in sorted(snapshot.items()):
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(
+                    f'graphrag_stage_duration_seconds{{stage="{name}",quantile="{quantile}"}} {_percentile(samples, quantile):.6f}'
+                )
+            lines.append(f'graphrag_stage_duration_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'graphrag_stage_duration_seconds_count{{stage="{name}"}} {count}')
+        lines.append("# HELP graphrag_stage_errors_total Pipeline stage calls that raised.")
+        lines.append("# TYPE graphrag_stage_errors_total counter")
+        for name, (_, (_, _, errors)) in sorted(snapshot.items()):
+            lines.append(f'graphrag_stage_errors_total{{stage="{name}"}} {errors}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._totals.clear()
+            self.recent.clear()
+
+
+def _percentile(sorted_samples, fraction):
+    if not sorted_samples:
+        return 0.0
+    return sorted_samples[min(len(sorted_samples) - 1, int(fraction * len(sorted_samples)))]
+
+
+recorder = Recorder()
+
+
+def span(name, **attributes):
+    """
+    Times a block as a pipeline stage: `with span("rdf.query", terms=3) as s: ... s.set(results=n)`.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def start_span(name, parent=None, **attributes):
+    """
+    Starts timing a stage that is not one block of code, such as a generator that yields
+    between its start and its end: `s = start_span("llm.summary"); ...; s.end()`.
+
+    Unlike span(), the span is not pushed on the thread's stack of open spans, so whatever runs
+    in the thread while a generator is suspended does not take it as its parent. The parent is
+    the innermost open span of the calling thread unless one is named, e.g. for work handed to
+    a thread pool.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attributes).begin(parent)
+
+
+def traced(name, attributes=None, result_attributes=None):
+    """
+    Decorator timing every call of a function as the given stage.
+
+    Args:
+        name (str): Stage name.
+        attributes (callable): Called with the function's arguments, returns span attributes.
+        result_attributes (callable): Called with the return value, returns span attributes.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(name, attributes(*args, **kwargs) if attributes else {}) as s:
+                result = fn(*args, **kwargs)
+                if result_attributes:
+                    s.set(**result_attributes(result))
+                return result
+        return wrapper
+    return decorator
+
+
+def count_of(key="results"):
+    """
+    result_attributes helper recording len(result) under key.
+    """
+    return lambda result: {key: len(result) if result is not None else 0}
+
+
+_metrics_server = None
+
+
+def start_metrics_server(port=9464, host="127.0.0.1"):
+    """
+    Serves prometheus_text() at http://host:port/metrics from a daemon thread (once per process).
+    """
+    global _metrics_server
+    if _metrics_server is not None:
+        return _metrics_server
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = recorder.prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=_metrics_server.serve_forever, name="graphrag-metrics", daemon=True).start()
+    return _metrics_server
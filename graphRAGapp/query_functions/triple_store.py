@@ -0,0 +1,316 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+from rdflib import BNode, Literal, URIRef
+
+from query_functions.tracing import span
+
+# "memory" parses the RDF file into an rdflib Graph on every start; "oxigraph" imports it once
+# into an indexed on-disk store (needs the optional pyoxigraph package)
+RDF_BACKEND = os.environ.get("RDF_BACKEND", "memory")
+
+# Directory of the on-disk store; defaults to "<RDF file>.store" next to the file
+RDF_STORE_PATH = os.environ.get("RDF_STORE_PATH")
+
+_RDF_FORMATS = {
+    "ttl": "TURTLE",
+    "turtle": "TURTLE",
+    "nt": "N_TRIPLES",
+    "nt11": "N_TRIPLES",
+    "ntriples": "N_TRIPLES",
+    "nquads": "N_QUADS",
+    "trig": "TRIG",
+    "n3": "N3",
+    "xml": "RDF_XML",
+    "json-ld": "JSON_LD",
+}
+
+META_FILE = "import.json"
+CURRENT_FILE = "CURRENT"
+
+# Version directories are named "<first 16 hex digits of the file's SHA-256>-<import time>"
+VERSION_PATTERN = re.compile(r"^([0-9a-f]{16})-(\d+)$")
+
+# Store versions opened by this process, which must not be deleted while a snapshot uses them
+_open_versions = set()
+_open_versions_lock = threading.Lock()
+
+
+def use_triple_store():
+    return RDF_BACKEND == "oxigraph"
+
+
+def store_path_for(local_file_path):
+    return os.path.abspath(RDF_STORE_PATH or local_file_path + ".store")
+
+
+def _file_sha256(path, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _to_rdflib(term):
+    # Converts a pyoxigraph term into the rdflib term the rest of the app expects
+    if term is None:
+        return None
+    kind = type(term).__name__
+    if kind == "NamedNode":
+        return URIRef(term.value)
+    if kind == "BlankNode":
+        return BNode(term.value)
+    if term.language:
+        return Literal(term.value, lang=term.language)
+    return Literal(term.value, datatype=URIRef(term.datatype.value))
+
+
+def _n3(term):
+    # Plain strings are taken as IRIs, as rdflib does for initBindings
+    return term.n3() if hasattr(term, "n3") else URIRef(term).n3()
+
+
+def _to_oxigraph(term):
+    import pyoxigraph
+
+    if term is None:
+        return None
+    if isinstance(term, Literal):
+        if term.language:
+            return pyoxigraph.Literal(str(term), language=term.language)
+        if term.datatype:
+            return pyoxigraph.Literal(str(term), datatype=pyoxigraph.NamedNode(str(term.datatype)))
+        return pyoxigraph.Literal(str(term))
+    if isinstance(term, BNode):
+        return pyoxigraph.BlankNode(str(term))
+    return pyoxigraph.NamedNode(str(term))
+
+
+class OxigraphGraph:
+    """
+    A read-only view of a pyoxigraph store with the parts of the rdflib Graph API the app uses.
+
+    The store keeps SPO/POS/OSP indexes on disk and pages them in on demand, so opening it takes
+    milliseconds whatever the size of the graph. Terms are returned as rdflib terms and query()
+    accepts the same SPARQL and initBindings as rdflib, so callers do not need to know which
+    backend they are reading.
+    """
+
+    def __init__(self, path, meta=None):
+        import pyoxigraph
+
+        self.path = path
+        self.meta = meta or {}
+        self.store = pyoxigraph.Store.read_only(path)
+
+    def __len__(self):
+        triples = self.meta.get("triples")
+        return triples if triples is not None else len(self.store)
+
+    def triples(self, pattern):
+        s, p, o = (_to_oxigraph(term) for term in pattern)
+        for quad in self.store.quads_for_pattern(s, p, o):
+            yield _to_rdflib(quad.subject), _to_rdflib(quad.predicate), _to_rdflib(quad.object)
+
+    def subjects(self, predicate=None, object=None):
+        for s, _, _ in self.triples((None, predicate, object)):
+            yield s
+
+    def objects(self, subject=None, predicate=None):
+        for _, _, o in self.triples((subject, predicate, None)):
+            yield o
+
+    def value(self, subject=None, predicate=None, object=None):
+        pattern = (subject, predicate, object)
+        missing = pattern.index(None)
+        for triple in self.triples(pattern):
+            return triple[missing]
+        return None
+
+    def query(self, query, initBindings=None):
+        """
+        Runs a SPARQL SELECT query and returns its rows as dicts of variable name -> rdflib term.
+
+        initBindings are applied as a trailing VALUES clause, which binds the variables the same
+        way rdflib's initBindings does.
+        """
+        if initBindings:
+            names = " ".join(f"?{name}" for name in initBindings)
+            values = " ".join(_n3(term) for term in initBindings.values())
+            query = f"{query}\nVALUES ({names}) {{ ({values}) }}"
+        solutions = self.store.query(query)
+        variables = [variable.value for variable in solutions.variables]
+        return [
+            {name: _to_rdflib(solution[name]) for name in variables}
+            for solution in solutions
+        ]
+
+
+def _read_meta(version_path):
+    try:
+        with open(os.path.join(version_path, META_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _current_version(store_path):
+    try:
+        with open(os.path.join(store_path, CURRENT_FILE)) as f:
+            version = f.read().strip()
+    except OSError:
+        return None
+    version_path = os.path.join(store_path, version)
+    meta = _read_meta(version_path)
+    return (version_path, meta) if meta is not None else None
+
+
+def _source_matches(local_file_path, meta):
+    # A matching mtime and size is trusted; otherwise the content hash decides
+    try:
+        stat = os.stat(local_file_path)
+    except OSError:
+        return True  # No source file: serve the imported store as it is
+    if stat.st_mtime == meta.get("source_mtime") and stat.st_size == meta.get("source_bytes"):
+        return True
+    return _file_sha256(local_file_path) == meta.get("source_sha256")
+
+
+def import_rdf_file(local_file_path, store_path=None, rdf_format="ttl"):
+    """
+    Imports an RDF file (optionally gzipped) into a new version of the on-disk store.
+
+    The file is bulk loaded into a fresh directory next to the current version, which is then
+    made current, so a store that is being read is never modified. Older versions are kept,
+    since other processes may still be reading them; remove_old_versions deletes them.
+
+    Args:
+        local_file_path (str): Path to the RDF file, e.g. PubMedGraph.ttl.
+        store_path (str): Store directory; defaults to store_path_for(local_file_path).
+        rdf_format (str): The rdflib format name of the file, e.g. "ttl" or "nt".
+
+    Returns:
+        str: The directory of the imported version.
+    """
+    import pyoxigraph
+
+    store_path = store_path or store_path_for(local_file_path)
+    rdf_format = getattr(pyoxigraph.RdfFormat, _RDF_FORMATS[rdf_format])
+    stat = os.stat(local_file_path)
+    sha256 = _file_sha256(local_file_path)
+
+    os.makedirs(store_path, exist_ok=True)
+    version = f"{sha256[:16]}-{int(time.time())}"
+    version_path = os.path.join(store_path, version)
+
+    start = time.perf_counter()
+    with span("rdf.import", bytes=stat.st_size) as s:
+        store = pyoxigraph.Store(version_path)
+        if local_file_path.endswith(".gz"):
+            with gzip.open(local_file_path, "rb") as f:
+                store.bulk_load(f, rdf_format)
+        else:
+            store.bulk_load(path=local_file_path, format=rdf_format)
+        store.optimize()
+        triples = len(store)
+        del store
+        s.set(triples=triples)
+
+    meta = {
+        "source_path": os.path.abspath(local_file_path),
+        "source_mtime": stat.st_mtime,
+        "source_bytes": stat.st_size,
+        "source_sha256": sha256,
+        "triples": triples,
+        "import_seconds": time.perf_counter() - start,
+        "imported_at": time.time(),
+    }
+    with open(os.path.join(version_path, META_FILE), "w") as f:
+        json.dump(meta, f)
+    temp_current = os.path.join(store_path, CURRENT_FILE + ".tmp")
+    with open(temp_current, "w") as f:
+        f.write(version)
+    os.replace(temp_current, os.path.join(store_path, CURRENT_FILE))
+    print(f"Imported {triples} triples from {local_file_path} into {version_path}")
+    return version_path
+
+
+def remove_old_versions(store_path):
+    """
+    Deletes the store versions imported before the current one.
+
+    Only directories named like a version are considered, so nothing else kept in the store
+    directory is touched, and versions this process has open are skipped. Other processes are
+    not tracked: stop or restart any server still reading an old version before removing it.
+
+    Returns:
+        list: The deleted version directories.
+    """
+    current = _current_version(store_path)
+    if current is None:
+        return []
+    current_match = VERSION_PATTERN.match(os.path.basename(current[0]))
+    if current_match is None:
+        return []
+    with _open_versions_lock:
+        in_use = set(_open_versions) | {current[0]}
+
+    removed = []
+    for name in os.listdir(store_path):
+        path = os.path.join(store_path, name)
+        match = VERSION_PATTERN.match(name)
+        if match is None or not os.path.isdir(path) or path in in_use:
+            continue
+        if int(match.group(2)) < int(current_match.group(2)):
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(path)
+    return removed
+
+
+def open_triple_store(local_file_path, rdf_format="ttl", store_path=None):
+    """
+    Opens the on-disk store for an RDF file, importing the file first if needed.
+
+    The import runs on first use and again only when the file's content changes; otherwise the
+    current version is opened directly. Once imported, the RDF file itself is no longer needed.
+
+    Returns:
+        OxigraphGraph: A read-only view of the current version.
+    """
+    store_path = store_path or store_path_for(local_file_path)
+    current = _current_version(store_path)
+    if current is None or not _source_matches(local_file_path, current[1]):
+        import_rdf_file(local_file_path, store_path, rdf_format)
+        current = _current_version(store_path)
+
+    version_path, meta = current
+    with _open_versions_lock:
+        _open_versions.add(version_path)
+    return OxigraphGraph(version_path, meta)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import an RDF file into the on-disk triple store.")
+    parser.add_argument("rdf_path", help="RDF file, e.g. PubMedGraph.ttl (.gz allowed)")
+    parser.add_argument("--store", default=None, help="Store directory (default: <rdf_path>.store)")
+    parser.add_argument("--format", default="ttl", choices=sorted(_RDF_FORMATS), help="rdflib format name of the file")
+    parser.add_argument("--remove-old", action="store_true",
+                        help="Delete older store versions after the import (no server may still be reading them)")
+    args = parser.parse_args()
+
+    version_path = import_rdf_file(args.rdf_path, args.store, args.format)
+    if args.remove_old:
+        for path in remove_old_versions(os.path.dirname(version_path)):
+            print(f"Removed old store version {path}")
+
+
+if __name__ == "__main__":
+    main()
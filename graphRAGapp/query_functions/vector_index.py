@@ -0,0 +1,302 @@
+import argparse
+import json
+import os
+import threading
+import uuid
+
+import numpy as np
+
+from query_functions.embedders import get_embedder, normalize
+from query_functions.mesh_terms import create_article_uri, create_valid_uri, parse_mesh_terms
+from query_functions.tracing import span
+
+# The text properties text2vec-openai vectorizes in each collection with its default settings,
+# which the notebook uses: every text property, in alphabetical order of property name
+COLLECTION_TEXT_PROPERTIES = {
+    "Article": ("abstractText", "article_URI", "meshMajor", "title"),
+    "term": ("meshTerm", "URI"),
+}
+
+SEARCH_BLOCK_ROWS = 65536
+
+
+class LocalVectorIndex:
+    """
+    An on-disk vector collection searched in-process with NumPy.
+
+    The directory holds the unit-normalized vectors as a raw float32 matrix that is
+    memory-mapped on open, the object properties as JSON lines, and meta.json. Search is exact
+    cosine top-k over the matrix in row blocks; when the index was built with ivf_lists > 0,
+    an inverted-file mode restricts each query to the rows of its nprobe nearest clusters.
+    Distances are cosine distances (1 - cosine similarity), as Weaviate reports them.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, "meta.json")) as f:
+            self.meta = json.load(f)
+
+        count, dim = self.meta["count"], self.meta["dim"]
+        self.vectors = np.memmap(
+            os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r", shape=(count, dim)
+        )
+        self.uuids = []
+        self.properties = []
+        with open(os.path.join(directory, "objects.jsonl")) as f:
+            for line in f:
+                obj = json.loads(line)
+                self.uuids.append(uuid.UUID(obj["uuid"]))
+                self.properties.append(obj["properties"])
+
+        self.embedder = get_embedder(self.meta["embedder"]["name"], **self.meta["embedder"]["options"])
+
+        self.ivf = None
+        if self.meta.get("ivf_lists"):
+            self.ivf = {
+                name: np.load(os.path.join(directory, f"ivf_{name}.npy"))
+                for name in ("centroids", "order", "offsets")
+            }
+
+    def __len__(self):
+        return len(self.uuids)
+
+    def search(self, query_texts, limit=10, nprobe=None):
+        """
+        Embeds and searches a batch of query strings.
+
+        Returns:
+            list: One result list per query, each in the {"uuid", "properties", "distance"} shape.
+        """
+        with span("vector.embed", queries=len(query_texts)):
+            query_vectors = self.embedder.embed(list(query_texts))
+        if self.ivf is not None and nprobe != 0:
+            hits = self._search_ivf(query_vectors, limit, nprobe or self.meta.get("nprobe", 8))
+        else:
+            hits = self._search_exact(query_vectors, limit)
+
+        return [
+            [
+                {
+                    "uuid": self.uuids[row],
+                    "properties": self.properties[row],
+                    "distance": float(1.0 - score),
+                }
+                for row, score in query_hits
+            ]
+            for query_hits in hits
+        ]
+
+    def _search_exact(self, query_vectors, limit):
+        n_queries = len(query_vectors)
+        limit = min(limit, len(self))
+        best_scores = np.full((n_queries, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+
+        for start in range(0, len(self), SEARCH_BLOCK_ROWS):
+            block = np.asarray(self.vectors[start:start + SEARCH_BLOCK_ROWS])
+            scores = query_vectors @ block.T
+            k = min(limit, scores.shape[1])
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > limit:
+                keep = np.argpartition(-best_scores, limit - 1, axis=1)[:, :limit]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [list(zip(rows.tolist(), scores.tolist())) for rows, scores in zip(best_rows, best_scores)]
+
+    def _search_ivf(self, query_vectors, limit, nprobe):
+        centroids, order, offsets = self.ivf["centroids"], self.ivf["order"], self.ivf["offsets"]
+        nprobe = min(nprobe, len(centroids))
+        probes = np.argpartition(-(query_vectors @ centroids.T), nprobe - 1, axis=1)[:, :nprobe]
+
+        results = []
+        for query_vector, lists in zip(query_vectors, probes):
+            rows = np.concatenate([order[offsets[i]:offsets[i + 1]] for i in lists])
+            if len(rows) == 0:
+                results.append([])
+                continue
+            rows.sort()  # sequential access into the memory map
+            scores = np.asarray(self.vectors[rows]) @ query_vector
+            k = min(limit, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results.append(list(zip(rows[top].tolist(), scores[top].tolist())))
+        return results
+
+
+def vectorizer_text(properties, text_properties, collection=None):
+    """
+    Returns the text that is embedded for an object.
+
+    With a collection name this is the text text2vec-openai builds by default: the collection
+    name in lower case followed by the values of the text properties, space-separated.
+    """
+    values = [str(properties.get(name) or "") for name in text_properties]
+    return " ".join([collection.lower()] + values if collection else values)
+
+
+def _kmeans(vectors, n_clusters, iterations=10, sample_size=100000, seed=0):
+    rng = np.random.default_rng(seed)
+    sample = vectors[rng.choice(len(vectors), size=min(sample_size, len(vectors)), replace=False)]
+    centroids = sample[rng.choice(len(sample), size=n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = sample[assignment == cluster]
+            if len(members):
+                centroids[cluster] = members.mean(axis=0)
+        centroids = normalize(centroids)
+    return centroids
+
+
+def build_local_index(directory, records, embedder, text_properties, ivf_lists=0, nprobe=8, batch_size=1024,
+                      collection=None):
+    """
+    Embeds records and writes them as a LocalVectorIndex directory.
+
+    Args:
+        directory (str): Output directory, created if needed.
+        records (list): Dicts with "properties" and optionally a "uuid".
+        embedder: An object with embed(texts) -> float32 array, config() and name.
+        text_properties (tuple): Properties concatenated into the text that is embedded.
+        ivf_lists (int): Number of IVF clusters; 0 builds an exact-search-only index.
+        nprobe (int): Default number of clusters searched per query in IVF mode.
+        batch_size (int): Records embedded per embedder call.
+        collection (str): Collection name prepended to each text, as text2vec-openai does.
+
+    Returns:
+        LocalVectorIndex: The opened index.
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = len(records)
+    vectors = None
+
+    with open(os.path.join(directory, "objects.jsonl"), "w") as f:
+        for start in range(0, count, batch_size):
+            batch = records[start:start + batch_size]
+            texts = [vectorizer_text(record["properties"], text_properties, collection) for record in batch]
+            embedded = embedder.embed(texts)
+            if vectors is None:
+                vectors = np.memmap(
+                    os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="w+",
+                    shape=(count, embedded.shape[1]),
+                )
+            vectors[start:start + len(batch)] = embedded
+            for record in batch:
+                object_uuid = record.get("uuid") or uuid.uuid5(uuid.NAMESPACE_URL, json.dumps(record["properties"], sort_keys=True))
+                f.write(json.dumps({"uuid": str(object_uuid), "properties": record["properties"]}) + "\n")
+
+    if vectors is None:
+        raise ValueError("Cannot build a vector index from an empty record set.")
+    vectors.flush()
+
+    meta = {
+        "count": count,
+        "dim": int(vectors.shape[1]),
+        "text_properties": list(text_properties),
+        "collection": collection,
+        "embedder": {"name": embedder.name, "options": embedder.config()},
+        "ivf_lists": 0,
+    }
+    if ivf_lists and count > ivf_lists:
+        centroids = _kmeans(np.asarray(vectors), ivf_lists)
+        assignment = np.concatenate([
+            np.argmax(np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS]) @ centroids.T, axis=1)
+            for start in range(0, count, SEARCH_BLOCK_ROWS)
+        ])
+        order = np.argsort(assignment, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=ivf_lists))])
+        np.save(os.path.join(directory, "ivf_centroids.npy"), centroids.astype(np.float32))
+        np.save(os.path.join(directory, "ivf_order.npy"), order.astype(np.int64))
+        np.save(os.path.join(directory, "ivf_offsets.npy"), offsets.astype(np.int64))
+        meta["ivf_lists"] = ivf_lists
+        meta["nprobe"] = nprobe
+
+    with open(os.path.join(directory, "meta.json"), "w") as f:
+        json.dump(meta, f, indent=2)
+    return LocalVectorIndex(directory)
+
+
+def records_from_pubmed_csv(csv_path, collection):
+    """
+    Turns the PubMed MultiLabel dataset CSV into records for the Article or term collection,
+    with the same properties the notebook uploads to Weaviate.
+    """
+    import pandas as pd
+
+    df = pd.read_csv(csv_path, usecols=["Title", "abstractText", "meshMajor"]).fillna("")
+    if collection == "Article":
+        return [
+            {"properties": {
+                "title": row.Title,
+                "abstractText": row.abstractText,
+                "article_URI": create_article_uri(row.Title),
+                "meshMajor": row.meshMajor,
+            }}
+            for row in df.itertuples(index=False)
+        ]
+
+    terms = sorted({term.replace(' ', '_') for mesh_list in df["meshMajor"] for term in parse_mesh_terms(mesh_list)})
+    return [
+        {"properties": {"meshTerm": term, "URI": create_valid_uri("http://example.org/mesh", term)}}
+        for term in terms
+    ]
+
+
+# Backend selection: VECTOR_BACKEND=local searches LOCAL_VECTOR_DIR/<collection> instead of Weaviate
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "weaviate")
+LOCAL_VECTOR_DIR = os.environ.get("LOCAL_VECTOR_DIR", "vector_index")
+
+_local_indexes = {}
+_local_indexes_lock = threading.Lock()
+
+
+def use_local_backend():
+    return VECTOR_BACKEND == "local"
+
+
+def get_local_index(collection):
+    """
+    Returns the process-wide LocalVectorIndex for a collection, opening it on first use.
+    """
+    index = _local_indexes.get(collection)
+    if index is None:
+        with _local_indexes_lock:
+            index = _local_indexes.get(collection)
+            if index is None:
+                index = LocalVectorIndex(os.path.join(LOCAL_VECTOR_DIR, collection))
+                _local_indexes[collection] = index
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a local vector index from the PubMed dataset CSV.")
+    parser.add_argument("csv_path", help="PubMed MultiLabel Text Classification CSV")
+    parser.add_argument("--collection", choices=sorted(COLLECTION_TEXT_PROPERTIES), default="Article")
+    parser.add_argument("--output-dir", default=LOCAL_VECTOR_DIR)
+    parser.add_argument("--embedder", default="hashing", help="hashing (offline) or openai")
+    parser.add_argument("--ivf-lists", type=int, default=0, help="IVF clusters for large corpora (0 = exact only)")
+    parser.add_argument("--nprobe", type=int, default=8)
+    args = parser.parse_args()
+
+    records = records_from_pubmed_csv(args.csv_path, args.collection)
+    index = build_local_index(
+        os.path.join(args.output_dir, args.collection),
+        records,
+        get_embedder(args.embedder),
+        COLLECTION_TEXT_PROPERTIES[args.collection],
+        ivf_lists=args.ivf_lists,
+        nprobe=args.nprobe,
+        collection=args.collection,
+    )
+    print(f"Indexed {len(index)} {args.collection} objects in {index.directory}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+
+from weaviate.classes.data import DataObject
+from weaviate.util import generate_uuid5
+
+from query_functions.embedders import get_embedder
+from query_functions.mesh_terms import create_article_uri, create_valid_uri, parse_mesh_terms
+from query_functions.vector_index import COLLECTION_TEXT_PROPERTIES, vectorizer_text
+from query_functions.weaviate_queries import WeaviateClientPool
+
+# The property that identifies an object, used to derive stable UUIDs so re-sent batches overwrite
+COLLECTION_KEY_PROPERTIES = {
+    "Article": "article_URI",
+    "term": "URI",
+}
+
+# The collections are searched with near_text through text2vec-openai, so uploaded vectors
+# must come from the same model; the hashing embedder is for the local backend only
+WEAVIATE_EMBEDDERS = ("openai",)
+
+
+class IngestCheckpoint:
+    """
+    Records which batches of a load have been written, so an interrupted load can resume.
+
+    Batches are numbered by their position in the input, so a resumed run must read the same
+    input with the same batch size. The file is rewritten atomically after every batch.
+    """
+
+    def __init__(self, path, batch_size):
+        self.path = path
+        self.batch_size = batch_size
+        self.completed = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+            if state.get("batch_size") != batch_size:
+                raise ValueError(
+                    f"Checkpoint {path} was written with batch_size={state.get('batch_size')}; "
+                    f"resume with the same batch size or delete the checkpoint."
+                )
+            self.completed = set(state["completed_batches"])
+
+    def is_done(self, batch_number):
+        return batch_number in self.completed
+
+    def mark_done(self, batch_number):
+        with self._lock:
+            self.completed.add(batch_number)
+            if not self.path:
+                return
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"batch_size": self.batch_size, "completed_batches": sorted(self.completed)}, f)
+            os.replace(tmp_path, self.path)
+
+
+def unique_terms(mesh_major_values):
+    """
+    Returns the distinct term objects for the term collection, in first-seen order.
+
+    Each term is uploaded once, however many articles share it.
+    """
+    seen = {}
+    for mesh_list in mesh_major_values:
+        for term in parse_mesh_terms(mesh_list):
+            mesh_term = term.replace(' ', '_')
+            if mesh_term not in seen:
+                seen[mesh_term] = {"meshTerm": mesh_term, "URI": create_valid_uri("http://example.org/mesh", mesh_term)}
+    return list(seen.values())
+
+
+def _batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def ingest_collection(collection_name, records, embedder=None, batch_size=200, workers=4,
+                      checkpoint_path=None, max_retries=3, progress_every=10, pool=None):
+    """
+    Uploads objects to a Weaviate collection with parallel workers and resumable checkpoints.
+
+    The main thread reads records and cuts them into batches. It skips batches the checkpoint
+    already records and, with an embedder, vectorizes each batch locally so the server does
+    not have to. Batches go on a bounded queue that holds two per worker, so reading and
+    embedding stall while the uploads catch up. Each worker uploads with insert_many, using a
+    client from a pool with one client per worker. Failed batches are retried with backoff. UUIDs are derived
+    from each object's key property, so a batch sent twice overwrites rather than duplicates.
+
+    Args:
+        collection_name (str): "Article" or "term".
+        records (iterable): Property dicts for the collection.
+        embedder: Optional embedder producing precomputed vectors (see embedders.py).
+        batch_size (int): Objects per insert_many call.
+        workers (int): Concurrent upload threads.
+        checkpoint_path (str): Where completed batch numbers are recorded; None disables resume.
+        max_retries (int): Retries per batch before it is reported as failed.
+        progress_every (int): Print throughput every this many batches.
+        pool (WeaviateClientPool): Clients for the uploads, at least one per worker; by default
+            a pool of workers clients is opened for this load and closed afterwards.
+
+    Returns:
+        dict: Objects uploaded, batches skipped and failed, elapsed seconds and objects per second.
+    """
+    key_property = COLLECTION_KEY_PROPERTIES[collection_name]
+    text_properties = COLLECTION_TEXT_PROPERTIES[collection_name]
+    checkpoint = IngestCheckpoint(checkpoint_path, batch_size)
+    owns_pool = pool is None
+    if owns_pool:
+        pool = WeaviateClientPool(max_size=workers)
+
+    work = queue.Queue(maxsize=workers * 2)
+    stats = {"objects": 0, "batches": 0, "skipped_batches": 0, "failed_batches": 0}
+    stats_lock = threading.Lock()
+    start = time.perf_counter()
+
+    def upload(batch_number, objects):
+        for attempt in range(max_retries + 1):
+            try:
+                with pool.client() as client:
+                    result = client.collections.get(collection_name).data.insert_many(objects)
+                if result.errors:
+                    raise RuntimeError(f"{len(result.errors)} objects rejected, e.g. {next(iter(result.errors.values()))}")
+                return True
+            except Exception as e:
+                if attempt == max_retries:
+                    print(f"Batch {batch_number} of {collection_name} failed after {attempt + 1} attempts: {e}")
+                    return False
+                time.sleep(min(2 ** attempt, 30))
+
+    def worker():
+        while True:
+            item = work.get()
+            if item is None:
+                work.task_done()
+                return
+            batch_number, objects = item
+            ok = upload(batch_number, objects)
+            if ok:
+                checkpoint.mark_done(batch_number)
+            with stats_lock:
+                if ok:
+                    stats["objects"] += len(objects)
+                    stats["batches"] += 1
+                    if stats["batches"] % progress_every == 0:
+                        elapsed = time.perf_counter() - start
+                        print(f"{collection_name}: {stats['objects']} objects, {stats['objects'] / elapsed:.0f} objects/s")
+                else:
+                    stats["failed_batches"] += 1
+            work.task_done()
+
+    threads = [threading.Thread(target=worker, name=f"ingest-{i}", daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        for batch_number, batch in enumerate(_batches(records, batch_size)):
+            if checkpoint.is_done(batch_number):
+                stats["skipped_batches"] += 1
+                continue
+            vectors = None
+            if embedder is not None:
+                texts = [vectorizer_text(properties, text_properties, collection_name) for properties in batch]
+                vectors = embedder.embed(texts)
+            objects = [
+                DataObject(
+                    properties=properties,
+                    uuid=generate_uuid5(properties[key_property]),
+                    vector=vectors[i].tolist() if vectors is not None else None,
+                )
+                for i, properties in enumerate(batch)
+            ]
+            work.put((batch_number, objects))  # blocks while the workers are behind
+    finally:
+        for _ in threads:
+            work.put(None)
+        for thread in threads:
+            thread.join()
+        if owns_pool:
+            pool.close()
+
+    stats["seconds"] = time.perf_counter() - start
+    stats["objects_per_second"] = stats["objects"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+
+def article_records(df):
+    """
+    Article objects from the PubMed dataset DataFrame, with the notebook's properties.
+
+    meshMajor keeps the dataset's list literal, as the notebook uploads it, so it stays a text
+    property in collections the notebook created; searches parse it into terms on read.
+    """
+    for row in df.itertuples(index=False):
+        if not row.Title:
+            continue
+        yield {
+            "title": row.Title,
+            "abstractText": row.abstractText,
+            "article_URI": create_article_uri(row.Title),
+            "meshMajor": row.meshMajor,
+        }
+
+
+def main():
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Load the PubMed dataset into the Article or term collection.")
+    parser.add_argument("csv_path")
+    parser.add_argument("--collection", choices=sorted(COLLECTION_KEY_PROPERTIES), default="Article")
+    parser.add_argument("--embedder", default=None, choices=WEAVIATE_EMBEDDERS,
+                        help="Vectorize locally before upload with the model text2vec-openai uses")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--checkpoint", default=None, help="Defaults to <collection>.ingest.json")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.csv_path, usecols=["Title", "abstractText", "meshMajor"], dtype=str).fillna("")
+    if args.collection == "Article":
+        records = article_records(df)
+    else:
+        records = unique_terms(df["meshMajor"])
+
+    stats = ingest_collection(
+        args.collection,
+        records,
+        embedder=get_embedder(args.embedder) if args.embedder else None,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        checkpoint_path=args.checkpoint or f"{args.collection}.ingest.json",
+    )
+    print(
+        f"Uploaded {stats['objects']} {args.collection} objects in {stats['seconds']:.1f}s "
+        f"({stats['objects_per_second']:.0f} objects/s); {stats['skipped_batches']} batches already done, "
+        f"{stats['failed_batches']} failed"
+    )
+
+
+if __name__ == "__main__":
+    main()
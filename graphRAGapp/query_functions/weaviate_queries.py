@@ -1,9 +1,18 @@
+import atexit
+import threading
+from contextlib import contextmanager
+
 import weaviate
 from weaviate import Client as WeaviateClient
 from config import WCD_URL, WCD_API_KEY, OPENAI_API_KEY
 from weaviate.classes.init import Auth
 from weaviate.classes.query import MetadataQuery
 
+from query_functions.connection_pool import ConnectionPool
+from query_functions.mesh_terms import parse_mesh_terms
+from query_functions.tracing import count_of, span, traced
+from query_functions.vector_index import get_local_index, use_local_backend
+
 # Initialize Weaviate Client
 def initialize_weaviate_client():
     client = weaviate.connect_to_weaviate_cloud(
@@ -13,33 +22,156 @@ def initialize_weaviate_client():
     )
     return client
 
-# Function to query Weaviate for Articles
-def query_weaviate_articles(client, query_text, limit=10):
-    # Perform vector search on Article collection
-    response = client.collections.get("Article").query.near_text(
-        query=query_text,
-        limit=limit,
-        return_metadata=MetadataQuery(distance=True)
+
+# Initialize an async Weaviate Client; the caller awaits client.connect() and client.close()
+def initialize_async_weaviate_client():
+    return weaviate.use_async_with_weaviate_cloud(
+        cluster_url=WCD_URL,
+        auth_credentials=Auth.api_key(WCD_API_KEY),
+        headers={'X-OpenAI-Api-key': OPENAI_API_KEY}
     )
 
-    # Parse response
+
+class WeaviateClientPool(ConnectionPool):
+    """
+    Long-lived Weaviate connections shared by every session in the server process.
+
+    Clients that have been idle for longer than health_check_interval seconds are checked with
+    is_ready() before they are handed out (see ConnectionPool).
+    """
+
+    def __init__(self, factory=initialize_weaviate_client, max_size=4, health_check_interval=30.0, acquire_timeout=30.0):
+        super().__init__(factory, max_size, health_check_interval, acquire_timeout, name="Weaviate client")
+
+    def client(self):
+        """
+        Context manager yielding a healthy client that is returned to the pool afterwards.
+        """
+        return self.connection()
+
+
+_client_pool = None
+_client_pool_lock = threading.Lock()
+
+
+def get_client_pool():
+    """
+    Returns the process-wide Weaviate client pool, creating it on first use.
+    """
+    global _client_pool
+    if _client_pool is None:
+        with _client_pool_lock:
+            if _client_pool is None:
+                _client_pool = WeaviateClientPool()
+                atexit.register(_client_pool.close)
+    return _client_pool
+
+
+@contextmanager
+def _client_or_pooled(client):
+    if client is not None:
+        yield client
+    else:
+        with get_client_pool().client() as pooled_client:
+            yield pooled_client
+
+
+# Properties returned by article searches unless the caller asks for others
+ARTICLE_SEARCH_PROPERTIES = ["article_URI", "title", "meshMajor"]
+SEARCH_PAGE_SIZE = 100
+
+# Weaviate's default QUERY_MAXIMUM_RESULTS: offset + limit of one search may not exceed it
+QUERY_MAXIMUM_RESULTS = 10000
+
+
+def article_result(uuid, properties, distance, return_properties):
+    properties = {name: properties.get(name) for name in return_properties} if return_properties else dict(properties)
+    if "meshMajor" in properties:
+        # Older collections store the dataset's list literal as a string
+        properties["meshMajor"] = parse_mesh_terms(properties["meshMajor"])
+    return {"uuid": uuid, "properties": properties, "distance": distance}
+
+
+# Function to page through Article search results; pass client=None to use the configured backend
+def iter_weaviate_articles(client, query_text, max_results=1000, max_distance=None, page_size=SEARCH_PAGE_SIZE,
+                           return_properties=ARTICLE_SEARCH_PROPERTIES):
+    """
+    Yields the nearest articles to a query one page at a time, nearest first.
+
+    The search is a single near_text query for max_results results (at most
+    QUERY_MAXIMUM_RESULTS), so the query text is embedded once; it returns only the requested
+    properties, which keeps the response small, and the client goes back to the pool as soon
+    as the response has arrived. The results are then converted and yielded page by page.
+    meshMajor is returned as a list of terms.
+
+    Args:
+        client: A Weaviate client, or None for the configured backend.
+        query_text (str): The search text.
+        max_results (int): Most results yielded in total.
+        max_distance (float): Only results at most this far from the query, if given.
+        page_size (int): Results per yielded page.
+        return_properties (list): Properties to return; None returns all of them.
+
+    Yields:
+        list: Result dicts ({"uuid", "properties", "distance"}) for one page.
+    """
+    if use_local_backend():
+        results = get_local_index("Article").search([query_text], max_results)[0]
+        if max_distance is not None:
+            results = [result for result in results if result["distance"] <= max_distance]
+        for start in range(0, len(results), page_size):
+            yield [
+                article_result(result["uuid"], result["properties"], result["distance"], return_properties)
+                for result in results[start:start + page_size]
+            ]
+        return
+
+    limit = min(max_results, QUERY_MAXIMUM_RESULTS)
+    if limit <= 0:
+        return
+    with span("vector.articles_search", limit=limit) as search_span:
+        with _client_or_pooled(client) as pooled_client:
+            response = pooled_client.collections.get("Article").query.near_text(
+                query=query_text,
+                limit=limit,
+                distance=max_distance,
+                return_properties=return_properties,
+                return_metadata=MetadataQuery(distance=True),
+            )
+        search_span.set(results=len(response.objects))
+
+    objects = response.objects
+    for start in range(0, len(objects), page_size):
+        yield [
+            article_result(obj.uuid, obj.properties, obj.metadata.distance, return_properties)
+            for obj in objects[start:start + page_size]
+        ]
+
+
+# Function to query Weaviate for Articles; pass client=None to use the configured backend
+@traced("vector.articles", attributes=lambda client, query_text, limit=10, **kwargs: {"limit": limit}, result_attributes=count_of())
+def query_weaviate_articles(client, query_text, limit=10, max_distance=None, return_properties=ARTICLE_SEARCH_PROPERTIES):
+    """
+    Returns up to limit nearest articles as one list (see iter_weaviate_articles).
+    """
     results = []
-    for obj in response.objects:
-        results.append({
-            "uuid": obj.uuid,
-            "properties": obj.properties,
-            "distance": obj.metadata.distance,
-        })
+    for page in iter_weaviate_articles(client, query_text, limit, max_distance, return_properties=return_properties):
+        results.extend(page)
     return results
 
-# Function to query Weaviate for MeSH Terms
+# Function to query Weaviate for MeSH Terms; pass client=None to use the configured backend
+@traced("vector.terms", attributes=lambda client, query_text, limit=10: {"limit": limit}, result_attributes=count_of())
 def query_weaviate_terms(client, query_text, limit=10):
+    if use_local_backend():
+        return get_local_index("term").search([query_text], limit)[0]
+
     # Perform vector search on MeshTerm collection
-    response = client.collections.get("term").query.near_text(
-        query=query_text,
-        limit=limit,
-        return_metadata=MetadataQuery(distance=True)
-    )
+    with _client_or_pooled(client) as client:
+        response = client.collections.get("term").query.near_text(
+            query=query_text,
+            limit=limit,
+            return_metadata=MetadataQuery(distance=True)
+        )
 
     # Parse response
     results = []
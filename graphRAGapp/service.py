@@ -0,0 +1,183 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+load_dotenv()  # Load environment variables from .env
+
+from query_functions import pipeline
+from query_functions.databricks_queries import use_table_articles
+from query_functions.pubmed_graph import get_shared_graph
+from query_functions.tracing import recorder
+
+# rdflib parsing and filtering hold the GIL for long stretches, so they get their own small pool
+# and never starve the threads that wait on Weaviate, the MeSH endpoint or OpenAI
+RDF_WORKERS = int(os.environ.get("GRAPHRAG_RDF_WORKERS", "2"))
+_rdf_executor = ThreadPoolExecutor(max_workers=RDF_WORKERS, thread_name_prefix="rdf")
+
+
+async def _run_rdf(function, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_rdf_executor, lambda: function(*args, **kwargs))
+
+
+async def _run_io(function, *args, **kwargs):
+    return await asyncio.to_thread(function, *args, **kwargs)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Download and parse the graph in the background so the first filter request does not pay for it
+    async def warm_graph():
+        try:
+            await _run_rdf(pipeline.prepare_graph)
+            if not use_table_articles():
+                await _run_rdf(lambda: get_shared_graph(pipeline.LOCAL_FILE_PATH).snapshot())
+        except Exception as e:
+            print(f"Error loading the article graph at startup: {e}")
+
+    warming = asyncio.create_task(warm_graph())
+    yield
+    warming.cancel()
+    _rdf_executor.shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="Graph RAG for Medicine", lifespan=lifespan)
+
+
+class ArticleSearchRequest(BaseModel):
+    query_text: str
+    max_results: int = 100
+    max_distance: Optional[float] = None
+
+
+class TermSearchRequest(BaseModel):
+    query_text: str
+    limit: int = 10
+
+
+class TermRequest(BaseModel):
+    term: str
+
+
+class FilterRequest(BaseModel):
+    terms: List[str]
+    article_uris: List[str]
+    distances: Optional[Dict[str, float]] = None
+    ranking_method: str = "linear"
+    vector_weight: float = 0.5
+    limit: int = 10
+
+
+class SimilarRequest(BaseModel):
+    article_uri: str
+    k: int = 5
+
+
+class SummarizeRequest(BaseModel):
+    article_texts: List[str]
+    user_query: str
+
+
+class PipelineRequest(BaseModel):
+    query_text: str
+    terms: List[str]
+    user_query: Optional[str] = None
+    max_results: int = 100
+    max_distance: Optional[float] = None
+    ranking_method: str = "linear"
+    vector_weight: float = 0.5
+    limit: int = 10
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "graph": pipeline.graph_stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return recorder.prometheus_text()
+
+
+@app.post("/graph/prepare")
+async def prepare_graph():
+    await _run_rdf(pipeline.prepare_graph)
+    return pipeline.graph_stats()
+
+
+@app.get("/graph/stats")
+async def graph_stats():
+    return pipeline.graph_stats()
+
+
+@app.post("/search/articles")
+async def search_articles(request: ArticleSearchRequest):
+    return await _run_io(pipeline.search_articles, request.query_text, request.max_results, request.max_distance)
+
+
+@app.post("/search/terms")
+async def search_terms(request: TermSearchRequest):
+    return await _run_io(pipeline.search_terms, request.query_text, request.limit)
+
+
+@app.post("/terms/payload")
+async def term_payload(request: TermRequest):
+    return await _run_io(pipeline.term_payload, request.term)
+
+
+@app.post("/terms/descendants")
+async def descendant_terms(request: TermRequest):
+    return await _run_io(pipeline.descendant_terms, request.term)
+
+
+@app.post("/filter")
+async def filter_articles(request: FilterRequest):
+    if not request.terms:
+        raise HTTPException(status_code=422, detail="No MeSH terms selected.")
+    return await _run_rdf(
+        pipeline.filter_articles, request.terms, request.article_uris, request.distances,
+        ranking_method=request.ranking_method, vector_weight=request.vector_weight, limit=request.limit,
+    )
+
+
+@app.post("/similar")
+async def similar_articles(request: SimilarRequest):
+    return await _run_rdf(pipeline.similar_articles, request.article_uri, request.k)
+
+
+@app.post("/summarize")
+async def summarize(request: SummarizeRequest):
+    # The summary is streamed as plain text while it is generated; Starlette runs the
+    # generator in a worker thread
+    return StreamingResponse(
+        pipeline.stream_summary(request.article_texts, request.user_query), media_type="text/plain; charset=utf-8"
+    )
+
+
+@app.post("/pipeline")
+async def run_pipeline(request: PipelineRequest):
+    if not request.terms:
+        raise HTTPException(status_code=422, detail="No MeSH terms selected.")
+    # The stages wait on each other, so they run in one worker thread; the filter stage is
+    # handed to the RDF pool like a /filter request
+    return await _run_io(
+        pipeline.run_pipeline, request.query_text, request.terms, request.user_query,
+        max_results=request.max_results, max_distance=request.max_distance,
+        ranking_method=request.ranking_method, vector_weight=request.vector_weight, limit=request.limit,
+        rdf_executor=_rdf_executor,
+    )
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app, host=os.environ.get("GRAPHRAG_API_HOST", "127.0.0.1"), port=int(os.environ.get("GRAPHRAG_API_PORT", "8000"))
+    )
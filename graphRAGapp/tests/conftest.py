@@ -0,0 +1,18 @@
+import os
+import sys
+import types
+from importlib.util import find_spec
+
+# Tests import the app's modules the way app.py does, from the graphRAGapp directory
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+# config.py holds each deployment's credentials and is not part of the repo; no test uses them
+if find_spec("config") is None:
+    config = types.ModuleType("config")
+    for name in ("WCD_URL", "WCD_API_KEY", "OPENAI_API_KEY", "DATABRICKS_SERVER_HOSTNAME", "DATABRICKS_ACCESS_TOKEN"):
+        setattr(config, name, None)
+    sys.modules["config"] = config
+
+# Keep the MeSH lookup cache of modules imported by the tests in memory
+os.environ.setdefault("MESH_CACHE_PATH", "")
@@ -0,0 +1,82 @@
+import pytest
+
+from query_functions.connection_pool import ConnectionPool
+
+
+class FakeClient:
+    def __init__(self):
+        self.ready = True
+        self.closed = False
+
+    def is_ready(self):
+        return self.ready
+
+    def close(self):
+        self.closed = True
+
+
+def test_reuses_idle_clients():
+    pool = ConnectionPool(FakeClient, max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert first is second
+    assert pool.metrics()["created"] == 1
+    assert pool.metrics()["reused"] == 1
+
+
+def test_client_that_fails_check_after_error_is_replaced():
+    pool = ConnectionPool(FakeClient, max_size=1)
+    with pytest.raises(ValueError):
+        with pool.connection() as client:
+            client.ready = False
+            raise ValueError("query failed")
+    assert client.closed
+    with pool.connection() as replacement:
+        assert replacement is not client
+    assert pool.metrics()["size"] == 1
+
+
+def test_generator_closed_early_releases_its_connection():
+    pool = ConnectionPool(FakeClient, max_size=1, acquire_timeout=0.1)
+
+    def rows():
+        with pool.connection():
+            yield 1
+            yield 2
+
+    iterator = rows()
+    next(iterator)
+    iterator.close()
+
+    with pool.connection():
+        pass
+    assert pool.metrics()["in_use"] == 0
+
+
+def test_interrupt_releases_its_connection():
+    pool = ConnectionPool(FakeClient, max_size=1, acquire_timeout=0.1)
+    with pytest.raises(KeyboardInterrupt):
+        with pool.connection():
+            raise KeyboardInterrupt
+    with pool.connection():
+        pass
+
+
+def test_times_out_when_every_client_is_in_use():
+    pool = ConnectionPool(FakeClient, max_size=1, acquire_timeout=0.05)
+    with pool.connection():
+        with pytest.raises(TimeoutError):
+            with pool.connection():
+                pass
+
+
+def test_closed_pool_refuses_checkouts_and_closes_returned_clients():
+    pool = ConnectionPool(FakeClient, max_size=1)
+    with pool.connection() as client:
+        pool.close()
+    assert client.closed
+    with pytest.raises(RuntimeError):
+        with pool.connection():
+            pass
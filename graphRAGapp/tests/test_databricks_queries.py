@@ -0,0 +1,165 @@
+from datetime import date
+
+from rdflib import Graph, Literal, URIRef, XSD
+
+from query_functions import databricks_queries
+from query_functions.article_index import ArticleIndex
+from query_functions.connection_pool import ConnectionPool
+from query_functions.graph_builder import _term_triples, rows_to_triples
+from query_functions.mesh_terms import convert_to_uri, create_article_uri
+
+TODAY = date(2024, 1, 1)
+COLUMNS = ("Title", "abstractText", "meshMajor")
+
+
+def dataset_rows(count):
+    return [
+        {
+            "Title": f"Article {i}",
+            "abstractText": f"Abstract {i}",
+            "meshMajor": str(["Humans", "Mouth Neoplasms" if i % 2 else "Rats", f"Term{i % 7}"]),
+        }
+        for i in range(count)
+    ]
+
+
+class FakeBatch:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.num_rows = len(rows)
+
+    def to_pydict(self):
+        return {name: [row.get(name) for row in self.rows] for name in self.columns}
+
+
+class FakeCursor:
+    def __init__(self, rows, columns):
+        self.rows = rows
+        self.columns = columns
+        self.position = 0
+        self.batch_sizes = []
+        self.closed = False
+
+    def execute(self, query, parameters=None):
+        self.query = query
+        self.position = 0
+
+    def fetchall(self):
+        return [(1,)]
+
+    def fetchmany_arrow(self, size):
+        batch = FakeBatch(self.rows[self.position:self.position + size], self.columns)
+        self.position += size
+        self.batch_sizes.append(batch.num_rows)
+        return batch
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class FakeConnection:
+    def __init__(self, rows, columns=COLUMNS):
+        self.rows = rows
+        self.columns = columns
+        self.cursors = []
+        self.closed = False
+
+    def cursor(self):
+        cursor = FakeCursor(self.rows, self.columns)
+        self.cursors.append(cursor)
+        return cursor
+
+    def close(self):
+        self.closed = True
+
+
+def fake_pool(rows, columns=COLUMNS):
+    connection = FakeConnection(rows, columns)
+    pool = ConnectionPool(lambda: connection, max_size=1, health_check=databricks_queries._connection_is_healthy)
+    return pool, connection
+
+
+def test_batches_are_bounded_and_connection_released():
+    pool, connection = fake_pool(dataset_rows(25))
+    batches = list(databricks_queries.iter_arrow_batches("SELECT", batch_rows=10, pool=pool))
+
+    assert [batch.num_rows for batch in batches] == [10, 10, 5]
+    assert max(connection.cursors[0].batch_sizes) <= 10
+    assert connection.cursors[0].closed
+    assert pool.metrics()["in_use"] == 0
+
+
+def test_closing_batches_early_closes_cursor_and_frees_connection():
+    pool, connection = fake_pool(dataset_rows(25))
+    batches = databricks_queries.iter_arrow_batches("SELECT", batch_rows=10, pool=pool)
+    next(batches)
+    assert pool.metrics()["in_use"] == 1
+
+    batches.close()
+    assert connection.cursors[0].closed
+    assert pool.metrics()["in_use"] == 0
+
+
+def test_article_rows_skips_untitled_and_uses_column_overrides():
+    rows = dataset_rows(2) + [{"Title": "  ", "abstractText": "x", "meshMajor": "[]"}]
+    rows[0].update(datePublished="2020-05-17", access=3)
+    columns = COLUMNS + ("datePublished", "access")
+
+    parsed = list(databricks_queries.article_rows([FakeBatch(rows, columns)], today=TODAY))
+
+    assert [article_uri for article_uri, _, _ in parsed] == [create_article_uri("Article 0"), create_article_uri("Article 1")]
+    _, fields, term_uris = parsed[0]
+    assert fields["datePublished"] == Literal("2020-05-17", datatype=XSD.date)
+    assert fields["access"] == Literal(3, datatype=XSD.integer)
+    assert set(term_uris) == {convert_to_uri("Humans"), convert_to_uri("Rats"), convert_to_uri("Term0")}
+    # Missing values fall back to the graph builder's seeded metadata
+    _, fields, _ = parsed[1]
+    published, access = databricks_queries.random_article_metadata(create_article_uri("Article 1"), TODAY)
+    assert fields["datePublished"] == Literal(published, datatype=XSD.date)
+    assert fields["access"] == Literal(access, datatype=XSD.integer)
+
+
+def test_load_article_index_skips_repeated_articles():
+    rows = dataset_rows(30)
+    pool, _ = fake_pool(rows + rows[:5])
+
+    index = databricks_queries.load_article_index(table="articles", batch_rows=8, pool=pool)
+
+    assert len(index) == 30
+
+
+def test_table_index_matches_graph_index(monkeypatch):
+    rows = dataset_rows(60)
+    monkeypatch.setattr(databricks_queries, "date", type("FixedDate", (), {"today": staticmethod(lambda: TODAY)}))
+    pool, _ = fake_pool(rows)
+    table_index = databricks_queries.load_article_index(table="articles", batch_rows=16, pool=pool)
+
+    articles, terms = rows_to_triples([tuple(row[name] for name in COLUMNS) for row in rows], today=TODAY)
+    graph = Graph()
+    graph.parse(
+        data="".join(lines for _, lines in articles) + "".join(_term_triples(uri, label) for uri, label in terms.items()),
+        format="nt",
+    )
+    graph_index = ArticleIndex(graph)
+
+    assert len(table_index) == len(graph_index)
+    candidates = [create_article_uri(f"Article {i}") for i in range(40)]
+    selected = {convert_to_uri("Mouth Neoplasms"), convert_to_uri("Term3")}
+    assert table_index.top_articles(candidates, selected) == graph_index.top_articles(candidates, selected)
+
+
+def test_fetch_of_unknown_article_matches_graph_index():
+    pool, _ = fake_pool(dataset_rows(3))
+    table_index = databricks_queries.load_article_index(table="articles", pool=pool)
+    graph_index = ArticleIndex(Graph())
+
+    unknown = URIRef("http://example.org/article/unknown")
+    assert table_index.fetch(unknown) == graph_index.fetch(unknown)
+    assert set(table_index.fetch(unknown).values()) == {None}
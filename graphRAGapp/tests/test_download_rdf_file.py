@@ -0,0 +1,142 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from query_functions import rdf_queries
+
+WORKSPACE_PATH = "/Users/someone/PubMedGraph.ttl"
+VERSION_1 = b"<http://example.org/article/a> <http://example.org/title> \"A\" .\n" * 50
+VERSION_2 = b"<http://example.org/article/b> <http://example.org/title> \"B\" .\n" * 80
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class Workspace:
+    """
+    Stands in for the Databricks workspace API: get-status and export of one file.
+    """
+
+    def __init__(self, content, modified_at=1000):
+        self.content = content
+        self.modified_at = modified_at
+        self.status_available = True
+        self.exports = 0
+
+    def handler(self):
+        workspace = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                assert parse_qs(url.query)["path"] == [WORKSPACE_PATH]
+                if url.path == "/api/2.0/workspace/get-status":
+                    if not workspace.status_available:
+                        return self._send(503, b"unavailable")
+                    body = json.dumps({"modified_at": workspace.modified_at, "size": len(workspace.content)})
+                    return self._send(200, body.encode(), "application/json")
+                if url.path == "/api/2.0/workspace/export":
+                    workspace.exports += 1
+                    return self._send(200, workspace.content)
+                self._send(404, b"not found")
+
+            def _send(self, code, body, content_type="application/octet-stream"):
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+
+@pytest.fixture
+def workspace(monkeypatch):
+    workspace = Workspace(VERSION_1)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), workspace.handler())
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(rdf_queries, "DATABRICKS_SERVER_HOSTNAME", f"http://127.0.0.1:{server.server_address[1]}")
+    yield workspace
+    server.shutdown()
+    server.server_close()
+
+
+def download(local_path, **kwargs):
+    return rdf_queries.download_rdf_file(WORKSPACE_PATH, str(local_path), chunk_size=256, timeout=5, **kwargs)
+
+
+def part_files(directory):
+    return [name for name in os.listdir(directory) if name.endswith(".part")]
+
+
+def test_unchanged_modification_time_skips_download(tmp_path, workspace):
+    local_path = tmp_path / "graph.nt"
+
+    assert download(local_path)
+    assert download(local_path) is False
+    assert workspace.exports == 1
+    assert local_path.read_bytes() == VERSION_1
+    meta = json.loads((tmp_path / "graph.nt.meta.json").read_text())
+    assert meta["sha256"] == sha256(VERSION_1)
+    assert meta["modified_at"] == 1000
+
+
+def test_changed_modification_time_downloads_again(tmp_path, workspace):
+    local_path = tmp_path / "graph.nt"
+    download(local_path)
+
+    workspace.content, workspace.modified_at = VERSION_2, 2000
+    assert download(local_path)
+    assert workspace.exports == 2
+    assert local_path.read_bytes() == VERSION_2
+    assert part_files(tmp_path) == []
+
+
+def test_checksum_mismatch_keeps_old_file_and_removes_part_file(tmp_path, workspace):
+    local_path = tmp_path / "graph.nt"
+    download(local_path)
+
+    workspace.content, workspace.modified_at = VERSION_2, 2000
+    with pytest.raises(Exception, match="Checksum mismatch"):
+        download(local_path, expected_sha256=sha256(b"something else"))
+    assert local_path.read_bytes() == VERSION_1
+    assert json.loads((tmp_path / "graph.nt.meta.json").read_text())["sha256"] == sha256(VERSION_1)
+    assert part_files(tmp_path) == []
+
+
+def test_gz_destination_is_written_compressed(tmp_path, workspace):
+    local_path = tmp_path / "graph.nt.gz"
+
+    assert download(local_path, expected_sha256=sha256(VERSION_1))
+    with gzip.open(local_path, "rb") as f:
+        assert f.read() == VERSION_1
+    assert download(local_path, expected_sha256=sha256(VERSION_1)) is False
+    assert workspace.exports == 1
+
+
+def test_unreachable_status_checks_expected_checksum_before_keeping_local_copy(tmp_path, workspace):
+    local_path = tmp_path / "graph.nt.gz"
+    with gzip.open(local_path, "wb") as f:
+        f.write(VERSION_1)  # No sidecar: the local copy itself is hashed
+    workspace.status_available = False
+
+    assert download(local_path, expected_sha256=sha256(VERSION_1)) is False
+    assert download(local_path) is False
+    assert workspace.exports == 0
+
+    workspace.content = VERSION_2
+    assert download(local_path, expected_sha256=sha256(VERSION_2))
+    assert workspace.exports == 1
+    with gzip.open(local_path, "rb") as f:
+        assert f.read() == VERSION_2
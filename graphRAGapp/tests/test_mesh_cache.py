@@ -0,0 +1,96 @@
+import os
+import threading
+
+import pytest
+
+from query_functions import mesh_cache
+from query_functions.mesh_cache import TermCache
+
+
+def test_batch_computes_only_misses_once(tmp_path):
+    cache = TermCache("narrower", disk_path=str(tmp_path / "cache.sqlite"))
+    cache.put("cached", ["A"])
+    calls = []
+
+    def compute(keys):
+        calls.append(list(keys))
+        return {key: [key.upper()] for key in keys}
+
+    assert cache.get_or_compute_many(["cached", "x", "y", "x"], compute) == {"cached": ["A"], "x": ["X"], "y": ["Y"]}
+    assert cache.get_or_compute_many(["x", "y"], compute) == {"x": ["X"], "y": ["Y"]}
+    assert calls == [["x", "y"]]
+
+
+def test_single_lookup_waits_for_running_batch():
+    cache = TermCache("narrower")
+    started, release = threading.Event(), threading.Event()
+    single_calls = []
+
+    def compute_batch(keys):
+        started.set()
+        release.wait(5)
+        return {key: [f"{key} child"] for key in keys}
+
+    batch = threading.Thread(target=cache.get_or_compute_many, args=(["a", "b"], compute_batch))
+    batch.start()
+    started.wait(5)
+
+    result = []
+    single = threading.Thread(target=lambda: result.append(
+        cache.get_or_compute("a", lambda: single_calls.append("a") or ["other"])
+    ))
+    single.start()
+    release.set()
+    batch.join()
+    single.join()
+
+    assert result == [["a child"]]
+    assert single_calls == []
+    assert cache.stats["coalesced"] == 1
+
+
+def test_batch_error_is_not_cached():
+    cache = TermCache("narrower")
+
+    def fail(keys):
+        raise RuntimeError("endpoint down")
+
+    with pytest.raises(RuntimeError):
+        cache.get_or_compute_many(["a"], fail)
+    assert cache.get_many(["a"]) == {}
+    assert cache.get_or_compute_many(["a"], lambda keys: {"a": []}) == {"a": []}
+
+
+def test_disk_hit_keeps_stored_expiry(tmp_path, monkeypatch):
+    path = str(tmp_path / "cache.sqlite")
+    clock = [1000.0]
+    monkeypatch.setattr(mesh_cache.time, "time", lambda: clock[0])
+    TermCache("narrower", ttl=100, disk_path=path).put("a", ["A"])
+
+    # Another process reads the entry shortly before it expires
+    clock[0] = 1090.0
+    reader = TermCache("narrower", ttl=100, disk_path=path)
+    assert reader.get_many(["a"]) == {"a": ["A"]}
+    assert reader.stats["disk_hits"] == 1
+    assert reader._memory["a"][0] == 1100.0
+
+    clock[0] = 1101.0
+    calls = []
+    assert reader.get_or_compute("a", lambda: calls.append("a") or ["B"]) == ["B"]
+    assert calls == ["a"]
+    assert reader.stats["expirations"] == 1
+
+
+def test_disk_file_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    cache = TermCache("narrower", disk_path=str(path))
+    assert not path.exists()
+
+    assert cache.get_or_compute("a", lambda: ["A"]) == ["A"]
+    assert path.exists()
+    assert TermCache("narrower", disk_path=str(path)).get_many(["a"]) == {"a": ["A"]}
+
+
+def test_default_path_does_not_depend_on_working_directory():
+    assert os.path.isabs(mesh_cache.DEFAULT_MESH_CACHE_PATH)
+    assert os.path.dirname(mesh_cache.DEFAULT_MESH_CACHE_PATH) == os.path.dirname(os.path.dirname(mesh_cache.__file__))
@@ -0,0 +1,193 @@
+import importlib
+import os
+import random
+import sys
+import types
+from importlib.util import find_spec
+
+import pytest
+
+from query_functions.graph_builder import build_graph
+from query_functions.mesh_hierarchy import MeshHierarchy
+from query_functions.mesh_terms import create_article_uri
+from query_functions.mesh_vocabulary import build_mesh_vocabulary
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mesh_sample.nt")
+
+# 0 has two children that share the child 3; 3 and 4 form a cycle below it; 6 and 7 are a
+# cycle no top descriptor reaches
+NARROWER = {
+    0: [1, 2],
+    1: [3],
+    2: [3],
+    3: [4],
+    4: [3, 5],
+    6: [7],
+    7: [6],
+}
+
+
+def reachable(narrower, node):
+    seen, stack = set(), list(narrower.get(node, ()))
+    while stack:
+        kid = stack.pop()
+        if kid not in seen:
+            seen.add(kid)
+            stack.extend(narrower.get(kid, ()))
+    return seen
+
+
+@pytest.fixture
+def hierarchy():
+    return MeshHierarchy(NARROWER)
+
+
+def test_descendants_are_unique_with_shared_children(hierarchy):
+    assert hierarchy.descendants(0).tolist() == [1, 2, 3, 4, 5]
+    assert hierarchy.descendants(1).tolist() == [3, 4, 5]
+    assert hierarchy.descendants(2).tolist() == [3, 4, 5]
+    # 3 is labeled once under each parent
+    assert len(hierarchy.node_positions(3)) == 2
+
+
+def test_cycles_are_cut_not_followed(hierarchy):
+    # The edge 4 -> 3 would close a cycle and is ignored
+    assert hierarchy.descendants(3).tolist() == [4, 5]
+    assert hierarchy.descendants(4).tolist() == [5]
+    assert not hierarchy.is_descendant(3, 4)
+    # A cycle no top descriptor reaches is labeled from its lowest node
+    assert hierarchy.descendants(6).tolist() == [7]
+    assert hierarchy.descendants(7).tolist() == []
+
+
+def test_is_descendant(hierarchy):
+    assert hierarchy.is_descendant(5, 0)
+    assert hierarchy.is_descendant(3, 1)
+    assert hierarchy.is_descendant(3, 2)
+    assert hierarchy.is_descendant(4, 2)
+    assert not hierarchy.is_descendant(1, 2)
+    assert not hierarchy.is_descendant(0, 3)
+    assert not hierarchy.is_descendant(3, 3)
+    assert not hierarchy.is_descendant(6, 0)
+
+
+def test_unknown_nodes(hierarchy):
+    assert hierarchy.descendants(99).tolist() == []
+    assert hierarchy.descendants(-1).tolist() == []
+    assert not hierarchy.is_descendant(99, 0)
+    assert not hierarchy.is_descendant(0, 99)
+
+
+def test_matches_reachability_on_random_dag():
+    rng = random.Random(7)
+    narrower = {}
+    for node in range(1, 60):
+        for parent in rng.sample(range(node), k=min(node, rng.randint(1, 3))):
+            narrower.setdefault(parent, []).append(node)
+    hierarchy = MeshHierarchy(narrower)
+
+    for node in range(60):
+        expected = reachable(narrower, node)
+        assert set(hierarchy.descendants(node).tolist()) == expected
+        for other in range(0, 60, 7):
+            assert hierarchy.is_descendant(other, node) == (other in expected)
+
+
+def test_too_many_positions():
+    with pytest.raises(ValueError):
+        MeshHierarchy(NARROWER, max_positions=4)
+
+
+class Rerun(Exception):
+    pass
+
+
+class SessionState(dict):
+    def __getattr__(self, name):
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        self[name] = value
+
+
+class FakeStreamlit:
+    """
+    The parts of streamlit the MeSH tree uses; the buttons whose keys are in clicked are pressed.
+    """
+
+    def __init__(self, clicked=()):
+        self.session_state = SessionState(selected_terms={})
+        self.clicked = set(clicked)
+
+    def checkbox(self, label, value=False, key=None):
+        return self.session_state.setdefault(key, value)
+
+    def button(self, label, key=None):
+        return key in self.clicked
+
+    def markdown(self, *args, **kwargs):
+        pass
+
+    def rerun(self):
+        raise Rerun()
+
+
+@pytest.fixture
+def mesh_tree(monkeypatch):
+    if "streamlit" not in sys.modules and find_spec("streamlit") is None:
+        # Only the module-level import needs it; st is replaced below
+        monkeypatch.setitem(sys.modules, "streamlit", types.ModuleType("streamlit"))
+    module = importlib.import_module("mesh_tree")
+    monkeypatch.setattr(module, "st", FakeStreamlit())
+    return module
+
+
+def test_include_all_narrower_selects_term_and_descendants(mesh_tree, tmp_path):
+    from query_functions.rdf_queries import query_rdf
+
+    vocabulary = build_mesh_vocabulary(FIXTURE)
+    descendant_calls = []
+
+    def descendants(term):
+        descendant_calls.append(term)
+        return vocabulary.descendant_labels(term)
+
+    def fetch(term):
+        return {
+            "alt_names": ["Oral Cancer"],
+            "narrower_concepts": {term: vocabulary.narrower_labels(term)},
+        }
+
+    st = mesh_tree.st
+    root = "Mouth Neoplasms"
+    st.clicked.add(mesh_tree._widget_key("subtree", (root,)))
+    state = mesh_tree.MeshTreeState()
+    state.reset([root])
+    state.expand((root,))
+
+    with pytest.raises(Rerun):
+        mesh_tree.render_mesh_tree(state, fetch, descendants)
+
+    assert descendant_calls == [root]
+    selected = [term for term, chosen in st.session_state.selected_terms.items() if chosen]
+    assert sorted(selected) == sorted([root] + vocabulary.descendant_labels(root))
+    assert st.session_state.selected_terms["Oral Cancer"] is False
+    # Checkbox widgets are reset so they show the new selection on the rerun
+    assert not [key for key in st.session_state if key.startswith(("cb_", "alt_"))]
+
+    # The selected terms are what Tab 3 passes to query_rdf
+    csv_path, graph_path = str(tmp_path / "articles.csv"), str(tmp_path / "graph.ttl")
+    with open(csv_path, "w", encoding="utf-8") as f:
+        f.write("Title,abstractText,meshMajor\n")
+        f.write("Tongue study,Abstract,\"['Tongue Neoplasms', 'Humans']\"\n")
+        f.write("Lip study,Abstract,\"['Lip Neoplasms', 'Mouth Neoplasms']\"\n")
+        f.write("Rat study,Abstract,\"['Rats', 'Humans']\"\n")
+    build_graph(csv_path, graph_path, workers=1)
+    candidates = [create_article_uri(title) for title in ("Tongue study", "Lip study", "Rat study")]
+
+    ranked = query_rdf(graph_path, None, selected, article_uris=candidates, ranking_method="rrf")
+
+    assert [str(uri) for uri, _ in ranked] == [str(create_article_uri("Lip study")), str(create_article_uri("Tongue study"))]
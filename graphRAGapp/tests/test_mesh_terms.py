@@ -0,0 +1,20 @@
+from query_functions.mesh_terms import convert_to_uri, parse_mesh_terms
+
+
+def notebook_parse_mesh_terms(mesh_list):
+    # The parser of the notebook that built PubMedGraph.ttl
+    return [term.strip().replace(' ', '_') for term in mesh_list.strip("[]'").split(',')]
+
+
+def test_splits_on_commas_like_the_notebook():
+    mesh_list = "['Humans', 'Carcinoma, Squamous Cell', 'Mouth Neoplasms']"
+    assert parse_mesh_terms(mesh_list) == ["Humans", "Carcinoma", "Squamous Cell", "Mouth Neoplasms"]
+    assert [convert_to_uri(term) for term in parse_mesh_terms(mesh_list)] == [
+        convert_to_uri(term) for term in notebook_parse_mesh_terms(mesh_list)
+    ]
+
+
+def test_lists_and_empty_values():
+    assert parse_mesh_terms(["Humans", " Rats ", ""]) == ["Humans", "Rats"]
+    assert parse_mesh_terms("[]") == []
+    assert parse_mesh_terms(None) == []
@@ -0,0 +1,70 @@
+import os
+import shutil
+
+import pytest
+
+from query_functions.mesh_vocabulary import build_mesh_vocabulary, load_mesh_vocabulary
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mesh_sample.nt")
+
+MOUTH_NEOPLASMS_CHILDREN = [
+    "Gingival Neoplasms",
+    "Lip Neoplasms",
+    "Palatal Neoplasms",
+    "Salivary Gland Neoplasms",
+    "Tongue Neoplasms",
+]
+
+
+@pytest.fixture(scope="module")
+def vocabulary():
+    return build_mesh_vocabulary(FIXTURE)
+
+
+def test_concept_labels(vocabulary):
+    assert sorted(vocabulary.concept_labels("Mouth Neoplasms")) == ["Cancer of Mouth", "Mouth Neoplasms", "Oral Cancer"]
+    assert sorted(vocabulary.concept_labels("'Tongue_Neoplasms'")) == ["Tongue Cancer", "Tongue Neoplasms"]
+    assert vocabulary.concept_labels("Unknown Neoplasms") == ["Unknown Neoplasms"]
+
+
+def test_narrower_labels(vocabulary):
+    assert sorted(vocabulary.narrower_labels("Mouth Neoplasms")) == MOUTH_NEOPLASMS_CHILDREN
+    assert sorted(vocabulary.narrower_labels("Head and Neck Neoplasms")) == ["Mouth Neoplasms", "Oropharyngeal Neoplasms"]
+    assert vocabulary.narrower_labels("Tongue Neoplasms") == []
+
+
+def test_descendant_labels(vocabulary):
+    assert vocabulary.descendant_labels("Mouth Neoplasms") == MOUTH_NEOPLASMS_CHILDREN
+    assert vocabulary.descendant_labels("Head and Neck Neoplasms") == sorted(
+        MOUTH_NEOPLASMS_CHILDREN + ["Mouth Neoplasms", "Oropharyngeal Neoplasms"]
+    )
+    assert vocabulary.descendant_labels("Unknown Neoplasms") == []
+
+
+def test_is_narrower(vocabulary):
+    assert vocabulary.is_narrower("Lip Neoplasms", "Mouth Neoplasms")
+    assert vocabulary.is_narrower("Tongue Neoplasms", "Head and Neck Neoplasms")
+    assert not vocabulary.is_narrower("Mouth Neoplasms", "Lip Neoplasms")
+    assert not vocabulary.is_narrower("Oropharyngeal Neoplasms", "Mouth Neoplasms")
+    assert not vocabulary.is_narrower("Mouth Neoplasms", "Mouth Neoplasms")
+
+
+def test_level_by_level_fallback_matches_hierarchy(vocabulary, monkeypatch):
+    monkeypatch.setattr(vocabulary, "hierarchy", False)
+    assert vocabulary.descendant_labels("Head and Neck Neoplasms") == sorted(
+        MOUTH_NEOPLASMS_CHILDREN + ["Mouth Neoplasms", "Oropharyngeal Neoplasms"]
+    )
+    assert vocabulary.is_narrower("Tongue Neoplasms", "Head and Neck Neoplasms")
+    assert not vocabulary.is_narrower("Head and Neck Neoplasms", "Tongue Neoplasms")
+
+
+def test_saved_store_is_reused(tmp_path):
+    dump_path = str(tmp_path / "mesh.nt")
+    shutil.copy(FIXTURE, dump_path)
+    first = load_mesh_vocabulary(dump_path)
+    assert os.path.exists(f"{dump_path}.pkl")
+
+    os.remove(dump_path)
+    loaded = load_mesh_vocabulary(dump_path)
+    assert loaded is not first
+    assert sorted(loaded.narrower_labels("Mouth Neoplasms")) == MOUTH_NEOPLASMS_CHILDREN
@@ -0,0 +1,154 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import pytest
+
+from query_functions import prefetch, rdf_queries
+from query_functions.mesh_cache import concept_cache, narrower_cache
+from query_functions.prefetch import MeshPrefetcher, get_session_prefetcher
+
+
+class ManualExecutor:
+    """
+    Queues submitted work until run() is called, and skips work cancelled in the meantime,
+    like a ThreadPoolExecutor whose threads are busy.
+    """
+
+    def __init__(self):
+        self.queue = []
+
+    def submit(self, function, *args):
+        future = Future()
+        self.queue.append((future, function, args))
+        return future
+
+    def start(self, future):
+        # Take a task off the queue as a worker thread would; it can no longer be cancelled
+        for i, (queued, function, args) in enumerate(self.queue):
+            if queued is future:
+                del self.queue[i]
+                future.set_running_or_notify_cancel()
+                return lambda: future.set_result(function(*args))
+
+    def run(self):
+        queue, self.queue = self.queue, []
+        for future, function, args in queue:
+            if future.set_running_or_notify_cancel():
+                future.set_result(function(*args))
+
+
+@pytest.fixture
+def lookups(monkeypatch):
+    calls = {"concepts": [], "narrower": []}
+    monkeypatch.setattr(prefetch, "get_mesh_vocabulary", lambda: None)
+    monkeypatch.setattr(prefetch, "get_concept_triples_for_term", lambda term: calls["concepts"].append(term))
+    monkeypatch.setattr(prefetch, "get_narrower_concepts_for_terms", lambda terms: calls["narrower"].append(list(terms)))
+    return calls
+
+
+def test_prefetch_orders_terms_by_frequency(lookups):
+    executor = ManualExecutor()
+    prefetcher = MeshPrefetcher(executor, max_terms=2)
+    prefetcher.prefetch(["Rats", "Humans", "'Mouth_Neoplasms'", "Humans", "Mouth Neoplasms", ""])
+    assert prefetcher.pending() == 3
+
+    executor.run()
+
+    assert lookups["narrower"] == [["Humans", "Mouth Neoplasms"]]
+    assert lookups["concepts"] == ["Humans", "Mouth Neoplasms"]
+    assert prefetcher.pending() == 0
+
+
+def test_second_prefetch_cancels_queued_work(lookups):
+    executor = ManualExecutor()
+    prefetcher = MeshPrefetcher(executor)
+    prefetcher.prefetch(["Humans", "Rats"])
+    first = [future for future, _, _ in executor.queue]
+
+    prefetcher.prefetch(["Mouth Neoplasms"])
+
+    assert all(future.cancelled() for future in first)
+    assert prefetcher.pending() == 2
+    executor.run()
+    assert lookups["narrower"] == [["Mouth Neoplasms"]]
+    assert lookups["concepts"] == ["Mouth Neoplasms"]
+
+
+def test_stale_generation_task_does_nothing(lookups):
+    executor = ManualExecutor()
+    prefetcher = MeshPrefetcher(executor)
+    prefetcher.prefetch(["Humans"])
+    # Both tasks of the first search were picked up by workers before the second search
+    started = [executor.start(future) for future, _, _ in list(executor.queue)]
+
+    prefetcher.prefetch(["Rats"])
+    for finish in started:
+        finish()
+
+    assert lookups == {"concepts": [], "narrower": []}
+    executor.run()
+    assert lookups == {"concepts": ["Rats"], "narrower": [["Rats"]]}
+
+
+def test_cancel_and_local_vocabulary(lookups, monkeypatch):
+    executor = ManualExecutor()
+    prefetcher = MeshPrefetcher(executor)
+    prefetcher.prefetch(["Humans"])
+    prefetcher.cancel()
+    executor.run()
+    assert lookups == {"concepts": [], "narrower": []}
+
+    # Lookups are already local with the vocabulary, so there is nothing to warm
+    monkeypatch.setattr(prefetch, "get_mesh_vocabulary", lambda: object())
+    prefetcher.prefetch(["Humans"])
+    assert executor.queue == []
+
+
+def test_session_prefetcher_is_reused_across_reruns():
+    session_state = {}
+    prefetcher = get_session_prefetcher(session_state)
+
+    assert get_session_prefetcher(session_state) is prefetcher
+    assert session_state["mesh_prefetcher"] is prefetcher
+
+
+@pytest.fixture
+def remote_mesh(monkeypatch):
+    calls = {"concepts": [], "narrower": []}
+
+    def fetch_concepts(term):
+        calls["concepts"].append(term)
+        return [term, f"{term} alias"]
+
+    def fetch_narrower(terms):
+        calls["narrower"].append(list(terms))
+        return {term: [f"{term} child"] for term in terms}
+
+    monkeypatch.setattr(rdf_queries, "get_mesh_vocabulary", lambda: None)
+    monkeypatch.setattr(prefetch, "get_mesh_vocabulary", lambda: None)
+    monkeypatch.setattr(rdf_queries, "_fetch_concept_triples", fetch_concepts)
+    monkeypatch.setattr(rdf_queries, "_fetch_narrower_concepts_batch", fetch_narrower)
+    concept_cache.clear()
+    narrower_cache.clear()
+    yield calls
+    concept_cache.clear()
+    narrower_cache.clear()
+
+
+def test_first_expand_is_served_from_cache(remote_mesh):
+    executor = ThreadPoolExecutor(max_workers=2)
+    prefetcher = MeshPrefetcher(executor)
+    prefetcher.prefetch(["Mouth Neoplasms", "Humans", "Mouth Neoplasms"])
+    executor.shutdown(wait=True)
+    assert sorted(remote_mesh["concepts"]) == ["Humans", "Mouth Neoplasms"]
+    assert remote_mesh["narrower"] == [["Mouth Neoplasms", "Humans"]]
+
+    # What Tab 2 looks up when "Mouth Neoplasms" is expanded (pipeline.term_payload)
+    hits = concept_cache.stats["hits"], narrower_cache.stats["hits"]
+    assert rdf_queries.get_concept_triples_for_term("Mouth Neoplasms") == ["Mouth Neoplasms", "Mouth Neoplasms alias"]
+    assert rdf_queries.get_all_narrower_concepts("Mouth Neoplasms", depth=1) == {
+        "Mouth Neoplasms": ["Mouth Neoplasms child"],
+    }
+
+    assert len(remote_mesh["concepts"]) == 2 and len(remote_mesh["narrower"]) == 1
+    assert concept_cache.stats["hits"] == hits[0] + 1
+    assert narrower_cache.stats["hits"] == hits[1] + 1
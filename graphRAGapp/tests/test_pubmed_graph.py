@@ -0,0 +1,157 @@
+import os
+
+import pytest
+from rdflib import URIRef
+
+from query_functions.graph_builder import build_graph
+from query_functions.mesh_terms import convert_to_uri, create_article_uri
+from query_functions.pubmed_graph import PubMedGraph, get_shared_graph
+
+
+def write_csv(path, first, last):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Title,abstractText,meshMajor\n")
+        for i in range(first, last):
+            terms = ["Humans", "Mouth Neoplasms" if i % 2 else "Rats", f"Term{i % 5}"]
+            f.write(f'Article {i},Abstract {i},"{terms}"\n')
+
+
+def bump_mtime(path):
+    stat = os.stat(path)
+    os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+
+@pytest.mark.parametrize("output_name", ["graph.nt", "graph.nt.gz"])
+def test_appended_articles_extend_the_snapshot(tmp_path, output_name):
+    csv_path, output_path = str(tmp_path / "articles.csv"), str(tmp_path / output_name)
+    write_csv(csv_path, 0, 20)
+    build_graph(csv_path, output_path, rdf_format="nt", workers=1)
+
+    shared = PubMedGraph(output_path, rdf_format="nt")
+    first = shared.snapshot()
+    first.article_index.similarity_index()
+    assert len(first.article_index) == 20
+
+    write_csv(csv_path, 15, 30)
+    build_graph(csv_path, output_path, rdf_format="nt", workers=1, append=True)
+    bump_mtime(output_path)
+    second = shared.snapshot()
+
+    assert second is not first
+    assert second.size == os.path.getsize(output_path)
+    # The earlier snapshot and index are untouched
+    assert len(first.article_index) == 20
+    assert len(second.article_index) == 30
+    # Only the appended part was indexed: the similarity index was extended, not rebuilt
+    assert second.article_index._lsh is not None
+    assert second.article_index.similarity_index() is not first.article_index.similarity_index()
+    assert len(second.article_index.similarity_index()) == 30
+
+    new_article = URIRef(create_article_uri("Article 25"))
+    assert second.article_index.fetch(new_article)["title"].toPython() == "Article 25"
+    ranked = second.article_index.top_articles([new_article], {convert_to_uri("Mouth Neoplasms")})
+    assert [uri for uri, _ in ranked] == [new_article]
+    assert first.article_index.top_articles([new_article], {convert_to_uri("Mouth Neoplasms")}) == []
+
+    # The extended index matches one built from the whole file
+    rebuilt = PubMedGraph(output_path, rdf_format="nt").snapshot().article_index
+    candidates = [create_article_uri(f"Article {i}") for i in range(30)]
+    terms = {convert_to_uri("Mouth Neoplasms"), convert_to_uri("Term2")}
+    assert second.article_index.top_articles(candidates, terms) == rebuilt.top_articles(candidates, terms)
+
+
+def test_rewritten_file_is_parsed_again(tmp_path):
+    csv_path, output_path = str(tmp_path / "articles.csv"), str(tmp_path / "graph.nt")
+    write_csv(csv_path, 0, 20)
+    build_graph(csv_path, output_path, rdf_format="nt", workers=1)
+    shared = PubMedGraph(output_path, rdf_format="nt")
+    assert len(shared.article_index) == 20
+
+    write_csv(csv_path, 100, 110)
+    build_graph(csv_path, output_path, rdf_format="nt", workers=1)
+    bump_mtime(output_path)
+    assert len(shared.article_index) == 10
+
+
+@pytest.fixture
+def graph_file(tmp_path):
+    csv_path, output_path = str(tmp_path / "articles.csv"), str(tmp_path / "graph.nt")
+    write_csv(csv_path, 0, 20)
+    build_graph(csv_path, output_path, rdf_format="nt", workers=1)
+    return csv_path, output_path
+
+
+def test_file_is_parsed_once(graph_file, monkeypatch):
+    _, output_path = graph_file
+    shared = PubMedGraph(output_path, rdf_format="nt")
+    assert shared.stats() == {"path": output_path, "loaded": False}
+
+    first = shared.snapshot()
+    loads = []
+    monkeypatch.setattr(shared, "_load", lambda: loads.append(1))
+    assert shared.snapshot() is first
+    assert shared.graph is first.graph
+    assert shared.article_index is first.article_index
+    assert loads == []
+
+    stats = shared.stats()
+    assert stats["loaded"] and stats["indexed_articles"] == 20
+    assert stats["triple_count"] == len(first.graph)
+
+
+def test_touched_file_keeps_the_parsed_graph(graph_file, monkeypatch):
+    _, output_path = graph_file
+    shared = PubMedGraph(output_path, rdf_format="nt")
+    first = shared.snapshot()
+    loads = []
+    monkeypatch.setattr(shared, "_load", lambda: loads.append(1))
+
+    bump_mtime(output_path)
+    second = shared.snapshot()
+
+    assert loads == []
+    assert second is not first
+    assert second.mtime == os.stat(output_path).st_mtime
+    assert second.graph is first.graph and second.article_index is first.article_index
+
+
+def test_readers_keep_their_snapshot_across_a_reload(graph_file):
+    csv_path, output_path = graph_file
+    shared = PubMedGraph(output_path, rdf_format="nt")
+    held = shared.snapshot()
+    old_article = URIRef(create_article_uri("Article 3"))
+
+    write_csv(csv_path, 100, 110)
+    build_graph(csv_path, output_path, rdf_format="nt", workers=1)
+    bump_mtime(output_path)
+
+    # While another thread is reloading, readers are served the previous snapshot at once
+    with shared._reload_lock:
+        assert shared.snapshot() is held
+
+    current = shared.snapshot()
+    assert current is not held
+    assert len(current.article_index) == 10
+    assert current.article_index.fetch(old_article)["title"] is None
+    # The snapshot a running query holds is unchanged
+    assert len(held.article_index) == 20
+    assert held.article_index.fetch(old_article)["title"].toPython() == "Article 3"
+    assert (old_article, None, None) in held.graph
+
+
+def test_missing_file_keeps_last_good_graph(graph_file):
+    _, output_path = graph_file
+    shared = PubMedGraph(output_path, rdf_format="nt")
+    first = shared.snapshot()
+
+    os.remove(output_path)
+    assert shared.snapshot() is first
+
+
+def test_shared_graph_is_one_per_path(graph_file, monkeypatch):
+    _, output_path = graph_file
+    monkeypatch.chdir(os.path.dirname(output_path))
+
+    shared = get_shared_graph(os.path.basename(output_path), rdf_format="nt")
+    assert get_shared_graph(output_path, rdf_format="nt") is shared
+    assert shared.local_file_path == output_path
@@ -0,0 +1,158 @@
+import pytest
+from rdflib import Graph, URIRef
+
+from query_functions.article_index import ArticleIndex
+from query_functions.mesh_terms import convert_to_uri
+from query_functions.rdf_queries import query_rdf
+
+# The query the app ran for every selected term before the article index existed
+SPARQL_QUERY = """
+PREFIX schema: <http://schema.org/>
+PREFIX ex: <http://example.org/>
+
+SELECT ?article ?title ?abstract ?datePublished ?access ?meshTerm
+WHERE {{
+  ?article a ex:Article ;
+           schema:name ?title ;
+           schema:description ?abstract ;
+           schema:datePublished ?datePublished ;
+           ex:access ?access ;
+           schema:about ?meshTerm .
+
+  ?meshTerm a ex:MeSHTerm .
+
+  FILTER (?article IN ({article_uris}))
+}}
+"""
+
+TERMS = ["Humans", "Mouth Neoplasms", "Tongue Neoplasms", "Rats", "Lip Neoplasms"]
+
+
+def article_turtle(name, terms, date="2021-03-04", access=3, abstract=True):
+    lines = [f"ex:{name} a ex:Article ;", f'    schema:name "{name} title" ;']
+    if abstract:
+        lines.append(f'    schema:description "{name} abstract" ;')
+    if date:
+        lines.append(f'    schema:datePublished "{date}"^^xsd:date ;')
+    lines.append(f"    ex:access {access} ;")
+    lines.append("    schema:about " + ", ".join(f"<{convert_to_uri(term)}>" for term in terms) + " .")
+    return "\n".join(lines)
+
+
+@pytest.fixture(scope="module")
+def turtle_path(tmp_path_factory):
+    parts = [
+        "@prefix ex: <http://example.org/> .",
+        "@prefix schema: <http://schema.org/> .",
+        "@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .",
+        "@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .",
+    ]
+    for term in TERMS:
+        parts.append(f'<{convert_to_uri(term)}> a ex:MeSHTerm ; rdfs:label "{term}" .')
+    # Linked from articles but not typed ex:MeSHTerm, so the query never matches it
+    parts.append(f'<{convert_to_uri("Untyped")}> rdfs:label "Untyped" .')
+    for i in range(40):
+        terms = [TERMS[j] for j in range(len(TERMS)) if (i >> j) & 1] or ["Rats"]
+        parts.append(article_turtle(f"a{i}", terms + (["Untyped"] if i % 3 == 0 else []),
+                                    access=i % 10, date=f"20{10 + i % 10}-01-0{1 + i % 9}"))
+    # Missing fields the query requires
+    parts.append(article_turtle("no_date", ["Humans", "Mouth Neoplasms"], date=None))
+    parts.append(article_turtle("no_abstract", ["Humans", "Mouth Neoplasms"], abstract=False))
+    # Only a term that is not typed ex:MeSHTerm
+    parts.append(article_turtle("untyped_only", ["Untyped"]))
+
+    path = tmp_path_factory.mktemp("graph") / "graph.ttl"
+    path.write_text("\n".join(parts) + "\n", encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture(scope="module")
+def graph(turtle_path):
+    g = Graph()
+    g.parse(turtle_path, format="ttl")
+    return g
+
+
+def candidates():
+    names = [f"a{i}" for i in range(40) if i % 5 != 4] + ["no_date", "no_abstract", "untyped_only", "not_in_graph"]
+    return [f"http://example.org/{name}" for name in names]
+
+
+def baseline(graph, article_uris, terms):
+    # One query per selected term with ?meshTerm bound, merging rows per article as the app did
+    query = SPARQL_QUERY.format(article_uris=", ".join(f"<{uri}>" for uri in article_uris))
+    articles = {}
+    for term in terms:
+        for row in graph.query(query, initBindings={"meshTerm": convert_to_uri(term)}):
+            data = articles.setdefault(row["article"], {
+                "title": row["title"],
+                "abstract": row["abstract"],
+                "datePublished": row["datePublished"],
+                "access": row["access"],
+                "meshTerms": set(),
+            })
+            data["meshTerms"].add(str(row["meshTerm"]))
+    return articles
+
+
+@pytest.mark.parametrize("terms", [
+    ["Mouth Neoplasms"],
+    ["Humans", "Mouth Neoplasms"],
+    ["Humans", "Tongue Neoplasms", "Lip Neoplasms", "Untyped"],
+    TERMS,
+    ["Unknown Term"],
+])
+def test_overlap_matches_sparql_filter(graph, terms):
+    index = ArticleIndex(graph)
+    expected = baseline(graph, candidates(), terms)
+
+    rows, counts = index.overlap(candidates(), {convert_to_uri(term) for term in terms})
+
+    assert {index.articles[row]: int(count) for row, count in zip(rows, counts)} == {
+        uri: len(data["meshTerms"]) for uri, data in expected.items()
+    }
+    # Candidates keep their input order
+    order = [uri for uri in map(URIRef, candidates()) if uri in expected]
+    assert [index.articles[row] for row in rows] == order
+
+
+@pytest.mark.parametrize("terms", [
+    ["Humans", "Mouth Neoplasms"],
+    ["Humans", "Tongue Neoplasms", "Lip Neoplasms", "Untyped"],
+    TERMS,
+])
+def test_indexed_query_rdf_matches_baseline_query(turtle_path, graph, terms):
+    expected = baseline(graph, candidates(), terms)
+
+    ranked = query_rdf(turtle_path, None, terms, article_uris=candidates(), limit=len(candidates()))
+
+    assert {uri for uri, _ in ranked} == set(expected)
+    for uri, data in ranked:
+        assert {name: data[name] for name in expected[uri]} == expected[uri]
+    # Best first by the number of matched terms, ties in candidate order
+    counts = [len(data["meshTerms"]) for _, data in ranked]
+    assert counts == sorted(counts, reverse=True)
+    positions = {uri: i for i, uri in enumerate(map(URIRef, candidates()))}
+    for (uri_a, a), (uri_b, b) in zip(ranked, ranked[1:]):
+        if len(a["meshTerms"]) == len(b["meshTerms"]):
+            assert positions[uri_a] < positions[uri_b]
+
+
+def test_legacy_sparql_path_matches_baseline(turtle_path, graph):
+    terms = ["Humans", "Mouth Neoplasms"]
+    query = SPARQL_QUERY.format(article_uris=", ".join(f"<{uri}>" for uri in candidates()))
+    expected = baseline(graph, candidates(), terms)
+
+    ranked = query_rdf(turtle_path, query, terms)
+
+    assert len(ranked) == min(10, len(expected))
+    for uri, data in ranked:
+        assert data == expected[uri]
+
+
+def test_indexed_query_rdf_limit_and_no_terms(turtle_path):
+    ranked = query_rdf(turtle_path, None, TERMS, article_uris=candidates(), limit=3)
+    assert len(ranked) == 3
+    assert query_rdf(turtle_path, None, ["Unknown Term"], article_uris=candidates()) == []
+    with pytest.raises(ValueError):
+        query_rdf(turtle_path, None, [], article_uris=candidates())
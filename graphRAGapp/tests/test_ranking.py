@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+
+from query_functions.ranking import rank_articles
+
+
+def positions(ranked):
+    return [position for position, _ in ranked]
+
+
+def test_linear_scores():
+    counts = [2, 1, 2]
+    distances = np.array([0.4, 0.2, np.nan])
+
+    ranked = rank_articles(counts, 2, distances, method="linear", vector_weight=0.25)
+
+    expected = {
+        0: 0.25 * 0.8 + 0.75 * 1.0,
+        1: 0.25 * 0.9 + 0.75 * 0.5,
+        2: 0.75 * 1.0,  # No distance: no vector relevance
+    }
+    assert positions(ranked) == [0, 2, 1]
+    assert dict(ranked) == pytest.approx(expected)
+
+
+def test_rrf_scores():
+    counts = [3, 1, 3, 2]
+    distances = np.array([0.5, 0.1, np.nan, 0.3])
+
+    ranked = rank_articles(counts, 3, distances, method="rrf", vector_weight=0.5, rrf_k=60)
+
+    # Overlap ranks 1, 4, 1, 3 (ties share the better rank); distance ranks 3, 1, -, 2
+    expected = {
+        0: 0.5 / 61 + 0.5 / 63,
+        1: 0.5 / 64 + 0.5 / 61,
+        2: 0.5 / 61,
+        3: 0.5 / 63 + 0.5 / 62,
+    }
+    assert dict(ranked) == pytest.approx(expected)
+    assert positions(ranked) == sorted(expected, key=expected.get, reverse=True)
+
+
+def test_linear_and_rrf_can_disagree():
+    # A very close article with one match against far articles with every match: the linear
+    # score rewards the size of the distance gap, RRF only that it is ranked first
+    counts = [1, 3, 3, 3]
+    distances = np.array([0.0, 1.9, 1.95, 2.0])
+
+    linear = rank_articles(counts, 3, distances, method="linear", vector_weight=0.5, k=1)
+    rrf = rank_articles(counts, 3, distances, method="rrf", vector_weight=0.5, k=1)
+
+    assert positions(linear) == [0]
+    assert positions(rrf) == [1]
+
+
+@pytest.mark.parametrize("method", ["linear", "rrf"])
+def test_ties_keep_input_order(method):
+    counts = [1, 2, 1, 2, 1, 2]
+
+    ranked = rank_articles(counts, 2, method=method, k=4)
+
+    assert positions(ranked) == [1, 3, 5, 0]
+    assert ranked[0][1] == ranked[1][1] == ranked[2][1]
+
+
+@pytest.mark.parametrize("method", ["linear", "rrf"])
+def test_top_k_matches_full_sort(method):
+    rng = np.random.default_rng(3)
+    counts = rng.integers(1, 5, size=500)
+    distances = rng.uniform(0.0, 2.0, size=500)
+    distances[rng.choice(500, size=50, replace=False)] = np.nan
+
+    everything = rank_articles(counts, 4, distances, method=method, k=500)
+    scores = np.array([score for _, score in sorted(everything)])
+    expected = sorted(range(500), key=lambda position: (-scores[position], position))
+
+    assert positions(everything) == expected
+    for k in (1, 10, 499):
+        assert rank_articles(counts, 4, distances, method=method, k=k) == everything[:k]
+    assert len(rank_articles(counts, 4, distances, method=method, k=1000)) == 500
+    assert rank_articles([], 4, method=method) == []
+
+
+def test_vector_weight_extremes():
+    counts = [1, 2, 3]
+    distances = np.array([0.1, 0.2, 0.3])
+
+    assert positions(rank_articles(counts, 3, distances, vector_weight=0.0)) == [2, 1, 0]
+    assert positions(rank_articles(counts, 3, distances, vector_weight=1.0)) == [0, 1, 2]
+    assert positions(rank_articles(counts, 3, distances, method="rrf", vector_weight=0.0)) == [2, 1, 0]
+    assert positions(rank_articles(counts, 3, distances, method="rrf", vector_weight=1.0)) == [0, 1, 2]
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        rank_articles([1], 1, method="bm25")
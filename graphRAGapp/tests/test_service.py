@@ -0,0 +1,110 @@
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")  # used by fastapi.testclient
+pytest.importorskip("weaviate")  # imported by the pipeline's search stage
+pytest.importorskip("dotenv")  # imported by service.py
+
+from fastapi.testclient import TestClient
+
+import service
+from query_functions import pipeline
+
+CANDIDATES = [
+    {"uuid": f"uuid-{i}", "properties": {"article_URI": f"http://example.org/article/{i}", "title": f"Article {i}",
+                                         "meshMajor": ["Humans"]}, "distance": i / 10}
+    for i in range(3)
+]
+
+
+def article(i, score):
+    return {"article_uri": f"http://example.org/article/{i}", "title": f"Article {i}", "abstract": f"Abstract {i}",
+            "datePublished": "2024-01-01", "access": 5, "meshTerms": ["http://example.org/mesh/_Humans_"],
+            "score": score}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = {}
+
+    def search_articles(query_text, max_results=100, max_distance=None):
+        calls["search"] = (query_text, max_results, max_distance)
+        return CANDIDATES[:max_results]
+
+    def filter_articles(terms, article_uris, distances=None, ranking_method="linear", vector_weight=0.5, limit=10):
+        calls["filter"] = dict(terms=terms, article_uris=article_uris, distances=distances,
+                               ranking_method=ranking_method, vector_weight=vector_weight, limit=limit)
+        return [article(i, 1.0 - i / 10) for i in range(min(limit, len(article_uris)))]
+
+    def stream_summary(texts, user_query):
+        calls["summarize"] = (texts, user_query)
+        yield from ["A ", "streamed ", "summary."]
+
+    monkeypatch.setattr(pipeline, "search_articles", search_articles)
+    monkeypatch.setattr(pipeline, "filter_articles", filter_articles)
+    monkeypatch.setattr(pipeline, "stream_summary", stream_summary)
+    return calls
+
+
+@pytest.fixture
+def client():
+    # Not entered as a context manager, so the lifespan does not start loading the graph
+    return TestClient(service.app)
+
+
+def test_search_articles(client, calls):
+    response = client.post("/search/articles", json={"query_text": "oral cancer", "max_results": 2, "max_distance": 0.4})
+
+    assert response.status_code == 200
+    assert response.json() == CANDIDATES[:2]
+    assert calls["search"] == ("oral cancer", 2, 0.4)
+
+
+def test_search_articles_validates_body(client, calls):
+    assert client.post("/search/articles", json={"max_results": 2}).status_code == 422
+    assert "search" not in calls
+
+
+def test_filter_refines_candidates(client, calls):
+    uris = [result["properties"]["article_URI"] for result in CANDIDATES]
+    distances = {uri: result["distance"] for uri, result in zip(uris, CANDIDATES)}
+    response = client.post("/filter", json={
+        "terms": ["Humans"], "article_uris": uris, "distances": distances, "ranking_method": "rrf", "limit": 2,
+    })
+
+    assert response.status_code == 200
+    assert [result["article_uri"] for result in response.json()] == uris[:2]
+    assert calls["filter"] == dict(terms=["Humans"], article_uris=uris, distances=distances,
+                                   ranking_method="rrf", vector_weight=0.5, limit=2)
+
+
+def test_filter_requires_terms(client, calls):
+    response = client.post("/filter", json={"terms": [], "article_uris": ["http://example.org/article/0"]})
+
+    assert response.status_code == 422
+    assert "filter" not in calls
+
+
+def test_summarize_streams_plain_text(client, calls):
+    texts = ["Title: Article 0 Abstract: Abstract 0"]
+    with client.stream("POST", "/summarize", json={"article_texts": texts, "user_query": "Summarize"}) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        body = "".join(response.iter_text())
+
+    assert body == "A streamed summary."
+    assert calls["summarize"] == (texts, "Summarize")
+
+
+def test_pipeline_runs_every_stage(client, calls):
+    response = client.post("/pipeline", json={
+        "query_text": "oral cancer", "terms": ["Humans"], "user_query": "Summarize", "limit": 2,
+    })
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["candidates"] == len(CANDIDATES)
+    assert [article["title"] for article in result["articles"]] == ["Article 0", "Article 1"]
+    assert result["summary"] == "A streamed summary."
+    assert calls["filter"]["distances"] == {r["properties"]["article_URI"]: r["distance"] for r in CANDIDATES}
+    assert calls["summarize"][0] == pipeline.article_texts(result["articles"])
@@ -0,0 +1,63 @@
+from rdflib import URIRef
+
+from query_functions.article_index import ArticleIndex
+
+ARTICLE = "http://example.org/article/"
+MESH = "http://example.org/mesh/"
+
+
+def fields(title):
+    return {"title": title, "abstract": "", "datePublished": None, "access": None}
+
+
+def build_index(articles):
+    rows = (
+        (ARTICLE + name, fields(name), [MESH + term for term in terms])
+        for name, terms in articles.items()
+    )
+    return ArticleIndex.from_rows(rows)
+
+
+BASE_TERMS = [f"T{i}" for i in range(8)]
+ARTICLES = {
+    "query": BASE_TERMS,
+    "duplicate": BASE_TERMS,
+    "near_duplicate": BASE_TERMS[:7] + ["T8"],
+    "disjoint": [f"D{i}" for i in range(8)],
+    "other_disjoint": [f"E{i}" for i in range(6)],
+}
+
+
+def test_near_duplicates_found_disjoint_not():
+    index = build_index(ARTICLES)
+    similar = dict(index.similar(ARTICLE + "query", k=5))
+
+    assert similar[URIRef(ARTICLE + "duplicate")] == 1.0
+    assert similar[URIRef(ARTICLE + "near_duplicate")] == 7 / 9
+    assert URIRef(ARTICLE + "disjoint") not in similar
+    assert URIRef(ARTICLE + "other_disjoint") not in similar
+    assert URIRef(ARTICLE + "query") not in similar
+
+
+def test_k_and_order_are_respected():
+    index = build_index(ARTICLES)
+    assert index.similar(ARTICLE + "query", k=1) == [(URIRef(ARTICLE + "duplicate"), 1.0)]
+    ranked = index.similar(ARTICLE + "query", k=2)
+    assert [similarity for _, similarity in ranked] == sorted((similarity for _, similarity in ranked), reverse=True)
+
+
+def test_unknown_article_has_no_neighbors():
+    assert build_index(ARTICLES).similar(ARTICLE + "missing") == []
+
+
+def test_many_articles_only_near_ones_returned():
+    # Every article shares the common term, as most PubMed articles share "Humans"
+    articles = {f"a{i}": ["Humans", f"X{i}", f"Y{i}", f"Z{i}"] for i in range(500)}
+    articles["query"] = ["Humans", "P1", "P2", "P3", "P4"]
+    articles["neighbor"] = ["Humans", "P1", "P2", "P3", "P5"]
+    index = build_index(articles)
+
+    lsh = index.similarity_index()
+    candidates, _ = lsh.candidates(lsh.signature(index.row_terms(index.articles.id_of(ARTICLE + "query"))))
+    assert len(candidates) < 50
+    assert index.similar(ARTICLE + "query", k=1) == [(URIRef(ARTICLE + "neighbor"), 4 / 6)]
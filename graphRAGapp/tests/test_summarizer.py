@@ -0,0 +1,190 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from query_functions import summarizer
+from query_functions.summarizer import SummaryCache
+
+MODEL = "test-model"
+
+
+class RateLimitError(Exception):
+    def __init__(self, retry_after="0"):
+        super().__init__("rate limited")
+        self.response = SimpleNamespace(headers={"retry-after": retry_after})
+
+
+class FakeClient:
+    """
+    Stands in for openai.OpenAI: chat.completions.create answers with the given words, or with
+    notes of note_chars characters instead of short ones when it is set.
+    """
+
+    def __init__(self, words=("A", "short", "summary."), failures=0, note_chars=None):
+        self.words = words
+        self.failures = failures
+        self.note_chars = note_chars
+        self.calls = []
+        self.chat = SimpleNamespace(completions=self)
+
+    def create(self, messages, model, temperature, stream=False):
+        self.calls.append({"messages": messages, "stream": stream})
+        if self.failures:
+            self.failures -= 1
+            raise RateLimitError()
+        if stream:
+            return iter([SimpleNamespace(choices=[])] + [
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=f"{word} "))])
+                for word in self.words
+            ])
+        text = f"Notes on {len(messages[1]['content'])} characters."
+        if self.note_chars:
+            text = "n" * self.note_chars
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SummaryCache(str(tmp_path / "summaries"))
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Four characters per token for the test model, whether or not tiktoken is installed
+    monkeypatch.setitem(summarizer._encodings, MODEL, False)
+
+
+def test_stream_summary_caches_finished_stream(cache):
+    client = FakeClient()
+    first = list(summarizer.stream_summary("Some articles", "Summarize", MODEL, client, cache))
+    assert "".join(first) == "A short summary. "
+    assert client.calls[0]["stream"]
+
+    second = list(summarizer.stream_summary("Some articles", "Summarize", MODEL, client, cache))
+    assert second == ["A short summary."]
+    assert len(client.calls) == 1
+
+
+def test_stream_summary_cache_misses_on_different_request(cache):
+    client = FakeClient()
+    summarizer.generate_summary("Some articles", "Summarize", MODEL, client, cache)
+    summarizer.generate_summary("Other articles", "Summarize", MODEL, client, cache)
+    summarizer.generate_summary("Some articles", "List the findings", MODEL, client, cache)
+    assert len(client.calls) == 3
+
+
+def test_interrupted_stream_is_not_cached(cache):
+    client = FakeClient()
+    stream = summarizer.stream_summary("Some articles", "Summarize", MODEL, client, cache)
+    assert next(stream) == "A "
+    stream.close()
+
+    key = SummaryCache.key(MODEL, summarizer._messages("Some articles", "Summarize"))
+    assert cache.get(key) is None
+    summarizer.generate_summary("Some articles", "Summarize", MODEL, client, cache)
+    assert len(client.calls) == 2
+
+
+def test_cache_evicts_least_recently_read(tmp_path):
+    cache = SummaryCache(str(tmp_path), max_bytes=250)
+    for age, key in enumerate(["old", "read", "new"]):
+        cache.put(key, "x" * 100)
+        os.utime(cache._path(key), (1000 + age, 1000 + age))
+    cache.get("read")  # Now the most recently used
+    cache.put("newest", "x" * 100)
+
+    assert cache.get("old") is None
+    assert cache.get("new") is None
+    assert cache.get("read") is not None
+    assert cache.get("newest") is not None
+
+
+def test_pack_chunks_respects_token_budget():
+    texts = ["a" * 40, "b" * 40, "c" * 40, "d" * 400]  # 10, 10, 10 and 100 tokens
+    chunks = summarizer.pack_chunks(texts, max_tokens=25, model=MODEL)
+
+    assert chunks == ["a" * 40 + " " + "b" * 40, "c" * 40, "d" * 100]
+    assert all(summarizer.count_tokens(chunk.replace(" ", ""), MODEL) <= 25 for chunk in chunks)
+    assert summarizer.pack_chunks([], model=MODEL) == []
+
+
+def test_with_retries_retries_retryable_errors():
+    client = FakeClient(failures=2)
+    response = summarizer._with_retries(lambda: client.create([{}, {"content": "x"}], MODEL, 0), max_retries=3)
+    assert response.choices[0].message.content
+    assert len(client.calls) == 3
+
+
+def test_with_retries_gives_up():
+    client = FakeClient(failures=5)
+    with pytest.raises(RateLimitError):
+        summarizer._with_retries(lambda: client.create([{}, {"content": "x"}], MODEL, 0), max_retries=2)
+    assert len(client.calls) == 3
+
+
+def test_with_retries_does_not_retry_other_errors():
+    calls = []
+
+    def call():
+        calls.append(1)
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        summarizer._with_retries(call)
+    assert len(calls) == 1
+
+
+def test_map_reduce_summarizes_chunks_then_streams_reduce(cache):
+    texts = [f"Title: {i} Abstract: " + "word " * 30 for i in range(6)]
+    client = FakeClient()
+    summary = "".join(summarizer.stream_map_reduce_summary(
+        texts, "Summarize", MODEL, client, cache, chunk_tokens=100, max_workers=2,
+    ))
+
+    map_calls = [call for call in client.calls if not call["stream"]]
+    assert len(map_calls) == len(summarizer.pack_chunks(texts, 100, MODEL)) > 1
+    assert client.calls[-1]["stream"]
+    assert summarizer.REDUCE_INSTRUCTION in client.calls[-1]["messages"][1]["content"]
+    assert summary == "A short summary. "
+
+    # Every call was cached, so a rerun does not reach the model
+    rerun = FakeClient()
+    assert "".join(summarizer.stream_map_reduce_summary(
+        texts, "Summarize", MODEL, rerun, cache, chunk_tokens=100, max_workers=2,
+    )) == "A short summary."
+    assert rerun.calls == []
+
+
+def test_later_rounds_merge_notes(cache):
+    # Twelve one-article chunks whose notes still need two chunks, so there are two map rounds
+    texts = [f"Title: {i} Abstract: " + "word " * 30 for i in range(12)]
+    client = FakeClient()
+    list(summarizer.stream_map_reduce_summary(texts, "Summarize", MODEL, client, cache, chunk_tokens=50))
+
+    prompts = [call["messages"][1]["content"] for call in client.calls if not call["stream"]]
+    assert len(prompts) == 12 + 2
+    assert all(prompt.startswith(summarizer.MAP_INSTRUCTION) for prompt in prompts[:12])
+    for prompt in prompts[12:]:
+        assert prompt.startswith(f"{summarizer.REDUCE_INSTRUCTION}\n{summarizer.MERGE_INSTRUCTION}\nSummarize")
+        assert summarizer.MAP_INSTRUCTION not in prompt
+
+
+def test_notes_that_do_not_shrink_are_cut_to_one_chunk(cache):
+    texts = [f"Title: {i} Abstract: " + "word " * 30 for i in range(3)]
+    client = FakeClient(note_chars=400)  # 100 tokens of notes per 50-token chunk
+    summary = "".join(summarizer.stream_map_reduce_summary(
+        texts, "Summarize", MODEL, client, cache, chunk_tokens=50,
+    ))
+
+    assert summary == "A short summary. "
+    assert len([call for call in client.calls if not call["stream"]]) == 3
+    notes = client.calls[-1]["messages"][1]["content"].split("\n\n", 1)[1]
+    assert notes.count("n") == 3 * 64
+    assert summarizer.count_tokens(notes, MODEL) <= 50
+
+
+def test_truncate_tokens():
+    assert summarizer.truncate_tokens("a" * 400, 25, MODEL) == "a" * 100
+    assert summarizer.truncate_tokens("short", 25, MODEL) == "short"
+    assert summarizer.truncate_tokens("a" * 400, 0, MODEL) == ""
@@ -0,0 +1,72 @@
+import numpy as np
+from rdflib import Literal, URIRef
+
+from query_functions.article_index import ArticleIndex
+from query_functions.term_dictionary import TermDictionary
+
+URIS = [URIRef(f"http://example.org/mesh/_Term{i}_") for i in range(5)]
+
+
+def test_ids_round_trip():
+    dictionary = TermDictionary()
+    ids = [dictionary.intern(uri) for uri in URIS + URIS[:2]]
+
+    assert ids == [0, 1, 2, 3, 4, 0, 1]
+    assert len(dictionary) == 5
+    for uri in URIS:
+        assert dictionary[dictionary.id_of(uri)] == uri
+        assert dictionary[dictionary.intern(uri)] is dictionary[dictionary.id_of(uri)]
+
+
+def test_lookups_accept_strings():
+    dictionary = TermDictionary()
+    for uri in URIS:
+        dictionary.intern(uri)
+
+    assert dictionary.id_of(str(URIS[3])) == 3
+    assert str(URIS[3]) in dictionary
+    assert dictionary.id_of("http://example.org/mesh/_Unknown_") is None
+    assert "http://example.org/mesh/_Unknown_" not in dictionary
+    # Lookups go by the URI's text, whatever kind of rdflib term carries it
+    assert dictionary.id_of(Literal(str(URIS[0]))) == 0
+
+
+def test_ids_of_keeps_order_and_skips_unknown_and_repeated():
+    dictionary = TermDictionary()
+    for uri in URIS:
+        dictionary.intern(uri)
+
+    ids = dictionary.ids_of([URIS[4], "http://example.org/mesh/_Unknown_", str(URIS[1]), URIS[4], URIS[0]])
+
+    assert ids.dtype == np.int64
+    assert ids.tolist() == [4, 1, 0]
+    assert [dictionary[i] for i in ids] == [URIS[4], URIS[1], URIS[0]]
+    assert dictionary.ids_of([]).tolist() == []
+
+
+def test_copy_is_independent():
+    dictionary = TermDictionary()
+    for uri in URIS[:3]:
+        dictionary.intern(uri)
+
+    copy = dictionary.copy()
+    assert copy.intern(URIS[3]) == 3
+    assert copy.intern(URIS[1]) == 1
+
+    assert len(dictionary) == 3 and len(copy) == 4
+    assert URIS[3] not in dictionary
+    assert dictionary.intern(URIS[4]) == 3  # The original assigns its own next ID
+
+
+def test_article_rows_map_back_to_their_terms():
+    rows = [
+        (f"http://example.org/article/{i}", {name: None for name in ArticleIndex.FIELDS}, URIS[i % 3:i % 3 + 3])
+        for i in range(6)
+    ]
+    index = ArticleIndex.from_rows(rows)
+
+    for article_uri, _, term_uris in rows:
+        row = index.articles.id_of(article_uri)
+        assert index.articles[row] == URIRef(article_uri)
+        assert {index.terms[t] for t in index.row_terms(row)} == set(term_uris)
+    assert index.indices.dtype == np.int32 and len(index.indptr) == len(rows) + 1
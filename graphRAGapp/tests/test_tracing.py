@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+from query_functions import tracing
+from query_functions.tracing import recorder, span, start_span
+
+
+@pytest.fixture(autouse=True)
+def enabled_tracing():
+    tracing.set_tracing(True)
+    recorder.reset()
+    yield
+    tracing.set_tracing(False)
+    recorder.reset()
+
+
+def recorded(stage):
+    return [event for event in recorder.recent if event["stage"] == stage]
+
+
+def stream():
+    s = start_span("stream")
+    try:
+        yield 1
+        yield 2
+    finally:
+        s.end()
+
+
+def test_suspended_generator_span_is_not_a_parent():
+    with span("request"):
+        items = stream()
+        next(items)
+        with span("other"):
+            pass
+        list(items)
+
+    assert recorded("other")[0]["parent"] == "request"
+    assert recorded("stream")[0]["parent"] == "request"
+    assert len(recorded("stream")) == 1
+
+
+def test_abandoned_generator_span_is_recorded_once():
+    items = stream()
+    next(items)
+    items.close()
+    with span("after"):
+        pass
+
+    assert len(recorded("stream")) == 1
+    assert recorded("after")[0]["parent"] is None
+
+
+def test_span_ended_with_error_and_named_parent():
+    def work():
+        s = start_span("chunk", parent="map")
+        s.end(ValueError("failed"))
+        s.end()
+
+    thread = threading.Thread(target=work)
+    thread.start()
+    thread.join()
+
+    [event] = recorded("chunk")
+    assert event["parent"] == "map"
+    assert event["error"] == "ValueError: failed"
+    assert recorder.summary()["chunk"]["errors"] == 1
@@ -0,0 +1,51 @@
+import os
+import shutil
+
+import pytest
+
+pytest.importorskip("pyoxigraph")
+
+from query_functions import triple_store
+
+FIXTURE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mesh_sample.nt")
+
+
+@pytest.fixture
+def rdf_file(tmp_path):
+    path = tmp_path / "mesh.nt"
+    shutil.copy(FIXTURE, path)
+    return str(path)
+
+
+def test_open_imports_once_and_answers_queries(rdf_file, tmp_path):
+    store_path = str(tmp_path / "store")
+    graph = triple_store.open_triple_store(rdf_file, rdf_format="nt", store_path=store_path)
+    assert len(graph) == 44
+    assert triple_store.open_triple_store(rdf_file, rdf_format="nt", store_path=store_path).path == graph.path
+
+
+def test_import_keeps_old_versions_and_other_directories(rdf_file, tmp_path):
+    store_path = str(tmp_path / "store")
+    os.makedirs(os.path.join(store_path, "backups"))
+    older = os.path.join(store_path, "0123456789abcdef-1000")
+    os.makedirs(older)
+
+    version_path = triple_store.import_rdf_file(rdf_file, store_path, "nt")
+
+    assert sorted(os.listdir(store_path)) == sorted(
+        ["backups", "0123456789abcdef-1000", os.path.basename(version_path), triple_store.CURRENT_FILE]
+    )
+
+
+def test_remove_old_versions_only_deletes_older_versions(rdf_file, tmp_path):
+    store_path = str(tmp_path / "store")
+    version_path = triple_store.import_rdf_file(rdf_file, store_path, "nt")
+    imported_at = int(os.path.basename(version_path).split("-")[1])
+    older = os.path.join(store_path, f"0123456789abcdef-{imported_at - 60}")
+    newer = os.path.join(store_path, f"0123456789abcdef-{imported_at + 60}")
+    other = os.path.join(store_path, "notes-1")
+    for path in (older, newer, other):
+        os.makedirs(path)
+
+    assert triple_store.remove_old_versions(store_path) == [older]
+    assert all(os.path.isdir(path) for path in (version_path, newer, other))
@@ -0,0 +1,146 @@
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from query_functions import vector_index
+from query_functions.embedders import HashingEmbedder, get_embedder
+from query_functions.vector_index import LocalVectorIndex, build_local_index
+
+TOPICS = {
+    "cardiology": "heart cardiac artery coronary myocardial infarction blood pressure",
+    "oncology": "tumor cancer carcinoma metastasis chemotherapy oncology neoplasm",
+    "neurology": "brain neuron cortex seizure epilepsy stroke cognition",
+}
+
+
+def article_records():
+    words = {topic: text.split() for topic, text in TOPICS.items()}
+    return [
+        {"properties": {
+            "title": f"{topic.title()} study {i}",
+            "abstractText": " ".join(words[topic][j % len(words[topic])] for j in range(i, i + 5)),
+            "article_URI": f"http://example.org/article/{topic}_{i}",
+            "meshMajor": [topic.title()],
+        }}
+        for topic in TOPICS
+        for i in range(10)
+    ]
+
+
+@pytest.fixture
+def embedder():
+    return HashingEmbedder(dim=64)
+
+
+def test_hashing_embedder_is_deterministic_and_normalized(embedder):
+    vectors = embedder.embed(["Oral cancer", "oral CANCER", ""])
+
+    assert vectors.dtype == np.float32
+    assert np.allclose(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    assert not vectors[2].any()
+    assert np.allclose(get_embedder("hashing", dim=64).embed(["Oral cancer"]), vectors[:1])
+    with pytest.raises(ValueError):
+        get_embedder("unknown")
+
+
+def test_build_writes_memory_mapped_matrix_that_reopens(tmp_path, embedder):
+    records = article_records()
+    built = build_local_index(str(tmp_path), records, embedder, ("title", "abstractText"), batch_size=7)
+    reopened = LocalVectorIndex(str(tmp_path))
+
+    assert len(reopened) == len(records)
+    assert isinstance(reopened.vectors, np.memmap)
+    assert reopened.vectors.shape == (len(records), 64)
+    assert os.path.getsize(tmp_path / "vectors.f32") == len(records) * 64 * 4
+    assert np.array_equal(np.asarray(reopened.vectors), np.asarray(built.vectors))
+    assert reopened.properties == [record["properties"] for record in records]
+    assert reopened.embedder.config() == embedder.config()
+
+    expected = embedder.embed([f"{r['properties']['title']} {r['properties']['abstractText']}" for r in records])
+    assert np.allclose(np.asarray(reopened.vectors), expected)
+
+
+def test_build_rejects_empty_record_set(tmp_path, embedder):
+    with pytest.raises(ValueError):
+        build_local_index(str(tmp_path), [], embedder, ("title",))
+
+
+def test_exact_search_returns_top_k_by_cosine_distance(tmp_path, embedder, monkeypatch):
+    records = article_records()
+    # Small blocks so the running top-k is merged across several blocks
+    monkeypatch.setattr(vector_index, "SEARCH_BLOCK_ROWS", 4)
+    index = build_local_index(str(tmp_path), records, embedder, ("title", "abstractText"))
+    queries = ["cancer chemotherapy", "heart artery"]
+
+    results = index.search(queries, limit=5)
+
+    scores = embedder.embed(queries) @ np.asarray(index.vectors).T
+    for query_results, query_scores in zip(results, scores):
+        expected_rows = np.argsort(-query_scores, kind="stable")[:5]
+        assert [result["distance"] for result in query_results] == pytest.approx(
+            (1.0 - query_scores[expected_rows]).tolist(), abs=1e-6
+        )
+        distances = [result["distance"] for result in query_results]
+        assert distances == sorted(distances)
+        assert len(query_results) == 5
+    assert results[0][0]["properties"]["article_URI"].startswith("http://example.org/article/oncology")
+    assert results[1][0]["properties"]["article_URI"].startswith("http://example.org/article/cardiology")
+
+    # limit larger than the collection returns every object once
+    everything = index.search(["brain"], limit=1000)[0]
+    assert len(everything) == len(records)
+    assert len({result["uuid"] for result in everything}) == len(records)
+
+
+def test_ivf_top_hit_matches_exact_search(tmp_path, embedder):
+    records = article_records()
+    index = build_local_index(str(tmp_path), records, embedder, ("title", "abstractText"), ivf_lists=3, nprobe=1)
+
+    assert index.ivf is not None
+    assert index.ivf["offsets"][-1] == len(records)
+    assert sorted(index.ivf["order"].tolist()) == list(range(len(records)))
+
+    queries = ["tumor metastasis", "seizure cortex", "coronary infarction", "Neurology study 3"]
+    ivf = index.search(queries, limit=3)
+    exact = index.search(queries, limit=3, nprobe=0)
+    for ivf_results, exact_results in zip(ivf, exact):
+        assert ivf_results[0]["uuid"] == exact_results[0]["uuid"]
+        assert ivf_results[0]["distance"] == pytest.approx(exact_results[0]["distance"])
+
+
+def test_results_have_weaviate_article_shape(tmp_path, embedder):
+    records = article_records()
+    records[0]["uuid"] = uuid.UUID(int=7)
+    index = build_local_index(str(tmp_path), records, embedder, ("title", "abstractText"))
+
+    results = index.search([records[0]["properties"]["title"]], limit=3)[0]
+
+    for result in results:
+        assert set(result) == {"uuid", "properties", "distance"}
+        assert isinstance(result["uuid"], uuid.UUID)
+        assert isinstance(result["distance"], float)
+        assert set(result["properties"]) == {"title", "abstractText", "article_URI", "meshMajor"}
+    assert results[0]["uuid"] == uuid.UUID(int=7)
+    assert results[0]["distance"] == pytest.approx(1.0 - float(
+        embedder.embed([records[0]["properties"]["title"]])[0] @ np.asarray(index.vectors[0])
+    ), abs=1e-6)
+
+
+def test_query_weaviate_articles_uses_local_backend(tmp_path, embedder, monkeypatch):
+    weaviate_queries = pytest.importorskip("query_functions.weaviate_queries")
+    index = build_local_index(str(tmp_path), article_records(), embedder, ("title", "abstractText"))
+    monkeypatch.setattr(weaviate_queries, "use_local_backend", lambda: True)
+    monkeypatch.setattr(weaviate_queries, "get_local_index", lambda collection: index)
+
+    results = weaviate_queries.query_weaviate_articles(None, "cancer chemotherapy", limit=4)
+
+    assert len(results) == 4
+    assert all(set(result) == {"uuid", "properties", "distance"} for result in results)
+    assert set(results[0]["properties"]) == set(weaviate_queries.ARTICLE_SEARCH_PROPERTIES)
+    assert results == [
+        weaviate_queries.article_result(r["uuid"], r["properties"], r["distance"], weaviate_queries.ARTICLE_SEARCH_PROPERTIES)
+        for r in index.search(["cancer chemotherapy"], limit=4)[0]
+    ]
@@ -0,0 +1,135 @@
+import json
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("weaviate")
+
+from query_functions import weaviate_ingest
+from query_functions.embedders import HashingEmbedder
+from query_functions.vector_index import COLLECTION_TEXT_PROPERTIES, vectorizer_text
+
+
+class FakeCollection:
+    """
+    Stands in for a Weaviate collection: insert_many records the objects, and the batches listed
+    in fail_batches are rejected.
+    """
+
+    def __init__(self, batch_size, fail_batches=()):
+        self.batch_size = batch_size
+        self.fail_batches = set(fail_batches)
+        self.inserted = {}
+        self.lock = threading.Lock()
+        self.data = self
+
+    def insert_many(self, objects):
+        batch_number = int(objects[0].properties["title"].split()[-1]) // self.batch_size
+        if batch_number in self.fail_batches:
+            return SimpleNamespace(errors={0: "rejected"})
+        with self.lock:
+            for obj in objects:
+                self.inserted[obj.uuid] = obj
+        return SimpleNamespace(errors={})
+
+
+class FakePool:
+    def __init__(self, collection):
+        self.collection = collection
+        self.names = []
+
+    @contextmanager
+    def client(self):
+        def get(name):
+            self.names.append(name)
+            return self.collection
+        yield SimpleNamespace(collections=SimpleNamespace(get=get))
+
+
+def records(count):
+    return [
+        {
+            "title": f"Article {i}",
+            "abstractText": f"Abstract {i}",
+            "article_URI": f"http://example.org/article/Article_{i}",
+            "meshMajor": "['Humans', 'Rats']",
+        }
+        for i in range(count)
+    ]
+
+
+def test_failed_batches_are_retried_on_resume(tmp_path):
+    checkpoint = str(tmp_path / "Article.ingest.json")
+    collection = FakeCollection(batch_size=10, fail_batches={2, 4})
+    pool = FakePool(collection)
+
+    stats = weaviate_ingest.ingest_collection(
+        "Article", records(45), batch_size=10, workers=3, checkpoint_path=checkpoint, max_retries=0, pool=pool,
+    )
+
+    assert stats["batches"] == 3 and stats["failed_batches"] == 2
+    assert stats["objects"] == len(collection.inserted) == 30
+    assert set(pool.names) == {"Article"}
+    with open(checkpoint) as f:
+        assert json.load(f) == {"batch_size": 10, "completed_batches": [0, 1, 3]}
+
+    collection.fail_batches.clear()
+    stats = weaviate_ingest.ingest_collection(
+        "Article", records(45), batch_size=10, workers=3, checkpoint_path=checkpoint, max_retries=0, pool=pool,
+    )
+
+    assert stats["skipped_batches"] == 3 and stats["batches"] == 2 and stats["failed_batches"] == 0
+    assert stats["objects"] == 15
+    assert len(collection.inserted) == 45
+    assert {obj.properties["title"] for obj in collection.inserted.values()} == {f"Article {i}" for i in range(45)}
+    with open(checkpoint) as f:
+        assert json.load(f)["completed_batches"] == [0, 1, 2, 3, 4]
+
+
+def test_resend_overwrites_by_key_property(tmp_path):
+    collection = FakeCollection(batch_size=10)
+    pool = FakePool(collection)
+    for _ in range(2):
+        weaviate_ingest.ingest_collection("Article", records(12), batch_size=10, workers=2, pool=pool)
+
+    assert len(collection.inserted) == 12
+
+
+def test_checkpoint_requires_same_batch_size(tmp_path):
+    checkpoint = str(tmp_path / "Article.ingest.json")
+    weaviate_ingest.ingest_collection(
+        "Article", records(5), batch_size=5, workers=1, checkpoint_path=checkpoint, pool=FakePool(FakeCollection(5)),
+    )
+
+    with pytest.raises(ValueError):
+        weaviate_ingest.IngestCheckpoint(checkpoint, batch_size=10)
+
+
+def test_local_vectors_embed_the_text2vec_text():
+    collection = FakeCollection(batch_size=10)
+    embedder = HashingEmbedder(dim=32)
+    weaviate_ingest.ingest_collection(
+        "Article", records(3), embedder=embedder, batch_size=10, workers=1, pool=FakePool(collection),
+    )
+
+    properties = records(1)[0]
+    text = vectorizer_text(properties, COLLECTION_TEXT_PROPERTIES["Article"], "Article")
+    assert text == "article Abstract 0 http://example.org/article/Article_0 ['Humans', 'Rats'] Article 0"
+    obj = next(obj for obj in collection.inserted.values() if obj.properties["title"] == "Article 0")
+    assert obj.vector == pytest.approx(embedder.embed([text])[0].tolist())
+
+
+def test_article_records_keep_mesh_major_string():
+    df = pd.DataFrame({
+        "Title": ["Oral cancer", ""],
+        "abstractText": ["Abstract", "Untitled"],
+        "meshMajor": ["['Humans', 'Mouth Neoplasms']", "[]"],
+    })
+
+    (record,) = weaviate_ingest.article_records(df)
+
+    assert record["meshMajor"] == "['Humans', 'Mouth Neoplasms']"
+    assert record["article_URI"] == "http://example.org/article/Oral_cancer"
@@ -0,0 +1,54 @@
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("weaviate")
+
+from query_functions import weaviate_queries
+
+
+class FakeQuery:
+    def __init__(self, count):
+        self.count = count
+        self.calls = []
+
+    def near_text(self, query, limit, distance=None, return_properties=None, return_metadata=None, **kwargs):
+        self.calls.append(dict(kwargs, query=query, limit=limit, distance=distance))
+        objects = [
+            SimpleNamespace(
+                uuid=f"uuid-{i}",
+                properties={"article_URI": f"http://example.org/article/{i}", "title": f"Article {i}",
+                            "meshMajor": "['Humans', 'Mouth Neoplasms']"},
+                metadata=SimpleNamespace(distance=i / 1000),
+            )
+            for i in range(min(limit, self.count))
+        ]
+        return SimpleNamespace(objects=objects)
+
+
+def fake_client(count):
+    query = FakeQuery(count)
+    collection = SimpleNamespace(query=query)
+    return SimpleNamespace(collections=SimpleNamespace(get=lambda name: collection)), query
+
+
+@pytest.fixture(autouse=True)
+def weaviate_backend(monkeypatch):
+    monkeypatch.setattr(weaviate_queries, "use_local_backend", lambda: False)
+
+
+def test_search_is_one_query_yielded_in_pages():
+    client, query = fake_client(250)
+    pages = list(weaviate_queries.iter_weaviate_articles(client, "oral cancer", max_results=1000, page_size=100))
+
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert len(query.calls) == 1
+    assert "offset" not in query.calls[0]
+    assert pages[0][0]["properties"]["meshMajor"] == ["Humans", "Mouth Neoplasms"]
+
+
+def test_search_limit_is_capped_at_query_maximum():
+    client, query = fake_client(0)
+    list(weaviate_queries.iter_weaviate_articles(client, "oral cancer", max_results=50000))
+
+    assert query.calls[0]["limit"] == weaviate_queries.QUERY_MAXIMUM_RESULTS